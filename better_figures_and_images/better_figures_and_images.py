@@ -20,14 +20,20 @@ from pelican import signals
 from bs4 import BeautifulSoup
 from PIL import Image
 
+import sys
+
 import logging
 logger = logging.getLogger(__name__)
 
 def content_object_init(instance):
+    soup_cache = sys.modules.get('soup_cache')  # None unless loaded as a plugin
 
     if instance._content is not None:
         content = instance._content
-        soup = BeautifulSoup(content)
+        if soup_cache:
+            soup = soup_cache.get_soup(instance)
+        else:
+            soup = BeautifulSoup(content)
 
         if 'img' in content:
             for img in soup('img'):
@@ -76,7 +82,10 @@ def content_object_init(instance):
                     else:
                         fig['style'] = extra_style
 
-        instance._content = soup.decode()
+        if soup_cache:
+            soup_cache.soup_modified(instance, soup)
+        else:
+            instance._content = soup.decode()
 
 
 def register():
@@ -6,12 +6,17 @@ adds option to specify maximum number of images to appear in article summary
 also adds option to include an image by default if one exists in your article
 """
 
+from copy import copy
+
 from pelican import signals
 from pelican.contents import Content, Article
 from bs4 import BeautifulSoup
 from six import text_type
 
+import sys
+
 def clean_summary(instance):
+    soup_cache = sys.modules.get('soup_cache')  # None unless loaded as a plugin
     if "CLEAN_SUMMARY_MAXIMUM" in instance.settings:
         maximum_images = instance.settings["CLEAN_SUMMARY_MAXIMUM"]
     else:
@@ -21,18 +26,26 @@ def clean_summary(instance):
     else:
         minimum_one = False
     if type(instance) == Article:
-        summary = instance.summary
-        summary = BeautifulSoup(instance.summary, 'html.parser')
+        if soup_cache:
+            summary = soup_cache.get_soup(instance, 'summary')
+        else:
+            summary = BeautifulSoup(instance.summary, 'html.parser')
         images = summary.findAll('img')
         if (len(images) > maximum_images):
             for image in images[maximum_images:]:
                 image.extract()
         if len(images) < 1 and minimum_one: #try to find one
-            content = BeautifulSoup(instance.content, 'html.parser')
+            if soup_cache:
+                content = soup_cache.get_soup(instance)
+            else:
+                content = BeautifulSoup(instance.content, 'html.parser')
             first_image = content.find('img')
             if first_image:
-                summary.insert(0, first_image)
-        instance._summary = text_type(summary)
+                summary.insert(0, copy(first_image))
+        if soup_cache:
+            soup_cache.soup_modified(instance, summary, 'summary')
+        else:
+            instance._summary = text_type(summary)
 
 def register():
     signals.content_object_init.connect(clean_summary)
@@ -4,76 +4,271 @@ Disqus static comment plugin for Pelican
 ====================================
 This plugin adds a disqus_comments property to all articles.          
 Comments are fetched at generation time using disqus API.
+
+Threads and posts are kept in CACHE_PATH, so that each build only fetches
+the threads and posts created since the previous one. Every
+DISQUS_STATIC_FULL_SYNC_DAYS days all of them are fetched again, to pick up
+edited and deleted comments.
 """
 
 from __future__ import unicode_literals
-from disqusapi import DisqusAPI, Paginator
+import json
+import logging
+import os
+import sys
+import time
+
+from six.moves.urllib.parse import urlencode
+try:
+    from disqusapi import DisqusAPI, Paginator
+except ImportError:
+    DisqusAPI = Paginator = None
 from pelican import signals
 
+logger = logging.getLogger(__name__)
+
+API_URL = 'https://disqus.com/api/3.0/%s/list.json'
+DEFAULT_FULL_SYNC_DAYS = 7
+
 def initialized(pelican):
     from pelican.settings import DEFAULT_CONFIG
     DEFAULT_CONFIG.setdefault('DISQUS_SECRET_KEY', '')
     DEFAULT_CONFIG.setdefault('DISQUS_PUBLIC_KEY', '')
+    DEFAULT_CONFIG.setdefault('DISQUS_STATIC_FIXTURE', None)
+    DEFAULT_CONFIG.setdefault('DISQUS_STATIC_FULL_SYNC_DAYS',
+                              DEFAULT_FULL_SYNC_DAYS)
     if pelican:
         pelican.settings.setdefault('DISQUS_SECRET_KEY', '')
         pelican.settings.setdefault('DISQUS_PUBLIC_KEY', '')
+        pelican.settings.setdefault('DISQUS_STATIC_FIXTURE', None)
+        pelican.settings.setdefault('DISQUS_STATIC_FULL_SYNC_DAYS',
+                                    DEFAULT_FULL_SYNC_DAYS)
+
+def api_fetcher(settings):
+    """Return a function fetching the threads or posts of the forum created
+    since a given date, from the disqus API"""
+    if DisqusAPI is None:
+        raise ImportError('disqus_static needs the disqus-python package')
+    disqus = DisqusAPI(settings['DISQUS_SECRET_KEY'],
+                       settings['DISQUS_PUBLIC_KEY'])
+
+    def fetch(resource, since=None):
+        params = {'forum': settings['DISQUS_SITENAME']}
+        if since is not None:
+            params.update(since=since, order='asc')
+        return list(Paginator(getattr(disqus, resource).list, **params))
+    return fetch
+
+
+def http_fetcher(settings):
+    """Like api_fetcher, but calling the disqus REST API through http_cache.
+
+    When the API cannot be reached (or HTTP_CACHE_OFFLINE is set), None is
+    returned, so the local copy is used as it is.
+    """
+    http_cache = sys.modules.get('http_cache')  # None unless loaded as a plugin
+    params = {'forum': settings['DISQUS_SITENAME'], 'limit': 100}
+    if settings['DISQUS_SECRET_KEY']:
+        params['api_secret'] = settings['DISQUS_SECRET_KEY']
+    else:
+        params['api_key'] = settings['DISQUS_PUBLIC_KEY']
+
+    def fetch(resource, since=None):
+        page_params = dict(params)
+        if since is not None:
+            page_params.update(since=since, order='asc')
+        items = []
+        while True:
+            url = API_URL % resource + '?' + urlencode(
+                sorted(page_params.items()))
+            try:
+                page = http_cache.fetch(url, settings, ttl=0).json()
+            except (http_cache.FetchError, ValueError) as e:
+                logger.warning('disqus_static: cannot fetch the %s, using '
+                               'the local copy: %s', resource, e)
+                return None
+            items.extend(page['response'])
+            cursor = page.get('cursor') or {}
+            if not cursor.get('hasNext'):
+                return items
+            page_params['cursor'] = cursor['next']
+    return fetch
+
+
+def fixture_fetcher(path):
+    """Like api_fetcher, but serving the "threads" and "posts" lists of a
+    JSON file, as returned by the disqus API"""
+    with open(path, 'rb') as f:
+        data = json.loads(f.read().decode('utf-8'))
+
+    def fetch(resource, since=None):
+        return [item for item in data.get(resource, [])
+                if since is None or item['createdAt'] >= since]
+    return fetch
+
+
+def cache_path(settings):
+    return os.path.join(settings.get('CACHE_PATH', 'cache'), 'disqus_static',
+                        '%s.json' % settings['DISQUS_SITENAME'])
+
+
+def sync(settings, fetch):
+    """Update the local copy of the threads and posts of the forum.
+
+    Only what was created since the last sync (the cursor) is fetched,
+    except every DISQUS_STATIC_FULL_SYNC_DAYS days (never with None), when
+    everything is fetched again and replaces the local copy, so that edited
+    and deleted threads and posts are updated. fetch returns None when it
+    cannot reach the API, the local copy is then kept.
+    Returns the {thread_id: thread} dict and the list of posts, newest first
+    like the disqus API returns them.
+    """
+    path = cache_path(settings)
+    try:
+        with open(path, 'rb') as f:
+            data = json.loads(f.read().decode('utf-8'))
+    except (IOError, OSError, ValueError):
+        data = {'threads': {}, 'posts': {}, 'cursors': {}}
+
+    now = time.time()
+    days = settings.get('DISQUS_STATIC_FULL_SYNC_DAYS', DEFAULT_FULL_SYNC_DAYS)
+    full_sync = (days is not None and
+                 now - data.get('full_sync', 0) >= days * 24 * 3600)
+    synced = True
+    for resource in ('threads', 'posts'):
+        since = None if full_sync else data['cursors'].get(resource)
+        items = fetch(resource, since)
+        if items is None:
+            synced = False
+            continue
+        if since is None:
+            data[resource] = {}
+        for item in items:
+            data[resource][item['id']] = item
+        if items:
+            data['cursors'][resource] = max(
+                [item['createdAt'] for item in items] + [since or ''])
+        logger.debug('disqus_static: %d %s %s', len(items),
+                     'synced' if since is None else 'new', resource)
+    if full_sync and synced:
+        data['full_sync'] = now
+
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    http_cache = sys.modules.get('http_cache')  # None unless loaded as a plugin
+    if http_cache is not None:
+        http_cache.write_file(path, json.dumps(data).encode('utf-8'))
+    else:
+        # a partially written file fails to load, and is synced again
+        with open(path, 'wb') as f:
+            f.write(json.dumps(data).encode('utf-8'))
+
+    posts = sorted(data['posts'].values(),
+                   key=lambda post: (post['createdAt'], post['id']),
+                   reverse=True)
+    return data['threads'], posts
+
 
 def disqus_static(generator):
-    disqus = DisqusAPI(generator.settings['DISQUS_SECRET_KEY'], 
-                       generator.settings['DISQUS_PUBLIC_KEY'])
-    # first retrieve the threads
-    threads = Paginator(disqus.threads.list, 
-                        forum=generator.settings['DISQUS_SITENAME'])
-    # build a {thread_id: title} dict
-    thread_dict = {}
-    for thread in threads:
-        thread_dict[thread['id']] = thread['title']
-
-    # now retrieve the posts
-    posts = Paginator(disqus.posts.list, 
-                      forum=generator.settings['DISQUS_SITENAME'])
-
-    # build a {post_id: [child_post1, child_post2, ...]} dict
-    child_dict = {}
+    if generator.settings.get('DISQUS_STATIC_FIXTURE'):
+        fetch = fixture_fetcher(generator.settings['DISQUS_STATIC_FIXTURE'])
+    elif sys.modules.get('http_cache') is not None:
+        fetch = http_fetcher(generator.settings)
+    else:
+        fetch = api_fetcher(generator.settings)
+    threads, posts = sync(generator.settings, fetch)
+
+    post_dict, counts = build_comment_trees(threads, posts)
+    match_thread = thread_matcher(generator.settings, threads)
+
+    for article in generator.articles:
+        thread_ids = match_thread(article)
+        comments = [post for thread_id in thread_ids
+                    for post in post_dict.get(thread_id, [])]
+        if not comments:
+            continue
+        if len(thread_ids) > 1:
+            comments.sort(key=lambda post: post['createdAt'], reverse=True)
+        article.disqus_comments = comments
+        article.disqus_comment_count = sum(counts.get(thread_id, 0)
+                                           for thread_id in thread_ids)
+
+def build_comment_trees(threads, posts):
+    """Thread the posts (newest first) without recursion.
+
+    Sets the 'children' of each post, and returns the
+    {thread_id: [top level post, ...]} dict and the {thread_id: count} of
+    the posts in their trees. Replies to posts which are not there (e.g.
+    deleted ones) are left out, and not counted.
+    """
+    # all posts are indexed before any is attached, as a reply can be listed
+    # before its parent when both were created in the same second
+    by_id = {}
     for post in posts:
-        if post['id'] not in child_dict.keys():
-            child_dict[post['id']] = []
-        if post['parent'] is not None:
-            if str(post['parent']) not in child_dict.keys():
-                child_dict[str(post['parent'])] = []
-            child_dict[str(post['parent'])].append(post)
-
-    # build a {title: [post1, post2, ...]} dict
+        if post['thread'] not in threads:
+            continue # invalid thread, should never happen
+        post['children'] = []
+        by_id[str(post['id'])] = post
+
     post_dict = {}
     for post in posts:
-        build_post_dict(post_dict, child_dict, thread_dict, post)
-
-    for article in generator.articles:
-        if article.title in post_dict:
-            article.disqus_comments = post_dict[article.title]
-            article.disqus_comment_count = sum([
-                postcounter(post) for post in post_dict[article.title]])
+        if str(post['id']) not in by_id:
+            continue
+        if post['parent'] is None:
+            post_dict.setdefault(post['thread'], []).append(post)
+        else:
+            parent = by_id.get(str(post['parent']))
+            if parent is not None:
+                parent['children'].append(post)
 
-def postcounter(node):
-    return 1 + sum([postcounter(n) for n in node['children']])
+    # only the posts in the trees are shown
+    counts = {}
+    for thread_id, top_posts in post_dict.items():
+        pending = list(top_posts)
+        counts[thread_id] = 0
+        while pending:
+            counts[thread_id] += 1
+            pending.extend(pending.pop()['children'])
+    return post_dict, counts
 
-def build_post_dict(post_dict, child_dict, thread_dict, post):
-    if post['thread'] not in thread_dict.keys():
-        return # invalid thread, should never happen
+def normalize_link(link):
+    return link.split('://', 1)[-1].rstrip('/')
 
-    build_child_dict(child_dict, post)
+def thread_matcher(settings, threads):
+    """Return a function returning the ids of the threads of an article.
 
-    if post['parent'] is not None:
-        return # this is a child post, don't want to display it here
+    Threads are matched by their link (the article's URL) or by their
+    identifiers (the article's url or slug). Only when neither matches, the
+    article's title is compared to the thread titles, as before.
+    """
+    by_link = {}
+    by_identifier = {}
+    by_title = {}
+    for thread_id, thread in threads.items():
+        if thread.get('link'):
+            by_link.setdefault(normalize_link(thread['link']),
+                               []).append(thread_id)
+        for identifier in thread.get('identifiers') or ():
+            by_identifier.setdefault(identifier, []).append(thread_id)
+        by_title.setdefault(thread['title'], []).append(thread_id)
 
-    if thread_dict[post['thread']] not in post_dict.keys():
-        post_dict[thread_dict[post['thread']]] = []
-    post_dict[thread_dict[post['thread']]].append(post)
+    siteurl = settings.get('SITEURL', '')
 
-def build_child_dict(child_dict, post):
-    post['children'] = child_dict[post['id']]
-    for child in child_dict[post['id']]:
-        build_child_dict(child_dict, child)
+    def match(article):
+        url = getattr(article, 'url', None)
+        thread_ids = []
+        if url is not None:
+            thread_ids.extend(by_link.get(
+                normalize_link('%s/%s' % (siteurl, url)), ()))
+        for identifier in (url, getattr(article, 'slug', None)):
+            for thread_id in by_identifier.get(identifier, ()):
+                if thread_id not in thread_ids:
+                    thread_ids.append(thread_id)
+        if not thread_ids:
+            thread_ids = by_title.get(article.title, [])
+        return thread_ids
+    return match
 
 def register():
     signals.initialized.connect(initialized)
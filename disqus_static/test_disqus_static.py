@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from importlib import import_module
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+# the package exports the disqus_static function under the module's name
+disqus_static = import_module('disqus_static.disqus_static')
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       'test_data', 'disqus.json')
+
+
+class Article(object):
+    def __init__(self, title, slug=None):
+        self.title = title
+        self.slug = slug or title.lower().replace(' ', '-')
+        self.url = self.slug + '.html'
+
+
+class Generator(object):
+    def __init__(self, settings, articles):
+        self.settings = settings
+        self.articles = articles
+
+
+class TestDisqusStatic(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_path = tempfile.mkdtemp()
+        self.settings = {'DISQUS_SITENAME': 'example',
+                         'SITEURL': 'https://example.com',
+                         'DISQUS_STATIC_FIXTURE': FIXTURE,
+                         'CACHE_PATH': self.cache_path}
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_path)
+
+    def test_comment_tree(self):
+        hello, second, other = (Article('Hello world'),
+                                Article('Second post'), Article('Other'))
+        disqus_static.disqus_static(
+            Generator(self.settings, [hello, second, other]))
+
+        self.assertEqual([post['id'] for post in hello.disqus_comments],
+                         ['5', '1'])
+        first = hello.disqus_comments[1]
+        self.assertEqual([post['id'] for post in first['children']],
+                         ['3', '2'])
+        self.assertEqual([post['id'] for post in
+                          first['children'][0]['children']], ['4'])
+        self.assertEqual(hello.disqus_comment_count, 5)
+        self.assertEqual(second.disqus_comment_count, 1)
+        self.assertFalse(hasattr(other, 'disqus_comments'))
+
+    def test_incremental_sync(self):
+        calls = []
+        fixture = disqus_static.fixture_fetcher(FIXTURE)
+
+        def fetch(resource, since=None):
+            calls.append((resource, since))
+            return fixture(resource, since)
+
+        threads, posts = disqus_static.sync(self.settings, fetch)
+        self.assertEqual(calls, [('threads', None), ('posts', None)])
+        self.assertEqual(sorted(threads), ['100', '200'])
+        self.assertEqual([post['id'] for post in posts],
+                         ['6', '5', '4', '3', '2', '1'])
+
+        del calls[:]
+        threads, posts = disqus_static.sync(self.settings, fetch)
+        self.assertEqual(calls, [('threads', '2014-02-01T09:00:00'),
+                                 ('posts', '2014-02-02T10:00:00')])
+        self.assertEqual(len(posts), 6)
+
+        # only the new posts are returned by the API
+        def fetch_new(resource, since=None):
+            if resource == 'threads':
+                return []
+            return [{'id': '7', 'thread': '100', 'parent': 5,
+                     'createdAt': '2014-03-01T10:00:00',
+                     'message': '<p>New</p>', 'author': {'name': 'Frank'}}]
+
+        threads, posts = disqus_static.sync(self.settings, fetch_new)
+        self.assertEqual([post['id'] for post in posts],
+                         ['7', '6', '5', '4', '3', '2', '1'])
+        self.assertEqual(len(threads), 2)
+
+    def test_full_sync(self):
+        fixture = disqus_static.fixture_fetcher(FIXTURE)
+        deleted = []
+        calls = []
+
+        def fetch(resource, since=None):
+            calls.append((resource, since))
+            return [item for item in fixture(resource, since)
+                    if item['id'] not in deleted]
+
+        now = time.time()
+        with mock.patch.object(disqus_static.time, 'time', return_value=now):
+            disqus_static.sync(self.settings, fetch)
+        # the comment is deleted, and an other one edited
+        deleted.append('6')
+        edited = [dict(post, message='<p>Edited</p>')
+                  for post in fixture('posts') if post['id'] == '5']
+
+        def fetch_edited(resource, since=None):
+            items = fetch(resource, since)
+            if resource == 'posts' and since is None:
+                items = [post for post in items if post['id'] != '5'] + edited
+            return items
+
+        # within DISQUS_STATIC_FULL_SYNC_DAYS, only new posts are fetched
+        del calls[:]
+        with mock.patch.object(disqus_static.time, 'time',
+                               return_value=now + 24 * 3600):
+            threads, posts = disqus_static.sync(self.settings, fetch_edited)
+        self.assertNotIn(None, [since for resource, since in calls])
+        self.assertEqual([post['id'] for post in posts],
+                         ['6', '5', '4', '3', '2', '1'])
+
+        # then everything is fetched again
+        del calls[:]
+        with mock.patch.object(disqus_static.time, 'time',
+                               return_value=now + 8 * 24 * 3600):
+            threads, posts = disqus_static.sync(self.settings, fetch_edited)
+        self.assertEqual(calls, [('threads', None), ('posts', None)])
+        self.assertEqual([post['id'] for post in posts],
+                         ['5', '4', '3', '2', '1'])
+        self.assertEqual(posts[0]['message'], '<p>Edited</p>')
+
+        # the local copy is kept when the API cannot be reached
+        self.settings['DISQUS_STATIC_FULL_SYNC_DAYS'] = 0
+        threads, posts = disqus_static.sync(self.settings,
+                                            lambda resource, since: None)
+        self.assertEqual(len(threads), 2)
+        self.assertEqual(len(posts), 5)
+
+    def test_thread_matching(self):
+        threads = {
+            '1': {'title': 'Renamed', 'identifiers': [],
+                  'link': 'http://example.com/hello.html'},
+            '2': {'title': 'Old title', 'identifiers': ['second'],
+                  'link': 'http://localhost:8000/second.html'},
+            '3': {'title': 'Third', 'identifiers': [], 'link': ''},
+            '4': {'title': 'Third', 'identifiers': [],
+                  'link': 'http://localhost:8000/third/'},
+        }
+        match = disqus_static.thread_matcher(self.settings, threads)
+        self.assertEqual(match(Article('Hello', 'hello')), ['1'])
+        self.assertEqual(match(Article('Second', 'second')), ['2'])
+        self.assertEqual(sorted(match(Article('Third', 'third-post'))),
+                         ['3', '4'])
+        self.assertEqual(match(Article('Missing')), [])
+
+    def test_deep_thread(self):
+        depth = 5000
+        posts = [{'id': str(i), 'thread': '1',
+                  'parent': i - 1 if i else None,
+                  'createdAt': '2014-01-01T00:00:00.%06d' % i}
+                 for i in reversed(range(depth))]
+        # a reply to a deleted post is neither shown nor counted
+        posts.insert(0, {'id': 'orphan', 'thread': '1', 'parent': 99999,
+                         'createdAt': '2015-01-01T00:00:00'})
+        post_dict, counts = disqus_static.build_comment_trees({'1': {}},
+                                                              posts)
+        self.assertEqual(counts, {'1': depth})
+        node = post_dict['1'][0]
+        for i in range(depth - 1):
+            node, = node['children']
+        self.assertEqual(node['id'], str(depth - 1))
+
+    def test_reply_in_the_same_second(self):
+        created = '2014-01-01T00:00:00'
+        posts = [{'id': '9', 'thread': '1', 'parent': None,
+                  'createdAt': created},
+                 {'id': '10', 'thread': '1', 'parent': 9,
+                  'createdAt': created}]
+        # newest first, as sync returns them: '9' sorts after '10'
+        posts.sort(key=lambda post: (post['createdAt'], post['id']),
+                   reverse=True)
+        post_dict, counts = disqus_static.build_comment_trees({'1': {}},
+                                                              posts)
+        self.assertEqual(counts, {'1': 2})
+        self.assertEqual([post['id'] for post in post_dict['1']], ['9'])
+        self.assertEqual([post['id'] for post in post_dict['1'][0]['children']],
+                         ['10'])
+
+
+if __name__ == '__main__':
+    unittest.main()
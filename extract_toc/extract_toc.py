@@ -11,12 +11,18 @@ from os import path
 from bs4 import BeautifulSoup
 from pelican import signals, readers, contents
 
+import sys
+
 
 def extract_toc(content):
+    soup_cache = sys.modules.get('soup_cache')  # None unless loaded as a plugin
     if isinstance(content, contents.Static):
         return
 
-    soup = BeautifulSoup(content._content,'html.parser')
+    if soup_cache:
+        soup = soup_cache.get_soup(content)
+    else:
+        soup = BeautifulSoup(content._content,'html.parser')
     toc = None
     if not toc:  # default Markdown reader
         toc = soup.find('div', class_='toc')
@@ -26,7 +32,10 @@ def extract_toc(content):
         toc = soup.find('nav', id='TOC')
     if toc:
         toc.extract()
-        content._content = soup.decode()
+        if soup_cache:
+            soup_cache.soup_modified(content, soup)
+        else:
+            content._content = soup.decode()
         content.toc = toc.decode()
 
 
@@ -12,6 +12,8 @@ A plugin to list your Github Activity
 from __future__ import unicode_literals, print_function
 
 import logging
+import sys
+import threading
 logger = logging.getLogger(__name__)
 
 from pelican import signals
@@ -20,20 +22,37 @@ from pelican import signals
 class GitHubActivity():
     """
         A class created to fetch github activity with feedparser
+
+        The feed is fetched and parsed once, on the first call of fetch, or
+        in a background thread started right away when
+        GITHUB_ACTIVITY_PREFETCH is set
     """
     def __init__(self, generator):
-        import feedparser
-        self.activities = feedparser.parse(
-            generator.settings['GITHUB_ACTIVITY_FEED'])
-        self.max_entries = generator.settings['GITHUB_ACTIVITY_MAX_ENTRIES'] 
+        self.settings = generator.settings
+        self.max_entries = generator.settings.get('GITHUB_ACTIVITY_MAX_ENTRIES')
+        self.entries = None
+        self.lock = threading.Lock()
+        if generator.settings.get('GITHUB_ACTIVITY_PREFETCH'):
+            prefetch = threading.Thread(target=self.fetch)
+            prefetch.daemon = True
+            prefetch.start()
 
     def fetch(self):
         """
             returns a list of html snippets fetched from github actitivy feed
         """
+        with self.lock:
+            if self.entries is None:
+                self.entries = self.parse()
+        return self.entries
+
+    def parse(self):
+        import feedparser
+        activities = feedparser.parse(
+            read_feed(self.settings['GITHUB_ACTIVITY_FEED'], self.settings))
 
         entries = []
-        for activity in self.activities['entries']:
+        for activity in activities['entries']:
             entries.append(
                     [element for element in [activity['title'],
                         activity['content'][0]['value']]])
@@ -41,6 +60,22 @@ class GitHubActivity():
         return entries[0:self.max_entries]
 
 
+def read_feed(url, settings):
+    """
+        returns the feed for feedparser, fetched through http_cache when
+        it is available
+    """
+    http_cache = sys.modules.get('http_cache')  # None unless loaded as a plugin
+    if http_cache is None or not url.startswith(('http://', 'https://')):
+        return url
+    try:
+        return http_cache.fetch(url, settings).content
+    except http_cache.FetchError as e:
+        logger.warning('github_activity: cannot fetch %s: %s',
+                       http_cache.display_url(url), e)
+        return b''
+
+
 def fetch_github_activity(gen, metadata):
     """
         registered handler for the github activity plugin
@@ -48,7 +83,8 @@ def fetch_github_activity(gen, metadata):
         template
     """
 
-    if 'GITHUB_ACTIVITY_FEED' in gen.settings.keys():
+    if ('GITHUB_ACTIVITY_FEED' in gen.settings.keys() and
+            'github_activity' not in gen.context):
         gen.context['github_activity'] = gen.plugin_instance.fetch()
 
 
@@ -57,7 +93,8 @@ def feed_parser_initialization(generator):
         Initialization of feed parser
     """
 
-    generator.plugin_instance = GitHubActivity(generator)
+    if 'GITHUB_ACTIVITY_FEED' in generator.settings.keys():
+        generator.plugin_instance = GitHubActivity(generator)
 
 
 def register():
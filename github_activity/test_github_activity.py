@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import sys
+import types
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from github_activity import github_activity
+
+FEED = 'feeds/github.atom'
+
+
+def fake_feedparser(entries):
+    """A feedparser module whose parse returns entries"""
+    feedparser = types.ModuleType(str('feedparser'))
+    feedparser.parse = mock.Mock(return_value={'entries': entries})
+    return feedparser
+
+
+class Generator(object):
+    def __init__(self, settings):
+        self.settings = settings
+        self.context = {}
+
+
+class TestGitHubActivity(unittest.TestCase):
+
+    def setUp(self):
+        entries = [{'title': 'event %d' % i,
+                    'content': [{'value': '<p>details %d</p>' % i}]}
+                   for i in range(5)]
+        self.feedparser = fake_feedparser(entries)
+        patcher = mock.patch.dict(sys.modules,
+                                  {'feedparser': self.feedparser})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_context_built_once(self):
+        generator = Generator({'GITHUB_ACTIVITY_FEED': FEED,
+                               'GITHUB_ACTIVITY_MAX_ENTRIES': 2})
+        github_activity.feed_parser_initialization(generator)
+        for article in range(3):
+            github_activity.fetch_github_activity(generator, {})
+
+        self.feedparser.parse.assert_called_once_with(FEED)
+        self.assertEqual(generator.context['github_activity'],
+                         [['event 0', '<p>details 0</p>'],
+                          ['event 1', '<p>details 1</p>']])
+
+    def test_prefetch(self):
+        generator = Generator({'GITHUB_ACTIVITY_FEED': FEED,
+                               'GITHUB_ACTIVITY_PREFETCH': True})
+        github_activity.feed_parser_initialization(generator)
+        github_activity.fetch_github_activity(generator, {})
+
+        self.feedparser.parse.assert_called_once_with(FEED)
+        self.assertEqual(len(generator.context['github_activity']), 5)
+
+    def test_without_feed(self):
+        generator = Generator({})
+        github_activity.feed_parser_initialization(generator)
+        github_activity.fetch_github_activity(generator, {})
+        self.assertEqual(generator.context, {})
+        self.assertFalse(self.feedparser.parse.called)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,23 +11,61 @@ Copyright (c) Talha Mansoor
 from __future__ import unicode_literals
 
 import logging
+import sys
+import threading
 logger = logging.getLogger(__name__)
 
 from pelican import signals
 
 
+def read_feed(url, settings):
+    """Return the feed for feedparser, fetched through http_cache when it
+    is available, or None when it cannot be fetched"""
+    http_cache = sys.modules.get('http_cache')  # None unless loaded as a plugin
+    if http_cache is None or not url.startswith(('http://', 'https://')):
+        return url
+    try:
+        return http_cache.fetch(url, settings).content
+    except http_cache.FetchError as e:
+        logger.warning('goodreads_activity: cannot fetch %s: %s',
+                       http_cache.display_url(url), e)
+        return None
+
+
 class GoodreadsActivity():
+    """Fetches and parses the feed once, on the first call of fetch, or in a
+    background thread started right away when GOODREADS_ACTIVITY_PREFETCH is
+    set"""
+
     def __init__(self, generator):
-        import feedparser
-        self.activities = feedparser.parse(
-            generator.settings['GOODREADS_ACTIVITY_FEED'])
+        self.settings = generator.settings
+        self.activity = None
+        self.lock = threading.Lock()
+        if generator.settings.get('GOODREADS_ACTIVITY_PREFETCH'):
+            prefetch = threading.Thread(target=self.fetch)
+            prefetch.daemon = True
+            prefetch.start()
 
     def fetch(self):
+        with self.lock:
+            if self.activity is None:
+                self.activity = self.parse()
+        return self.activity
+
+    def parse(self):
         goodreads_activity = {
-            'shelf_title': self.activities.feed.title,
+            'shelf_title': '',
             'books': []
         }
-        for entry in self.activities['entries']:
+        feed = read_feed(self.settings['GOODREADS_ACTIVITY_FEED'],
+                         self.settings)
+        if feed is None:
+            return goodreads_activity
+
+        import feedparser
+        activities = feedparser.parse(feed)
+        goodreads_activity['shelf_title'] = activities.feed.get('title', '')
+        for entry in activities['entries']:
             book = {
                 'title': entry.title,
                 'author': entry.author_name,
@@ -46,12 +84,14 @@ class GoodreadsActivity():
 
 
 def fetch_goodreads_activity(gen, metadata):
-    if 'GOODREADS_ACTIVITY_FEED' in gen.settings:
+    if ('GOODREADS_ACTIVITY_FEED' in gen.settings and
+            'goodreads_activity' not in gen.context):
         gen.context['goodreads_activity'] = gen.goodreads.fetch()
 
 
 def initialize_feedparser(generator):
-    generator.goodreads = GoodreadsActivity(generator)
+    if 'GOODREADS_ACTIVITY_FEED' in generator.settings:
+        generator.goodreads = GoodreadsActivity(generator)
 
 
 def register():
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import sys
+import types
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from http_cache import http_cache
+
+from goodreads_activity import goodreads_activity
+
+FEED = 'https://www.goodreads.com/review/list_rss/1?key=secret&shelf=read'
+
+
+class FeedDict(dict):
+    """The attribute access of feedparser's results"""
+    __getattr__ = dict.__getitem__
+
+
+def fake_feedparser(title, entries):
+    """A feedparser module whose parse returns a feed with entries"""
+    feedparser = types.ModuleType(str('feedparser'))
+    feedparser.parse = mock.Mock(return_value=FeedDict(
+        feed=FeedDict(title=title),
+        entries=[FeedDict(entry) for entry in entries]))
+    return feedparser
+
+
+class Generator(object):
+    def __init__(self, settings):
+        self.settings = settings
+        self.context = {}
+
+
+class TestGoodreadsActivity(unittest.TestCase):
+
+    def setUp(self):
+        self.generator = Generator({'GOODREADS_ACTIVITY_FEED': FEED})
+        # as if http_cache was listed in PLUGINS
+        patcher = mock.patch.dict(sys.modules, {'http_cache': http_cache})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_context_built_once(self):
+        book = {'title': 'Dune', 'author_name': 'Frank Herbert',
+                'link': 'https://www.goodreads.com/dune',
+                'book_large_image_url': 'l.jpg',
+                'book_medium_image_url': 'm.jpg',
+                'book_small_image_url': 's.jpg',
+                'book_description': 'Spice', 'user_rating': '5',
+                'user_review': '', 'user_shelves': 'read'}
+        feedparser = fake_feedparser('Read shelf', [book])
+        response = http_cache.Response(FEED, b'<rss/>', {})
+        with mock.patch.dict(sys.modules, {'feedparser': feedparser}), \
+                mock.patch.object(http_cache, 'fetch',
+                                  return_value=response) as fetch:
+            goodreads_activity.initialize_feedparser(self.generator)
+            for article in range(3):
+                goodreads_activity.fetch_goodreads_activity(self.generator,
+                                                            {})
+
+        fetch.assert_called_once_with(FEED, self.generator.settings)
+        feedparser.parse.assert_called_once_with(b'<rss/>')
+        activity = self.generator.context['goodreads_activity']
+        self.assertEqual(activity['shelf_title'], 'Read shelf')
+        self.assertEqual([(book['title'], book['author'], book['m_cover'])
+                          for book in activity['books']],
+                         [('Dune', 'Frank Herbert', 'm.jpg')])
+
+    def test_feed_cannot_be_fetched(self):
+        error = http_cache.FetchError('www.goodreads.com: timed out')
+        with mock.patch.object(http_cache, 'fetch', side_effect=error):
+            goodreads_activity.initialize_feedparser(self.generator)
+            goodreads_activity.fetch_goodreads_activity(self.generator, {})
+        self.assertEqual(self.generator.context['goodreads_activity'],
+                         {'shelf_title': '', 'books': []})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP Cache
+==========
+
+Shared fetching of remote resources for the plugins which download data
+while the site is built (feeds, API responses, images, ...).
+
+* Connections are kept alive and reused per host.
+* Responses are kept on disk. Within ``HTTP_CACHE_TTL`` seconds they are
+  served from the disk without any request; after that they are revalidated
+  with their ``ETag`` / ``Last-Modified`` validators.
+* Every request has a timeout, and if a resource cannot be fetched but an
+  older copy is in the cache, that copy is used.
+* At most ``HTTP_CACHE_MAX_CONNECTIONS`` requests are made at the same time,
+  ``fetch_many`` fetching a list of resources concurrently.
+* With ``HTTP_CACHE_OFFLINE`` no request is made at all, only cached
+  responses are served.
+
+Plugins use it when it is loaded, looking it up when they fetch something::
+
+    http_cache = sys.modules.get('http_cache')  # None unless loaded
+"""
+
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+from six.moves import http_client
+from six.moves.urllib.parse import urljoin, urlsplit
+
+from pelican import signals
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 3600
+DEFAULT_TIMEOUT = 10
+DEFAULT_MAX_CONNECTIONS = 4
+MAX_REDIRECTS = 5
+USER_AGENT = 'pelican-plugins/http_cache'
+# response headers kept in the cache
+CACHED_HEADERS = ('content-type', 'etag', 'last-modified')
+REDIRECTS = (301, 302, 303, 307, 308)
+
+
+class FetchError(Exception):
+    """A resource could not be fetched"""
+
+
+class OfflineError(FetchError):
+    """A resource is not cached and HTTP_CACHE_OFFLINE is set"""
+
+
+class TooLarge(FetchError):
+    """A resource is larger than the max_size given to fetch"""
+
+
+class Response(object):
+    """A fetched resource.
+
+    ``from_cache`` is True when no body was transferred: the resource was
+    fresh in the cache, not modified, or could not be fetched again.
+    """
+
+    def __init__(self, url, content, headers, from_cache=False):
+        self.url = url
+        self.content = content
+        self.headers = headers
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        content_type = self.headers.get('content-type') or ''
+        charset = 'utf-8'
+        for param in content_type.split(';')[1:]:
+            name, _, value = param.strip().partition('=')
+            if name.lower() == 'charset' and value:
+                charset = value.strip('"\'')
+        return self.content.decode(charset, 'replace')
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class ConnectionPool(object):
+    """Idle keep-alive connections, per scheme and host"""
+
+    def __init__(self):
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def get(self, scheme, netloc, timeout):
+        """Return a connection, and whether it was used before"""
+        with self._lock:
+            idle = self._idle.get((scheme, netloc))
+            if idle:
+                return idle.pop(), True
+        if scheme == 'https':
+            return http_client.HTTPSConnection(netloc, timeout=timeout), False
+        return http_client.HTTPConnection(netloc, timeout=timeout), False
+
+    def put(self, scheme, netloc, connection):
+        with self._lock:
+            self._idle.setdefault((scheme, netloc), []).append(connection)
+
+    def close(self):
+        with self._lock:
+            for connections in self._idle.values():
+                for connection in connections:
+                    connection.close()
+            self._idle.clear()
+
+
+_pool = ConnectionPool()
+_semaphores = {}
+_semaphores_lock = threading.Lock()
+
+
+def display_url(url):
+    """Return url without its query string, which may hold API keys, for
+    the messages and the logs"""
+    parts = urlsplit(url)
+    if not parts.query:
+        return url
+    return parts._replace(query='...', fragment='').geturl()
+
+
+def _too_large(url, max_size):
+    return TooLarge('%s is larger than %d bytes' % (display_url(url),
+                                                    max_size))
+
+
+def _setting(settings, name, default):
+    value = settings.get(name)
+    return default if value is None else value
+
+
+def _semaphore(settings):
+    size = _setting(settings, 'HTTP_CACHE_MAX_CONNECTIONS',
+                    DEFAULT_MAX_CONNECTIONS)
+    with _semaphores_lock:
+        if size not in _semaphores:
+            _semaphores[size] = threading.BoundedSemaphore(size)
+        return _semaphores[size]
+
+
+def cache_dir(settings):
+    """Return the directory of the cached responses, None to disable it"""
+    if 'HTTP_CACHE_PATH' in settings:
+        return settings['HTTP_CACHE_PATH']
+    return os.path.join(settings.get('CACHE_PATH', 'cache'), 'http_cache')
+
+
+def _load(directory, key):
+    if not directory:
+        return None
+    try:
+        with open(os.path.join(directory, key + '.json'), 'rb') as fh:
+            meta = json.loads(fh.read().decode('utf-8'))
+        with open(os.path.join(directory, key + '.bin'), 'rb') as fh:
+            meta['content'] = fh.read()
+    except (IOError, OSError, ValueError):
+        return None
+    return meta
+
+
+def write_file(path, data):
+    """Write the bytes data to path through a temporary file renamed over
+    it, so that other threads or processes never read a partial file"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(data)
+        if os.name == 'nt' and os.path.exists(path):
+            os.remove(path)
+        os.rename(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _store(directory, key, meta, content=None):
+    if not directory:
+        return
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        if content is not None:
+            write_file(os.path.join(directory, key + '.bin'), content)
+        write_file(os.path.join(directory, key + '.json'),
+               json.dumps(meta).encode('utf-8'))
+    except (IOError, OSError) as e:
+        logger.warning('http_cache: cannot cache %s: %s', key, e)
+
+
+def _request(url, headers, timeout, max_size):
+    """GET url, following redirects.
+
+    Returns the status, the lowercased response headers and the body.
+    """
+    for _ in range(MAX_REDIRECTS + 1):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise FetchError('%s: unsupported URL' % display_url(url))
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        connection, reused = _pool.get(parts.scheme, parts.netloc, timeout)
+        try:
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+        except (socket.error, http_client.HTTPException):
+            connection.close()
+            if not reused:
+                raise
+            # the server closed the idle connection, try a new one
+            connection = _pool.get(parts.scheme, parts.netloc, timeout)[0]
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+
+        response_headers = dict((name.lower(), value)
+                                for name, value in response.getheaders())
+        try:
+            length = response_headers.get('content-length')
+            if max_size and length and int(length) > max_size:
+                raise _too_large(url, max_size)
+            body = response.read(max_size + 1) if max_size else response.read()
+            if max_size and len(body) > max_size:
+                raise _too_large(url, max_size)
+        except Exception:
+            connection.close()
+            raise
+        if response.will_close:
+            connection.close()
+        else:
+            _pool.put(parts.scheme, parts.netloc, connection)
+
+        if response.status in REDIRECTS and 'location' in response_headers:
+            url = urljoin(url, response_headers['location'])
+            continue
+        return response.status, response_headers, body
+    raise FetchError('%s: too many redirects' % display_url(url))
+
+
+def fetch(url, settings=None, ttl=None, max_size=None, timeout=None,
+          headers=None):
+    """Return the Response of url, from the cache when possible.
+
+    ``ttl`` (seconds) and ``timeout`` override HTTP_CACHE_TTL and
+    HTTP_CACHE_TIMEOUT. Raises FetchError when the resource cannot be
+    fetched nor served from the cache, TooLarge when it is larger than
+    ``max_size`` bytes.
+    """
+    settings = settings or {}
+    if ttl is None:
+        ttl = _setting(settings, 'HTTP_CACHE_TTL', DEFAULT_TTL)
+    if timeout is None:
+        timeout = _setting(settings, 'HTTP_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+    directory = cache_dir(settings)
+    key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    entry = _load(directory, key)
+
+    if entry is not None and max_size and len(entry['content']) > max_size:
+        raise _too_large(url, max_size)
+    if settings.get('HTTP_CACHE_OFFLINE'):
+        if entry is None:
+            raise OfflineError('%s is not cached' % display_url(url))
+        return Response(url, entry['content'], entry['headers'], True)
+    if entry is not None and time.time() - entry['fetched'] < ttl:
+        return Response(url, entry['content'], entry['headers'], True)
+
+    request_headers = {'User-Agent': USER_AGENT}
+    if entry is not None:
+        if entry['headers'].get('etag'):
+            request_headers['If-None-Match'] = entry['headers']['etag']
+        if entry['headers'].get('last-modified'):
+            request_headers['If-Modified-Since'] = \
+                entry['headers']['last-modified']
+    request_headers.update(headers or {})
+
+    try:
+        with _semaphore(settings):
+            status, response_headers, body = _request(url, request_headers,
+                                                      timeout, max_size)
+    except TooLarge:
+        raise
+    except (socket.error, http_client.HTTPException, FetchError) as e:
+        if entry is None:
+            raise FetchError('%s: %s' % (display_url(url), e))
+        logger.warning('http_cache: cannot fetch %s (%s), using the copy '
+                       'from the cache', display_url(url), e)
+        return Response(url, entry['content'], entry['headers'], True)
+
+    if status == 304 and entry is not None:
+        entry['fetched'] = time.time()
+        content = entry.pop('content')
+        _store(directory, key, entry)
+        return Response(url, content, entry['headers'], True)
+    if status != 200:
+        if entry is not None:
+            logger.warning('http_cache: %s returned HTTP %d, using the copy '
+                           'from the cache', display_url(url), status)
+            return Response(url, entry['content'], entry['headers'], True)
+        raise FetchError('%s: HTTP %d' % (display_url(url), status))
+
+    kept_headers = dict((name, response_headers[name])
+                        for name in CACHED_HEADERS if name in response_headers)
+    _store(directory, key, {'fetched': time.time(), 'headers': kept_headers},
+           body)
+    return Response(url, body, kept_headers)
+
+
+def fetch_many(urls, settings=None, **kwargs):
+    """Fetch urls concurrently, at most HTTP_CACHE_MAX_CONNECTIONS at a time.
+
+    Returns a list with the Response, or the FetchError, of each url.
+    Takes the keyword arguments of fetch.
+    """
+    settings = settings or {}
+
+    def fetch_one(url):
+        try:
+            return fetch(url, settings, **kwargs)
+        except FetchError as e:
+            return e
+
+    urls = list(urls)
+    if len(urls) < 2:
+        return [fetch_one(url) for url in urls]
+    pool = ThreadPool(min(len(urls), _setting(
+        settings, 'HTTP_CACHE_MAX_CONNECTIONS', DEFAULT_MAX_CONNECTIONS)))
+    try:
+        return pool.map(fetch_one, urls)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def close(*args):
+    """Close the idle connections"""
+    _pool.close()
+
+
+def register():
+    signals.finalized.connect(close)
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+from pelican import Pelican, signals
+from pelican.settings import read_settings
+from six.moves import BaseHTTPServer, socketserver
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+try:
+    from http_cache import http_cache
+except ImportError:  # run from within the plugin folder
+    import http_cache
+
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    requests = []
+    body = b'<feed/>'
+    etag = '"v1"'
+
+    def do_GET(self):
+        Handler.requests.append((self.path, self.headers.get('If-None-Match')))
+        if self.path == '/redirect':
+            self.send_response(302)
+            self.send_header('Location', '/feed')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        elif self.path.split('?')[0] == '/missing':
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        elif self.headers.get('If-None-Match') == Handler.etag:
+            self.send_response(304)
+            self.end_headers()
+        else:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/xml; charset=utf-8')
+            self.send_header('Content-Length', str(len(Handler.body)))
+            self.send_header('ETag', Handler.etag)
+            self.end_headers()
+            self.wfile.write(Handler.body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class TestHttpCache(unittest.TestCase):
+
+    def setUp(self):
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.base = 'http://127.0.0.1:%d' % self.server.server_port
+        self.cache_path = tempfile.mkdtemp()
+        self.settings = {'HTTP_CACHE_PATH': self.cache_path,
+                         'HTTP_CACHE_TTL': 0, 'HTTP_CACHE_TIMEOUT': 5}
+        Handler.requests = []
+        Handler.body = b'<feed/>'
+        Handler.etag = '"v1"'
+
+    def tearDown(self):
+        http_cache.close()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.cache_path)
+
+    def test_revalidation(self):
+        url = self.base + '/feed'
+        response = http_cache.fetch(url, self.settings)
+        self.assertEqual(response.content, b'<feed/>')
+        self.assertEqual(response.text, '<feed/>')
+        self.assertFalse(response.from_cache)
+
+        response = http_cache.fetch(url, self.settings)
+        self.assertEqual(response.content, b'<feed/>')
+        self.assertTrue(response.from_cache)
+        self.assertEqual(Handler.requests, [('/feed', None), ('/feed', '"v1"')])
+
+        Handler.body, Handler.etag = b'<feed>new</feed>', '"v2"'
+        response = http_cache.fetch(url, self.settings)
+        self.assertEqual(response.content, b'<feed>new</feed>')
+        self.assertFalse(response.from_cache)
+
+    def test_ttl(self):
+        url = self.base + '/feed'
+        http_cache.fetch(url, self.settings)
+        response = http_cache.fetch(url, self.settings, ttl=3600)
+        self.assertTrue(response.from_cache)
+        self.assertEqual(len(Handler.requests), 1)
+
+    def test_offline(self):
+        url = self.base + '/feed'
+        self.settings['HTTP_CACHE_OFFLINE'] = True
+        self.assertRaises(http_cache.OfflineError,
+                          http_cache.fetch, url, self.settings)
+        self.settings['HTTP_CACHE_OFFLINE'] = False
+        http_cache.fetch(url, self.settings)
+        self.settings['HTTP_CACHE_OFFLINE'] = True
+        self.assertEqual(http_cache.fetch(url, self.settings).content,
+                         b'<feed/>')
+        self.assertEqual(len(Handler.requests), 1)
+
+    def test_errors(self):
+        self.assertRaises(http_cache.FetchError, http_cache.fetch,
+                          self.base + '/missing', self.settings)
+        self.assertRaises(http_cache.TooLarge, http_cache.fetch,
+                          self.base + '/feed', self.settings, max_size=3)
+        # an unreachable server is reported, or served from the cache
+        url = self.base + '/feed'
+        http_cache.fetch(url, self.settings)
+        http_cache.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.assertEqual(http_cache.fetch(url, self.settings).content,
+                         b'<feed/>')
+        self.assertRaises(http_cache.FetchError, http_cache.fetch,
+                          self.base + '/other', self.settings)
+
+    def test_query_not_in_messages(self):
+        url = self.base + '/missing?forum=x&api_secret=s3cret'
+        with self.assertRaises(http_cache.FetchError) as cm:
+            http_cache.fetch(url, self.settings)
+        self.assertNotIn('s3cret', str(cm.exception))
+        self.assertIn('/missing?...', str(cm.exception))
+        self.assertEqual(http_cache.display_url(self.base + '/feed'),
+                         self.base + '/feed')
+
+    def test_write_file(self):
+        path = os.path.join(self.cache_path, 'file')
+        http_cache.write_file(path, b'first')
+        http_cache.write_file(path, b'second')
+        with open(path, 'rb') as fh:
+            self.assertEqual(fh.read(), b'second')
+        self.assertEqual(os.listdir(self.cache_path), ['file'])
+
+    def test_fetch_many(self):
+        urls = [self.base + '/feed', self.base + '/redirect',
+                self.base + '/missing']
+        feed, redirected, missing = http_cache.fetch_many(urls, self.settings)
+        self.assertEqual(feed.content, b'<feed/>')
+        self.assertEqual(redirected.content, b'<feed/>')
+        self.assertIsInstance(missing, http_cache.FetchError)
+
+
+class TestPluginLoading(unittest.TestCase):
+    """Plugins loaded by Pelican from PLUGIN_PATHS, http_cache listed last"""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        # Pelican adds the current directory to sys.path, build from the site
+        os.chdir(self.path)
+        self.receivers = dict((signal, signal.receivers.copy())
+                              for signal in vars(signals).values()
+                              if hasattr(signal, 'receivers'))
+
+    def tearDown(self):
+        for signal, receivers in self.receivers.items():
+            signal.receivers = receivers
+        os.chdir(self.cwd)
+        shutil.rmtree(self.path)
+
+    def test_plugins_fetch_through_the_cache(self):
+        plugin_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        plugins = ['video_privacy_enhancer', 'http_cache']
+        settings = read_settings(override={
+            'PATH': self.path, 'OUTPUT_PATH': self.path,
+            'PLUGIN_PATHS': [plugin_path], 'PLUGINS': plugins})
+        # like a site's build: the plugins are not importable from sys.path
+        path = [entry for entry in sys.path
+                if os.path.abspath(entry or '.') != plugin_path]
+        modules = dict((name, module) for name, module in sys.modules.items()
+                       if name.split('.')[0] not in plugins)
+        with mock.patch.object(sys, 'path', path), \
+                mock.patch.dict(sys.modules, modules, clear=True):
+            Pelican(settings)
+            loaded = sys.modules['http_cache']
+            response = loaded.Response('url', b'jpeg', {})
+            with mock.patch.object(loaded, 'fetch_many',
+                                   return_value=[response]) as fetch_many:
+                thumbnails = sys.modules['video_privacy_enhancer'] \
+                    .download_thumbnails(['abc'], settings)
+        self.assertEqual(fetch_many.call_args[0][0],
+                         ['https://img.youtube.com/vi/abc/0.jpg'])
+        self.assertEqual(thumbnails, [b'jpeg'])
+
+
+if __name__ == '__main__':
+    unittest.main()
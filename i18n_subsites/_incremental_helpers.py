@@ -0,0 +1,188 @@
+"""Helpers to regenerate only the i18n sub-sites whose inputs changed
+
+The inputs of a sub-site are fingerprinted:
+- its settings (those of the top-level site with the sub-site overrides),
+- the sources it renders in full: those in its language and those without
+  a translation in its language (shown as drafts/hidden or untranslated),
+- the metadata of the other sources, which it only links to as translations,
+- the other files of the content directory (static files, etc.),
+- the theme, the template overrides and the gettext catalogs of the language.
+
+After a successful generation, the fingerprint and the list of generated
+files are saved to a manifest in CACHE_PATH. The next time, a sub-site is
+skipped if its fingerprint is the same and all the files it generated are
+still there.
+"""
+
+import os
+import re
+import json
+import hashlib
+
+import six
+
+import pelican
+from ._reader_cache import file_digest
+
+
+
+# Settings which do not change what is generated
+BUILD_SETTINGS = ('I18N_SUBSITES_WORKERS', 'I18N_SUBSITES_INCREMENTAL')
+_ADDRESS = re.compile(r' at 0x[0-9a-fA-F]+')
+
+
+
+def stable_repr(value):
+    """repr of value which is the same in every run: dicts and sets sorted, addresses removed"""
+    if isinstance(value, dict):
+        items = sorted(stable_repr(k) + ': ' + stable_repr(v) for k, v in value.items())
+        return '{' + ', '.join(items) + '}'
+    if isinstance(value, (set, frozenset)):
+        return '{' + ', '.join(sorted(stable_repr(item) for item in value)) + '}'
+    if isinstance(value, (list, tuple)):
+        return '[' + ', '.join(stable_repr(item) for item in value) + ']'
+    return _ADDRESS.sub('', repr(value))
+
+
+
+def content_record(content, translation_id):
+    """Return what the fingerprints need to know about a content object"""
+    if isinstance(translation_id, six.string_types):
+        group = getattr(content, translation_id, None)
+    elif translation_id:
+        group = tuple(getattr(content, attr, None) for attr in translation_id)
+    else:
+        group = None
+    if group is None:                     # not grouped with translations
+        group = content.source_path
+    return {
+        'source_path': content.source_path,
+        'lang': content.lang,
+        'group': (type(content).__name__, group),
+        'metadata': stable_repr(content.metadata),
+        }
+
+
+
+def _update(sha, *parts):
+    for part in parts:
+        if not isinstance(part, six.text_type):
+            part = six.text_type(part)
+        sha.update(part.encode('utf-8'))
+        sha.update(b'\0')
+
+
+
+def _update_with_tree(sha, root, skip=(), digest=False):
+    """Add the files below root to sha by stat, or by digest of their contents"""
+    if not root or not os.path.isdir(root):
+        _update(sha, 'missing', root)
+        return
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            if path in skip:
+                continue
+            if digest:
+                _update(sha, os.path.relpath(path, root), file_digest(path))
+            else:
+                stat = os.stat(path)
+                _update(sha, os.path.relpath(path, root), stat.st_mtime, stat.st_size)
+
+
+
+def theme_path(settings):
+    """Return the theme directory, resolved like pelican.settings.configure_settings"""
+    theme = settings['THEME']
+    if not os.path.isdir(theme):
+        theme = os.path.join(os.path.dirname(os.path.abspath(pelican.__file__)),
+                             'themes', theme)
+    return theme
+
+
+
+def subsite_fingerprint(settings, lang, records):
+    """Return the fingerprint of the inputs of the sub-site for lang
+
+    settings are the (not yet configured) settings of the sub-site, records
+    the content_record of every content object of the top-level site.
+    """
+    sha = hashlib.sha1()
+    fingerprinted_settings = dict(settings)
+    # the overrides of other languages do not matter, only the languages do
+    fingerprinted_settings['I18N_SUBSITES'] = sorted(settings.get('I18N_SUBSITES', {}))
+    for name in BUILD_SETTINGS:
+        fingerprinted_settings.pop(name, None)
+    _update(sha, stable_repr(fingerprinted_settings))
+
+    group_langs = {}
+    for record in records:
+        group_langs.setdefault(record['group'], set()).add(record['lang'])
+    sources = set()
+    for record in sorted(records, key=lambda record: record['source_path']):
+        path = record['source_path']
+        sources.add(path)
+        if record['lang'] == lang or lang not in group_langs[record['group']]:
+            _update(sha, 'full', path, file_digest(path) if os.path.exists(path) else None)
+        else:
+            _update(sha, 'linked', path, record['metadata'])
+    _update_with_tree(sha, settings['PATH'], skip=sources)
+
+    theme = theme_path(settings)
+    _update_with_tree(sha, theme)
+    for path in settings.get('THEME_TEMPLATES_OVERRIDES',
+                             settings.get('EXTRA_TEMPLATES_PATHS', [])):
+        _update_with_tree(sha, path)
+    localedir = settings.get('I18N_GETTEXT_LOCALEDIR')
+    if localedir is None:
+        localedir = os.path.join(theme, 'translations')
+    _update_with_tree(sha, os.path.join(localedir, lang), digest=True)
+    return sha.hexdigest()
+
+
+
+def manifest_path(settings, lang):
+    return os.path.join(settings.get('CACHE_PATH', 'cache'), 'i18n_subsites', lang + '.json')
+
+
+
+def is_up_to_date(settings, lang, fingerprint):
+    """Whether the sub-site was generated with this fingerprint and its output is intact"""
+    try:
+        with open(manifest_path(settings, lang)) as fh:
+            manifest = json.load(fh)
+    except (IOError, OSError, ValueError):
+        return False
+    if manifest.get('fingerprint') != fingerprint:
+        return False
+    output_path = settings['OUTPUT_PATH']
+    for relpath, size in manifest.get('files', {}).items():
+        path = os.path.join(output_path, relpath)
+        if not os.path.isfile(path) or os.path.getsize(path) != size:
+            return False
+    return True
+
+
+
+def forget_subsite(settings, lang):
+    """Remove the manifest of a sub-site about to be (re)generated"""
+    path = manifest_path(settings, lang)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+
+def save_manifest(settings, lang, fingerprint):
+    """Record the fingerprint and the output of a successfully generated sub-site"""
+    output_path = settings['OUTPUT_PATH']
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(output_path):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            files[os.path.relpath(path, output_path)] = os.path.getsize(path)
+    path = manifest_path(settings, lang)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'w') as fh:
+        json.dump({'fingerprint': fingerprint, 'files': files}, fh)
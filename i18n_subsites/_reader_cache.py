@@ -0,0 +1,105 @@
+"""Reader cache shared by the top-level site and the i18n sub-sites
+
+Every sub-site reads the same source files as the top-level site. With
+I18N_SUBSITES_SHARE_CONTENT enabled, the readers are replaced by subclasses
+which keep what the reader returned (the content and the metadata) in memory,
+keyed by the source path, a digest of the source and the settings the reader
+depends on. The sub-sites, generated later in the same process or in processes
+forked from it, then only build the content objects and write them.
+"""
+
+import os
+import hashlib
+
+from pelican.readers import RstReader
+from pelican.urlwrappers import URLWrapper
+
+
+
+# Settings that change what the readers return
+READER_SETTINGS = ('READERS', 'MARKDOWN', 'MD_EXTENSIONS',
+                   'DOCUTILS_SETTINGS', 'FORMATTED_FIELDS')
+
+# source path -> {(digest, reader settings): (content, metadata)}
+_cache = {}
+# (path, mtime, size) -> digest
+_file_digests = {}
+# reader class -> caching subclass
+_caching_classes = {}
+
+
+
+def file_digest(path):
+    """Return the sha1 hex digest of the file at path, hashed only once per version"""
+    stat = os.stat(path)
+    key = (path, stat.st_mtime, stat.st_size)
+    if key not in _file_digests:
+        sha = hashlib.sha1()
+        with open(path, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(1 << 16), b''):
+                sha.update(chunk)
+        _file_digests[key] = sha.hexdigest()
+    return _file_digests[key]
+
+
+
+def reader_settings_key(reader):
+    """Return the part of the cache key depending on the settings of reader"""
+    names = READER_SETTINGS
+    if isinstance(reader, RstReader):    # docutils is localized by DEFAULT_LANG
+        names += ('DEFAULT_LANG',)
+    return repr([type(reader).__name__] +
+                [(name, reader.settings.get(name)) for name in names])
+
+
+
+def _rebind(value, settings):
+    """Recreate tags, categories and authors with the settings of the (sub-)site"""
+    if isinstance(value, URLWrapper):
+        return value.__class__(value.name, settings)
+    if isinstance(value, list):
+        return [_rebind(item, settings) for item in value]
+    return value
+
+
+
+def caching_reader_class(cls):
+    """Return a subclass of the reader class cls sharing its results through the cache
+
+    The subclass keeps the name of cls, as Pelican derives the 'reader'
+    metadata from it.
+    """
+    if cls not in _caching_classes:
+        def read(self, source_path):
+            path = os.path.abspath(source_path)
+            key = (file_digest(path), reader_settings_key(self))
+            entries = _cache.get(path, {})
+            if key in entries:
+                content, metadata = entries[key]
+            else:
+                content, metadata = cls.read(self, source_path)
+                if not any(digest == key[0] for digest, _ in entries):
+                    entries = _cache[path] = {}     # drop outdated versions
+                entries[key] = content, metadata
+            return content, dict((name, _rebind(value, self.settings))
+                                 for name, value in metadata.items())
+
+        _caching_classes[cls] = type(cls.__name__, (cls,), {
+            'read': read,
+            '__module__': cls.__module__,
+            '__doc__': cls.__doc__,
+            })
+    return _caching_classes[cls]
+
+
+
+def install_reader_cache(readers):
+    """Make the readers of a Readers instance share their results
+
+    if I18N_SUBSITES_SHARE_CONTENT is True
+    """
+    if not readers.settings.get('I18N_SUBSITES_SHARE_CONTENT', False):
+        return
+    for fmt, cls in list(readers.reader_classes.items()):
+        if cls and cls not in _caching_classes.values():
+            readers.reader_classes[fmt] = caching_reader_class(cls)
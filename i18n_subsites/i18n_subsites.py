@@ -5,6 +5,8 @@
 import os
 import six
 import logging
+import traceback
+import multiprocessing
 from itertools import chain
 from collections import defaultdict, OrderedDict
 
@@ -15,6 +17,8 @@ from pelican.contents import Page, Article
 from pelican.settings import configure_settings
 
 from ._regenerate_context_helpers import regenerate_context_articles
+from ._reader_cache import install_reader_cache
+from . import _incremental_helpers as incremental
 
 
 
@@ -23,6 +27,8 @@ _main_site_generated = False
 _main_site_lang = "en"
 _main_siteurl = ''
 _lang_siteurls = None
+_main_site_contents = []    # content records for I18N_SUBSITES_INCREMENTAL
+_fingerprints = {}          # lang -> fingerprint of the subsites being generated
 logger = logging.getLogger(__name__)
 
 
@@ -55,6 +61,11 @@ def create_lang_subsites(pelican_obj):
     and set DEFAULT_LANG to the language code to change perception of what is translated
     and set DELETE_OUTPUT_DIRECTORY to False to prevent deleting output from previous runs
     Then generate the subsite using a PELICAN_CLASS instance and its run method.
+
+    With I18N_SUBSITES_WORKERS > 1 the subsites are generated in that many
+    separate processes, see build_subsites_in_workers.
+    With I18N_SUBSITES_INCREMENTAL subsites whose inputs did not change are
+    skipped, see _incremental_helpers.
     """
     global _main_site_generated
     if _main_site_generated:      # make sure this is only called once
@@ -63,25 +74,146 @@ def create_lang_subsites(pelican_obj):
         _main_site_generated = True
 
     orig_settings = pelican_obj.settings
-    for lang, overrides in orig_settings.get('I18N_SUBSITES', {}).items():
-        settings = orig_settings.copy()
-        settings.update(overrides)
-        settings['SITEURL'] = _lang_siteurls[lang]
-        settings['OUTPUT_PATH'] = os.path.join(orig_settings['OUTPUT_PATH'], lang, '')
-        settings['DEFAULT_LANG'] = lang   # to change what is perceived as translations
-        settings['DELETE_OUTPUT_DIRECTORY'] = False  # prevent deletion of previous runs
-        settings = configure_settings(settings)      # to set LOCALE, etc.
+    langs = list(orig_settings.get('I18N_SUBSITES', {}).keys())
+    workers = orig_settings.get('I18N_SUBSITES_WORKERS', 1) or 1
+    try:
+        if orig_settings.get('I18N_SUBSITES_INCREMENTAL', False):
+            langs = [lang for lang in langs if not is_up_to_date(orig_settings, lang)]
+        if workers > 1 and len(langs) > 1 and hasattr(os, 'fork'):
+            build_subsites_in_workers(orig_settings, langs, workers)
+        else:
+            for lang in langs:
+                build_subsite(orig_settings, lang)
+                subsite_generated(orig_settings, lang)
+    finally:
+        _fingerprints.clear()
+        del _main_site_contents[:]
+        _main_site_generated = False          # for autoreload mode
+
+
+
+def subsite_settings(orig_settings, lang):
+    """Return the settings of the subsite for lang, not configured yet"""
+    settings = orig_settings.copy()
+    settings.update(orig_settings['I18N_SUBSITES'][lang])
+    settings['SITEURL'] = _lang_siteurls[lang]
+    settings['OUTPUT_PATH'] = os.path.join(orig_settings['OUTPUT_PATH'], lang, '')
+    settings['DEFAULT_LANG'] = lang   # to change what is perceived as translations
+    settings['DELETE_OUTPUT_DIRECTORY'] = False  # prevent deletion of previous runs
+    return settings
+
+
+
+def is_up_to_date(orig_settings, lang):
+    """Fingerprint the inputs of the subsite for lang and check its last generation
+
+    The subsite is up to date if it was generated with the same fingerprint
+    and all of its output is still there. Otherwise the fingerprint is kept
+    to be saved once the subsite has been generated.
+    """
+    settings = subsite_settings(orig_settings, lang)
+    fingerprint = incremental.subsite_fingerprint(settings, lang, _main_site_contents)
+    if incremental.is_up_to_date(settings, lang, fingerprint):
+        logger.info("i18n subsite for lang '{}' is up to date, skipping it".format(lang))
+        return True
+    incremental.forget_subsite(settings, lang)
+    _fingerprints[lang] = fingerprint
+    return False
+
+
+
+def subsite_generated(orig_settings, lang):
+    """Save the manifest of a successfully generated subsite"""
+    if lang in _fingerprints:
+        incremental.save_manifest(subsite_settings(orig_settings, lang), lang,
+                                  _fingerprints[lang])
+
+
+
+def build_subsite(orig_settings, lang):
+    """Generate the subsite for lang from the settings of the main site"""
+    settings = subsite_settings(orig_settings, lang)
+    settings = configure_settings(settings)      # to set LOCALE, etc.
+
+    cls = settings['PELICAN_CLASS']
+    if isinstance(cls, six.string_types):
+        module, cls_name = cls.rsplit('.', 1)
+        module = __import__(module)
+        cls = getattr(module, cls_name)
+
+    pelican_obj = cls(settings)
+    logger.debug("Generating i18n subsite for lang '{}' using class '{}'".format(lang, str(cls)))
+    pelican_obj.run()
+
 
-        cls = settings['PELICAN_CLASS']
-        if isinstance(cls, six.string_types):
-            module, cls_name = cls.rsplit('.', 1)
-            module = __import__(module)
-            cls = getattr(module, cls_name)
 
-        pelican_obj = cls(settings)
-        logger.debug("Generating i18n subsite for lang '{}' using class '{}'".format(lang, str(cls)))
-        pelican_obj.run()
-    _main_site_generated = False          # for autoreload mode
+# Settings of the main site, inherited by the forked worker processes
+_worker_settings = None
+
+
+class _RecordCollector(logging.Handler):
+    """Keep the log records of a subsite build to send them to the parent"""
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        message = record.getMessage()
+        if record.exc_info:
+            message += '\n' + logging.Formatter().formatException(record.exc_info)
+        self.records.append((record.name, record.levelno, message))
+
+
+
+def _build_subsite_in_worker(lang):
+    """Generate one subsite in a worker process
+
+    Returns the lang, the collected log records and the formatted traceback
+    of the failure, if any.
+    """
+    collector = _RecordCollector()
+    logging.getLogger().handlers = [collector]
+    try:
+        build_subsite(_worker_settings, lang)
+    except Exception:
+        return lang, collector.records, traceback.format_exc()
+    return lang, collector.records, None
+
+
+
+def build_subsites_in_workers(orig_settings, langs, workers):
+    """Generate the subsites for langs in worker processes
+
+    The workers are forked from the main site process, so every subsite starts
+    from the state the main site build left behind, _main_site_generated
+    included. Each process generates only one subsite. The log records of the
+    subsites are emitted again in the main process, prefixed by the lang.
+    All subsites are generated before the failed ones are reported.
+    """
+    global _worker_settings
+    _worker_settings = orig_settings
+    try:
+        context = multiprocessing.get_context('fork')
+    except AttributeError:                # Python 2 always forks
+        context = multiprocessing
+    pool = context.Pool(workers, maxtasksperchild=1)
+    failed = []
+    try:
+        for lang, records, error in pool.imap_unordered(_build_subsite_in_worker, langs):
+            for name, level, message in records:
+                logging.getLogger(name).log(level, "[{}] {}".format(lang, message))
+            if error is not None:
+                logger.error("Generating i18n subsite for lang '{}' failed:\n{}".format(lang, error))
+                failed.append(lang)
+            else:
+                subsite_generated(orig_settings, lang)
+    finally:
+        pool.close()
+        pool.join()
+        _worker_settings = None
+    if failed:
+        raise RuntimeError("Generating i18n subsites failed for lang(s): {}".format(', '.join(failed)))
 
 
 
@@ -111,8 +243,10 @@ def update_generator_contents(generator, *args):
     Hide content without a translation for current DEFAULT_LANG
     if HIDE_UNTRANSLATED_CONTENT is True
     """
-    generator.translations = []
     is_pages_gen = hasattr(generator, 'pages')
+    if not _main_site_generated and generator.settings.get('I18N_SUBSITES_INCREMENTAL', False):
+        record_contents(generator, is_pages_gen)
+    generator.translations = []
     if is_pages_gen:
         generator.hidden_translations = []
         for page in chain(generator.pages, generator.hidden_pages):
@@ -147,6 +281,18 @@ def update_generator_contents(generator, *args):
 
 
 
+def record_contents(generator, is_pages_gen):
+    """Record the content of the main site with its translations, before they are removed"""
+    kind = 'PAGE' if is_pages_gen else 'ARTICLE'
+    translation_id = generator.settings.get(kind + '_TRANSLATION_ID', 'slug')
+    for name in ('articles', 'translations', 'drafts', 'drafts_translations',
+                 'pages', 'hidden_pages', 'hidden_translations',
+                 'draft_pages', 'draft_translations'):
+        for content_object in getattr(generator, name, []):
+            _main_site_contents.append(incremental.content_record(content_object, translation_id))
+
+
+
 def install_templates_translations(generator):
     """Install gettext translations for current DEFAULT_LANG in the jinja2.Environment
 
@@ -183,6 +329,7 @@ def install_templates_translations(generator):
 
 def register():
     signals.initialized.connect(disable_lang_vars)
+    signals.readers_init.connect(install_reader_cache)
     signals.generator_init.connect(install_templates_translations)
     signals.article_generator_finalized.connect(update_generator_contents)
     signals.page_generator_finalized.connect(update_generator_contents)
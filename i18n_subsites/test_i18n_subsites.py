@@ -0,0 +1,207 @@
+import filecmp
+import os
+import shutil
+import tempfile
+import unittest
+
+from pelican import Pelican, signals
+from pelican.readers import MarkdownReader
+from pelican.settings import DEFAULT_CONFIG, read_settings
+from pelican.urlwrappers import Tag
+
+from i18n_subsites import _reader_cache, _incremental_helpers
+
+
+class CountingReader(MarkdownReader):
+    calls = 0
+
+    def read(self, source_path):
+        CountingReader.calls += 1
+        return super(CountingReader, self).read(source_path)
+
+
+class TestReaderCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_path = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_path, 'article.md')
+        self.write('Title: Test\nTags: foo\n\nBody')
+        CountingReader.calls = 0
+        self.reader_class = _reader_cache.caching_reader_class(CountingReader)
+
+    def tearDown(self):
+        _reader_cache._cache.clear()
+        shutil.rmtree(self.temp_path)
+
+    def write(self, text):
+        with open(self.path, 'w') as fh:
+            fh.write(text)
+
+    def settings(self, **overrides):
+        settings = DEFAULT_CONFIG.copy()
+        settings.update(overrides)
+        return settings
+
+    def read(self, settings):
+        return self.reader_class(settings).read(self.path)
+
+    def test_subsites_share_the_result(self):
+        main_settings = self.settings()
+        subsite_settings = self.settings(DEFAULT_LANG='fr',
+                                         TAG_URL='fr/tag/{slug}.html')
+        content, metadata = self.read(main_settings)
+        sub_content, sub_metadata = self.read(subsite_settings)
+        self.assertEqual(CountingReader.calls, 1)
+        self.assertEqual(content, sub_content)
+        self.assertEqual(self.reader_class.__name__, 'CountingReader')
+
+        # tags are bound to the settings of the reading (sub-)site
+        tag, sub_tag = metadata['tags'][0], sub_metadata['tags'][0]
+        self.assertIsInstance(sub_tag, Tag)
+        self.assertEqual(tag.url, 'tag/foo.html')
+        self.assertEqual(sub_tag.url, 'fr/tag/foo.html')
+
+    def test_changed_source_is_read_again(self):
+        self.read(self.settings())
+        self.write('Title: Changed\n\nOther body')
+        content, metadata = self.read(self.settings())
+        self.assertEqual(CountingReader.calls, 2)
+        self.assertEqual(metadata['title'], 'Changed')
+        self.assertEqual(len(_reader_cache._cache[self.path]), 1)
+
+    def test_reader_settings_are_part_of_the_key(self):
+        self.read(self.settings())
+        self.read(self.settings(FORMATTED_FIELDS=[]))
+        self.assertEqual(CountingReader.calls, 2)
+
+
+class TestSubsiteFingerprint(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_path = tempfile.mkdtemp()
+        self.content_path = os.path.join(self.temp_path, 'content')
+        os.mkdir(self.content_path)
+        self.settings = DEFAULT_CONFIG.copy()
+        self.settings.update(PATH=self.content_path,
+                             OUTPUT_PATH=os.path.join(self.temp_path, 'output', 'fr'),
+                             CACHE_PATH=os.path.join(self.temp_path, 'cache'),
+                             I18N_SUBSITES={'fr': {}, 'de': {}})
+        self.records = [
+            self.record('hello-en.md', 'en', 'hello'),
+            self.record('hello-fr.md', 'fr', 'hello'),
+            self.record('only-en.md', 'en', 'only'),
+            self.record('hello-de.md', 'de', 'hello'),
+            ]
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_path)
+
+    def record(self, filename, lang, slug, title='Title'):
+        path = os.path.join(self.content_path, filename)
+        with open(path, 'w') as fh:
+            fh.write(title + ' ' + lang)
+        return {'source_path': path, 'lang': lang, 'group': ('Article', slug),
+                'metadata': _incremental_helpers.stable_repr({'title': title})}
+
+    def fingerprint(self):
+        return _incremental_helpers.subsite_fingerprint(self.settings, 'fr', self.records)
+
+    def test_only_inputs_of_the_subsite_count(self):
+        fingerprint = self.fingerprint()
+        # linked translations only count by their metadata
+        self.record('hello-de.md', 'de', 'hello', title='Other')
+        self.assertEqual(self.fingerprint(), fingerprint)
+        self.settings['I18N_SUBSITES'] = {'fr': {}, 'de': {'SITENAME': 'x'}}
+        self.settings['I18N_SUBSITES_WORKERS'] = 4
+        self.assertEqual(self.fingerprint(), fingerprint)
+
+    def test_changed_inputs(self):
+        fingerprint = self.fingerprint()
+        self.record('hello-fr.md', 'fr', 'hello', title='Changed')
+        self.assertNotEqual(self.fingerprint(), fingerprint)
+
+        fingerprint = self.fingerprint()
+        # shown as a draft in the sub-site
+        self.record('only-en.md', 'en', 'only', title='Changed')
+        self.assertNotEqual(self.fingerprint(), fingerprint)
+
+        fingerprint = self.fingerprint()
+        self.records[3]['metadata'] = 'changed'
+        self.assertNotEqual(self.fingerprint(), fingerprint)
+
+    def test_manifest(self):
+        fingerprint = self.fingerprint()
+        self.assertFalse(_incremental_helpers.is_up_to_date(self.settings, 'fr', fingerprint))
+        os.makedirs(self.settings['OUTPUT_PATH'])
+        output_file = os.path.join(self.settings['OUTPUT_PATH'], 'index.html')
+        with open(output_file, 'w') as fh:
+            fh.write('index')
+        _incremental_helpers.save_manifest(self.settings, 'fr', fingerprint)
+        self.assertTrue(_incremental_helpers.is_up_to_date(self.settings, 'fr', fingerprint))
+        self.assertFalse(_incremental_helpers.is_up_to_date(self.settings, 'fr', 'other'))
+        os.remove(output_file)
+        self.assertFalse(_incremental_helpers.is_up_to_date(self.settings, 'fr', fingerprint))
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'the workers are forked')
+class TestWorkers(unittest.TestCase):
+    """Subsites generated in worker processes or one after the other"""
+
+    def setUp(self):
+        self.temp_path = tempfile.mkdtemp()
+        self.content_path = os.path.join(self.temp_path, 'content')
+        os.mkdir(self.content_path)
+        for lang, title in (('en', 'Hello'), ('fr', 'Bonjour'), ('de', 'Hallo')):
+            with open(os.path.join(self.content_path, 'hello-%s.md' % lang), 'w') as fh:
+                fh.write('Title: {}\nDate: 2020-01-01\nSlug: hello\nLang: {}\n\n'
+                         '{} [home]({{index}})\n'.format(title, lang, title))
+        self.receivers = dict((signal, signal.receivers.copy())
+                              for signal in vars(signals).values()
+                              if hasattr(signal, 'receivers'))
+
+    def tearDown(self):
+        for signal, receivers in self.receivers.items():
+            signal.receivers = receivers
+        _reader_cache._cache.clear()
+        shutil.rmtree(self.temp_path)
+
+    def build(self, workers):
+        output_path = os.path.join(self.temp_path, 'output%d' % workers)
+        plugin_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        settings = read_settings(override={
+            'PATH': self.content_path, 'OUTPUT_PATH': output_path,
+            'CACHE_PATH': os.path.join(self.temp_path, 'cache%d' % workers),
+            'PLUGIN_PATHS': [plugin_path], 'PLUGINS': ['i18n_subsites'],
+            'SITEURL': '', 'RELATIVE_URLS': True, 'DEFAULT_LANG': 'en',
+            'TIMEZONE': 'UTC', 'FEED_ALL_ATOM': None,
+            'I18N_SUBSITES': {'fr': {}, 'de': {}},
+            'I18N_SUBSITES_WORKERS': workers})
+        # read by install_templates_translations, gone from Pelican 4 settings
+        settings['JINJA_EXTENSIONS'] = []
+        Pelican(settings).run()
+        return output_path
+
+    def assertSameTree(self, left, right):
+        comparison = filecmp.dircmp(left, right)
+        self.assertEqual(comparison.left_only + comparison.right_only, [])
+        _, mismatch, errors = filecmp.cmpfiles(left, right, comparison.common_files,
+                                               shallow=False)
+        self.assertEqual(mismatch + errors, [])
+        for subdir in comparison.common_dirs:
+            self.assertSameTree(os.path.join(left, subdir), os.path.join(right, subdir))
+
+    def test_same_output_as_sequential_build(self):
+        sequential = self.build(1)
+        parallel = self.build(2)
+        self.assertSameTree(sequential, parallel)
+
+        for lang in ('fr', 'de'):
+            with open(os.path.join(parallel, lang, 'hello.html')) as fh:
+                html = fh.read()
+            # relative to the subsite
+            self.assertIn('<a href="./index.html">home</a>', html)
+            self.assertIn('href="./../hello.html" hreflang="en"', html)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -12,6 +12,8 @@ from bs4 import BeautifulSoup
 from pelican import signals
 import re
 
+import sys
+
 interlinks = {}
 
 def getSettings (generator):
@@ -24,11 +26,15 @@ def getSettings (generator):
 			interlinks[key] = value
 
 def content_object_init(instance):
+	soup_cache = sys.modules.get('soup_cache')  # None unless loaded as a plugin
 
 	if instance._content is not None:
 		content = instance._content
 		# use Python's built-in parser so no duplicated html & body tags appear, or use tag.unwrap()
-		text = BeautifulSoup(content, "html.parser")
+		if soup_cache:
+			text = soup_cache.get_soup(instance)
+		else:
+			text = BeautifulSoup(content, "html.parser")
 		
 		if 'a' in content:
 			for link in text.find_all(href=re.compile("(.+?)>")):
@@ -39,7 +45,10 @@ def content_object_init(instance):
 					hi = url.replace(name+">",interlinks[name])
 					link['href'] = hi
 
-		instance._content = text.decode()
+		if soup_cache:
+			soup_cache.soup_modified(instance, text)
+		else:
+			instance._content = text.decode()
 
 def register():
 	signals.generator_init.connect(getSettings)
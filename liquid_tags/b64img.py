@@ -23,11 +23,17 @@ Output
 [1] https://github.com/imathis/octopress/blob/master/plugins/image_tag.rb
 """
 import re
+import os
 import base64
-import urllib2
+import hashlib
+import logging
+import sys
+from six.moves.urllib.request import urlopen
 from .mdx_liquid_tags import LiquidTags
 import six
 
+logger = logging.getLogger(__name__)
+
 SYNTAX = '{% b64img [class name(s)] [http[s]:/]/path/to/image [width [height]] [title text | "title text" ["alt text"]] %}'
 
 # Regular expression to match the entire syntax
@@ -36,23 +42,77 @@ ReImg = re.compile("""(?P<class>\S.*\s+)?(?P<src>(?:https?:\/\/|\/|\S+\/)\S+)(?:
 # Regular expression to split the title and alt text
 ReTitleAlt = re.compile("""(?:"|')(?P<title>[^"']+)?(?:"|')\s+(?:"|')(?P<alt>[^"']+)?(?:"|')""")
 
+DEFAULT_TIMEOUT = 10
+
+# remote url -> content, so that a url is only fetched once per build
+_fetched = {}
+# sha1 of the image -> base64 payload
+_payloads = {}
+
+
+class TooLarge(Exception):
+    """The image is larger than B64IMG_MAX_SIZE"""
+
+
+def _is_remote(src):
+    return '://' in src or src[0:2] == '//'
+
+
+def _check_size(size, max_size):
+    if max_size and size is not None and int(size) > max_size:
+        raise TooLarge()
 
-def _get_file(src):
+
+def _fetch(src, settings, max_size):
+    """ Return the content of a remote file, fetched once per build.
+
+    The file is fetched through the http_cache plugin when it is loaded,
+    which keeps it on disk and revalidates it, otherwise it is downloaded. """
+    if src in _fetched:
+        return _fetched[src]
+    url = 'https:' + src if src[0:2] == '//' else src
+    timeout = settings.get('B64IMG_TIMEOUT')
+    http_cache = sys.modules.get('http_cache')  # None unless loaded as a plugin
+    if http_cache is not None:
+        try:
+            data = http_cache.fetch(url, settings, max_size=max_size,
+                                    timeout=timeout).content
+        except http_cache.TooLarge:
+            raise TooLarge()
+    else:
+        response = urlopen(url, timeout=timeout or DEFAULT_TIMEOUT)
+        _check_size(response.info().get('Content-Length'), max_size)
+        data = response.read()
+    _fetched[src] = data
+    return data
+
+
+def _get_file(src, settings=None, max_size=None):
     """ Return content from local or remote file. """
     try:
-        if '://' in src or src[0:2] == '//':  # Most likely this is remote file
-            response = urllib2.urlopen(src)
-            return response.read()
+        if _is_remote(src):  # Most likely this is remote file
+            return _fetch(src, settings or {}, max_size)
         else:
+            _check_size(os.path.getsize(src), max_size)
             with open(src, 'rb') as fh:
                 return fh.read()
+    except TooLarge:
+        raise
     except Exception as e:
         raise RuntimeError('Error generating base64image: {}'.format(e))
 
 
-def base64image(src):
-    """ Generate base64 encoded image from srouce file. """
-    return base64.b64encode(_get_file(src))
+def base64image(src, settings=None, max_size=None):
+    """ Generate base64 encoded image from srouce file.
+
+    Raises TooLarge if the image is larger than ``max_size`` bytes.
+    """
+    data = _get_file(src, settings, max_size)
+    _check_size(len(data), max_size)
+    key = hashlib.sha1(data).hexdigest()
+    if key not in _payloads:
+        _payloads[key] = base64.b64encode(data)
+    return _payloads[key]
 
 
 @LiquidTags.register('b64img')
@@ -76,7 +136,16 @@ def b64img(preprocessor, tag, markup):
         if not attrs.get('alt'):
             attrs['alt'] = attrs['title']
 
-    attrs['src'] = 'data:;base64,{}'.format(base64image(attrs['src']))
+    settings = preprocessor.configs.config['settings']
+    try:
+        payload = base64image(attrs['src'], settings,
+                              settings.get('B64IMG_MAX_SIZE'))
+    except TooLarge:
+        # link to the image instead of inlining it
+        logger.info('b64img: %s is larger than B64IMG_MAX_SIZE, not inlined',
+                    attrs['src'])
+    else:
+        attrs['src'] = 'data:;base64,{}'.format(payload.decode('ascii'))
 
     # Return the formatted text
     return "<img {0}>".format(' '.join('{0}="{1}"'.format(key, val)
@@ -0,0 +1,75 @@
+"""
+Benchmark of include_code line-range reads
+------------------------------------------
+Compares reading ``lines:X-Y`` of multi-MB generated source files with the
+former ``fh.readlines()`` slicing and with ``include_code.read_code``, which
+only reads the file up to the last line of the range.
+
+Run from the folder containing the ``liquid_tags`` plugin:
+
+    python -m liquid_tags.benchmark_include_code
+"""
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import timeit
+
+from . import include_code
+
+SIZES_MB = (1, 4, 16)
+RANGES = ((1, 40), (1000, 1040), (-40, None))  # negative: from the end
+REPEAT = 5
+
+
+def generate_source(path, size_mb):
+    """Write a python file of about ``size_mb`` MB, return its line count"""
+    line = 'def function_{0:08d}(x):  return x * {0} + 1  # padding\n'
+    count = 0
+    with open(path, 'w') as fh:
+        while fh.tell() < size_mb * 1024 * 1024:
+            fh.write(line.format(count))
+            count += 1
+    return count
+
+
+def readlines_slice(path, first_line, last_line):
+    with open(path) as fh:
+        code = fh.readlines()[first_line - 1: last_line]
+        code[-1] = code[-1].rstrip()
+        return "".join(code)
+
+
+def best_of(func, *args):
+    return min(timeit.repeat(lambda: func(*args), repeat=REPEAT, number=1))
+
+
+def main():
+    tmp = tempfile.mkdtemp()
+    try:
+        print('{0:>6} {1:>17} {2:>12} {3:>12}'.format(
+            'MB', 'lines', 'readlines', 'islice'))
+        for size_mb in SIZES_MB:
+            path = os.path.join(tmp, 'generated_%d.py' % size_mb)
+            line_count = generate_source(path, size_mb)
+            for first_line, last_line in RANGES:
+                if first_line < 0:
+                    first_line, last_line = (line_count + first_line + 1,
+                                             line_count)
+                assert (readlines_slice(path, first_line, last_line) ==
+                        include_code.read_code(path, first_line, last_line))
+
+                results = (
+                    best_of(readlines_slice, path, first_line, last_line),
+                    best_of(include_code.read_code,
+                            path, first_line, last_line))
+                print('{0:>6} {1:>17} {2:>11.2f}ms {3:>11.2f}ms'.format(
+                    size_mb, '%d-%d' % (first_line, last_line),
+                    *[1000 * result for result in results]))
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Tag Cache
+---------
+Small helpers for the liquid tags that keep their results on disk between
+builds.  Entries are JSON files named after a digest of everything the
+result depends on, stored below:
+
+    LIQUID_TAGS_CACHE_PATH = 'cache/liquid_tags'
+
+which defaults to a ``liquid_tags`` folder inside Pelican's ``CACHE_PATH``.
+Set it to ``None`` to disable caching.
+"""
+import hashlib
+import json
+import os
+import sys
+
+import six
+
+
+def cache_dir(settings, name):
+    """Return the cache directory used by ``name``, creating it if needed.
+
+    Returns None when caching is disabled.
+    """
+    root = settings.get('LIQUID_TAGS_CACHE_PATH',
+                        os.path.join(settings.get('CACHE_PATH', 'cache'),
+                                     'liquid_tags'))
+    if not root:
+        return None
+    path = os.path.join(root, name)
+    if not os.path.isdir(path):
+        try:
+            os.makedirs(path)
+        except OSError:
+            # created concurrently by another tag or worker
+            if not os.path.isdir(path):
+                raise
+    return path
+
+
+def digest(*parts):
+    """Hex digest of ``parts`` (text or bytes, None allowed)."""
+    sha = hashlib.sha1()
+    for part in parts:
+        if part is None:
+            part = b'\0none'
+        elif isinstance(part, six.text_type):
+            part = part.encode('utf-8')
+        elif not isinstance(part, bytes):
+            part = six.text_type(part).encode('utf-8')
+        sha.update(part)
+        sha.update(b'\0')
+    return sha.hexdigest()
+
+
+# (path, mtime, size) -> digest, files are only hashed again once changed
+_file_digests = {}
+
+
+def file_digest(path):
+    """Hex digest of the contents of ``path``, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (path, stat.st_mtime, stat.st_size)
+    if key in _file_digests:
+        return _file_digests[key]
+
+    sha = hashlib.sha1()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1 << 16), b''):
+            sha.update(chunk)
+    _file_digests[key] = sha.hexdigest()
+    return _file_digests[key]
+
+
+def load(directory, key):
+    """Return the value stored under ``key``, or None."""
+    if directory is None:
+        return None
+    try:
+        with open(os.path.join(directory, key + '.json'), 'rb') as fh:
+            return json.loads(fh.read().decode('utf-8'))
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def store(directory, key, value):
+    """Store the JSON-serializable ``value`` under ``key``."""
+    if directory is None:
+        return
+    _write(os.path.join(directory, key + '.json'),
+           json.dumps(value).encode('utf-8'))
+
+
+def _write(path, data):
+    """Write atomically with http_cache when it is loaded, so that concurrent
+    builds or workers never see a partial entry.  Without it, a partial entry
+    fails to load and is computed again."""
+    http_cache = sys.modules.get('http_cache')  # None unless loaded as a plugin
+    if http_cache is not None:
+        http_cache.write_file(path, data)
+        return
+    with open(path, 'wb') as fh:
+        fh.write(data)
@@ -31,6 +31,7 @@ in the STATIC_PATHS setting, e.g.:
 """
 import re
 import os
+from itertools import islice
 from .mdx_liquid_tags import LiquidTags
 
 
@@ -49,7 +50,34 @@ FORMAT = re.compile(r"""
 """, re.VERBOSE)
 
 
-@LiquidTags.register('include_code')
+def read_code(path, first_line=None, last_line=None):
+    """Return the contents of ``path``, or only lines first_line to
+    last_line (1-based, inclusive) without reading the rest of the file.
+
+    A range running past the end of the file stops at its last line."""
+    with open(path) as fh:
+        if first_line is None:
+            return fh.read()
+        code = list(islice(fh, max(first_line - 1, 0), last_line))
+    if not code:
+        raise ValueError("Lines {0}-{1} are past the end of {2}".format(
+            first_line, last_line, path))
+    code[-1] = code[-1].rstrip()
+    return "".join(code)
+
+
+def code_path(settings, src):
+    code_dir = settings.get('CODE_DIR', 'code')
+    return os.path.join('content', code_dir, src)
+
+
+def included_files(preprocessor, markup):
+    """The file an include_code tag depends on, for the tag cache"""
+    src = FORMAT.search(markup).group('src')
+    return [code_path(preprocessor.configs.config['settings'], src)]
+
+
+@LiquidTags.register('include_code', cacheable=True, files=included_files)
 def include_code(preprocessor, tag, markup):
 
     title = None
@@ -73,18 +101,15 @@ def include_code(preprocessor, tag, markup):
 
     settings = preprocessor.configs.config['settings']
     code_dir = settings.get('CODE_DIR', 'code')
-    code_path = os.path.join('content', code_dir, src)
+    path = code_path(settings, src)
 
-    if not os.path.exists(code_path):
-        raise ValueError("File {0} could not be found".format(code_path))
+    if not os.path.exists(path):
+        raise ValueError("File {0} could not be found".format(path))
 
-    with open(code_path) as fh:
-        if lines:
-            code = fh.readlines()[first_line - 1: last_line]
-            code[-1] = code[-1].rstrip()
-            code = "".join(code)
-        else:
-            code = fh.read()
+    if lines:
+        code = read_code(path, first_line, last_line)
+    else:
+        code = read_code(path)
 
     if not title and hide_filename:
         raise ValueError("Either title must be specified or filename must "
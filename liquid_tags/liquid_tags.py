@@ -1,5 +1,9 @@
+import logging
+
 from pelican import signals
-from .mdx_liquid_tags import LiquidTags
+from .mdx_liquid_tags import LiquidTags, tag_profile
+
+logger = logging.getLogger(__name__)
 
 
 def addLiquidTags(gen):
@@ -12,5 +16,17 @@ def addLiquidTags(gen):
         gen.settings['MD_EXTENSIONS'].append(LiquidTags(configs))
 
 
+def report_profile(pelican):
+    profile = tag_profile()
+    if not profile:
+        return
+    lines = ['{0:<16} {1:>8} {2:>10.3f}s {3:>10.2f}ms'.format(
+                 tag, calls, seconds, 1000 * seconds / calls)
+             for tag, calls, seconds in profile]
+    logger.info('Liquid tags profile (tag, calls, total, per call):\n%s',
+                '\n'.join(lines))
+
+
 def register():
     signals.initialized.connect(addLiquidTags)
+    signals.finalized.connect(report_profile)
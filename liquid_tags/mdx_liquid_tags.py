@@ -11,53 +11,162 @@ either markdown or html.
 """
 import warnings
 import markdown
-import itertools
+import inspect
 import re
 import os
 from functools import wraps
+from timeit import default_timer
+
+from . import cache
 
 # Define some regular expressions
 LIQUID_TAG = re.compile(r'\{%.*?%\}')
-EXTRACT_TAG = re.compile(r'(?:\s*)(\S+)(?:\s*)')
+STASH_MARKER = '\x02liquid-tags-stash:%d\x03'
+STASH_PLACEHOLDER = re.compile(r'\x02liquid-tags-stash:(\d+)\x03')
 
 
 class _LiquidTagsPreprocessor(markdown.preprocessors.Preprocessor):
     _tags = {}
+    # tag -> [number of calls, cumulative time], with LIQUID_TAGS_PROFILE
+    _profile = {}
+
     def __init__(self, configs):
         self.configs = configs
 
     def run(self, lines):
         page = '\n'.join(lines)
-        liquid_tags = LIQUID_TAG.findall(page)
-
-        for i, markup in enumerate(liquid_tags):
-            # remove {% %}
-            markup = markup[2:-2]
-            tag = EXTRACT_TAG.match(markup).groups()[0]
-            markup = EXTRACT_TAG.sub('', markup, 1)
-            if tag in self._tags:
-                liquid_tags[i] = self._tags[tag](self, tag, markup.strip())
-                
-        # add an empty string to liquid_tags so that chaining works
-        liquid_tags.append('')
- 
-        # reconstruct string
-        page = ''.join(itertools.chain(*zip(LIQUID_TAG.split(page),
-                                            liquid_tags)))
+        settings = self.configs.config.get('settings') or {}
+        profile = settings.get('LIQUID_TAGS_PROFILE', False)
+
+        output = []
+        position = 0
+        for match in LIQUID_TAG.finditer(page):
+            # remove {% %} and split the tag name from its markup
+            parts = match.group()[2:-2].split(None, 1)
+            if not parts or parts[0] not in self._tags:
+                continue
+            tag = parts[0]
+            markup = parts[1].strip() if len(parts) > 1 else ''
+
+            output.append(page[position:match.start()])
+            position = match.end()
+            if profile:
+                start = default_timer()
+                output.append(self._tags[tag](self, tag, markup))
+                stats = self._profile.setdefault(tag, [0, 0.])
+                stats[0] += 1
+                stats[1] += default_timer() - start
+            else:
+                output.append(self._tags[tag](self, tag, markup))
+        output.append(page[position:])
 
         # resplit the lines
-        return page.split("\n")
+        return ''.join(output).split("\n")
+
+
+class _RecordingStash(object):
+    """Stands in for the markdown html stash while a cached tag runs.
+
+    Stored html is replaced by markers, so that the tag output can be cached
+    and the html stored again in the stash of every document using it.
+    """
+    def __init__(self):
+        self.stashed = []
+
+    def store(self, html, safe=False):
+        self.stashed.append([html, safe])
+        return STASH_MARKER % (len(self.stashed) - 1)
+
+
+class _RecordingConfigs(object):
+    def __init__(self, configs, stash):
+        self._configs = configs
+        self.htmlStash = stash
+
+    def __getattr__(self, name):
+        return getattr(self._configs, name)
+
+
+class _RecordingPreprocessor(object):
+    def __init__(self, preprocessor):
+        self._preprocessor = preprocessor
+        self.stash = _RecordingStash()
+        self.configs = _RecordingConfigs(preprocessor.configs, self.stash)
+
+    def __getattr__(self, name):
+        return getattr(self._preprocessor, name)
+
+
+def _cached_tag(func, files):
+    """Wrap the tag ``func`` so that its output is cached in memory and on
+    disk, keyed by the tag, its markup, the contents of the files returned
+    by ``files(preprocessor, markup)`` and the source of the tag itself."""
+    memo = {}
+    source_digest = []
+
+    @wraps(func)
+    def cached(preprocessor, tag, markup):
+        if files:
+            try:
+                paths = files(preprocessor, markup)
+            except Exception:
+                # invalid markup, let the tag itself report it
+                return func(preprocessor, tag, markup)
+        else:
+            paths = ()
+
+        if not source_digest:
+            try:
+                source_digest.append(
+                    cache.file_digest(inspect.getsourcefile(func)))
+            except TypeError:
+                source_digest.append(None)
+        parts = [tag, markup, source_digest[0]]
+        for path in paths:
+            parts.extend((path, cache.file_digest(path)))
+        key = cache.digest(*parts)
+
+        entry = memo.get(key)
+        if entry is None:
+            settings = preprocessor.configs.config['settings']
+            directory = cache.cache_dir(settings, 'tags')
+            entry = cache.load(directory, key)
+            if entry is None:
+                recorder = _RecordingPreprocessor(preprocessor)
+                entry = {'output': func(recorder, tag, markup),
+                         'stash': recorder.stash.stashed}
+                cache.store(directory, key, entry)
+            memo[key] = entry
+
+        if not entry['stash']:
+            return entry['output']
+        stash = preprocessor.configs.htmlStash
+        placeholders = [stash.store(html, safe) if safe else stash.store(html)
+                        for html, safe in entry['stash']]
+        return STASH_PLACEHOLDER.sub(
+            lambda match: placeholders[int(match.group(1))], entry['output'])
+
+    return cached
 
 
 class LiquidTags(markdown.Extension):
     """Wrapper for MDPreprocessor"""
     @classmethod
-    def register(cls, tag):
-        """Decorator to register a new include tag"""
+    def register(cls, tag, cacheable=False, files=None):
+        """Decorator to register a new include tag
+
+        With ``cacheable=True``, the output of the tag is cached across
+        occurrences and builds, keyed by the tag name and markup and by the
+        contents of the files listed by ``files(preprocessor, markup)``.
+        Only use it for tags whose output depends on nothing else.
+        """
         def dec(func):
             if tag in _LiquidTagsPreprocessor._tags:
                 warnings.warn("Enhanced Markdown: overriding tag '%s'" % tag)
-            _LiquidTagsPreprocessor._tags[tag] = func
+            if cacheable:
+                _LiquidTagsPreprocessor._tags[tag] = _cached_tag(func, files)
+            else:
+                _LiquidTagsPreprocessor._tags[tag] = func
             return func
         return dec
 
@@ -72,6 +181,16 @@ class LiquidTags(markdown.Extension):
                              _LiquidTagsPreprocessor(self), ">html_block")
 
 
+def tag_profile():
+    """Return ``(tag, calls, seconds)`` for every tag run while
+    LIQUID_TAGS_PROFILE was enabled, slowest first, and reset the counters."""
+    profile = sorted(((tag, calls, seconds) for tag, (calls, seconds)
+                      in _LiquidTagsPreprocessor._profile.items()),
+                     key=lambda item: item[2], reverse=True)
+    _LiquidTagsPreprocessor._profile.clear()
+    return profile
+
+
 def makeExtension(configs=None):
     """Wrapper for a MarkDown extension"""
     return LiquidTags(configs=configs)
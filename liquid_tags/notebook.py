@@ -46,9 +46,16 @@ still be some conflicts.
 """
 import re
 import os
+import logging
+import multiprocessing
 from functools import partial
 
+from pelican import signals
+
 from .mdx_liquid_tags import LiquidTags
+from . import cache
+
+logger = logging.getLogger(__name__)
 
 from distutils.version import LooseVersion
 import IPython
@@ -77,7 +84,7 @@ except ImportError:
     from IPython.nbconvert.transformers import Transformer as Preprocessor
 
 from IPython.utils.traitlets import Integer
-from copy import deepcopy
+from copy import copy
 
 from jinja2 import DictLoader
 
@@ -208,10 +215,14 @@ class SubCell(Preprocessor):
                      help="last cell of notebook to be converted")
 
     def preprocess(self, nb, resources):
-        nbc = deepcopy(nb)
-        for worksheet in nbc.worksheets:
-            cells = worksheet.cells[:]
-            worksheet.cells = cells[self.start:self.end]
+        # only the containers are copied: the cells themselves are not
+        # modified, and the notebook is parsed afresh for every conversion
+        nbc = copy(nb)
+        nbc.worksheets = []
+        for worksheet in nb.worksheets:
+            worksheet = copy(worksheet)
+            worksheet.cells = worksheet.cells[self.start:self.end]
+            nbc.worksheets.append(worksheet)
         return nbc, resources
 
     call = preprocess # IPython < 2.0
@@ -236,8 +247,85 @@ SYNTAX = "{% notebook /path/to/notebook.ipynb [ cells[start:end] ] [ language[la
 FORMAT = re.compile(r"""^(\s+)?(?P<src>\S+)(\s+)?((cells\[)(?P<start>-?[0-9]*):(?P<end>-?[0-9]*)(\]))?(\s+)?((language\[)(?P<language>-?[a-z0-9\+\-]*)(\]))?(\s+)?$""")
 
 
-@LiquidTags.register('notebook')
-def notebook(preprocessor, tag, markup):
+def get_template_file():
+    """Name of the nbconvert template to use for this IPython version"""
+    template_file = 'basic'
+    if LooseVersion(IPython.__version__) >= '2.0':
+        if os.path.exists('pelicanhtml_2.tpl'):
+            template_file = 'pelicanhtml_2'
+    else:
+        if os.path.exists('pelicanhtml_1.tpl'):
+            template_file = 'pelicanhtml_1'
+    return template_file
+
+
+# exporters are reused for every notebook sharing a template and cell slice
+_exporters = {}
+
+
+def get_exporter(template_file, start, end, language):
+    key = (template_file, start, end, language)
+    if key in _exporters:
+        return _exporters[key]
+
+    language_applied_highlighter = partial(custom_highlighter, language=language)
+
+    # Create the custom notebook converter
+    c = Config({'CSSHTMLHeaderTransformer':
+                    {'enabled':True, 'highlight_class':'.highlight-ipynb'},
+                'SubCell':
+                    {'enabled':True, 'start':start, 'end':end}})
+
+    if LooseVersion(IPython.__version__) >= '2.0':
+        subcell_kwarg = dict(preprocessors=[SubCell])
+    else:
+        subcell_kwarg = dict(transformers=[SubCell])
+
+    exporter = HTMLExporter(config=c,
+                            template_file=template_file,
+                            filters={'highlight2html': language_applied_highlighter},
+                            **subcell_kwarg)
+    _exporters[key] = exporter
+    return exporter
+
+
+def render_notebook(nb_text, start, end, language, template_file):
+    """Convert the notebook source ``nb_text`` to html.
+
+    Returns the html body and the list of css blocks the notebook needs.
+    """
+    exporter = get_exporter(template_file, start, end, language)
+    nb_json = nbformat.reads_json(nb_text.decode('utf-8'))
+    (body, resources) = exporter.from_notebook_node(nb_json)
+    return body, resources['inlining']['css']
+
+
+def cached_render_notebook(settings, nb_path, start, end, language):
+    """``render_notebook`` backed by the on-disk notebook cache.
+
+    The cache key covers the notebook contents, the cell slice, the
+    highlighting language, the template and the IPython version, so a
+    notebook is only converted again when one of them changed.
+    """
+    template_file = get_template_file()
+    with open(nb_path, 'rb') as f:
+        nb_text = f.read()
+
+    directory = cache.cache_dir(settings, 'notebook')
+    key = cache.digest(nb_text, start, end, language, template_file,
+                       cache.file_digest(template_file + '.tpl'),
+                       IPython.__version__)
+    cached = cache.load(directory, key)
+    if cached is not None:
+        return cached['body'], cached['css']
+
+    body, css = render_notebook(nb_text, start, end, language, template_file)
+    cache.store(directory, key, {'body': body, 'css': css})
+    return body, css
+
+
+def parse_markup(markup, settings):
+    """Return the notebook path, cell slice and language of a notebook tag"""
     match = FORMAT.search(markup)
     if match:
         argdict = match.groupdict()
@@ -259,44 +347,100 @@ def notebook(preprocessor, tag, markup):
     else:
         end = None
 
-    language_applied_highlighter = partial(custom_highlighter, language=language)
-
-    settings = preprocessor.configs.config['settings']
     nb_dir =  settings.get('NOTEBOOK_DIR', 'notebooks')
     nb_path = os.path.join('content', nb_dir, src)
+    return nb_path, start, end, language
 
-    if not os.path.exists(nb_path):
-        raise ValueError("File {0} could not be found".format(nb_path))
 
-    # Create the custom notebook converter
-    c = Config({'CSSHTMLHeaderTransformer':
-                    {'enabled':True, 'highlight_class':'.highlight-ipynb'},
-                'SubCell':
-                    {'enabled':True, 'start':start, 'end':end}})
+#----------------------------------------------------------------------
+# Ahead-of-time conversion: with NOTEBOOK_WORKERS set, every notebook
+# referenced from the markdown content is converted on a process pool as
+# soon as Pelican is initialized.  The tag handler then only waits for the
+# result of its notebook.
+NOTEBOOK_TAG = re.compile(r'\{%\s*notebook\s+(.*?)%\}')
+
+# (nb_path, start, end, language) -> AsyncResult of cached_render_notebook
+_prerendered = {}
+_pool = None
+
+
+def find_notebook_tags(settings):
+    """Yield the markup of every notebook tag in the markdown content"""
+    from pelican.readers import MarkdownReader
+    extensions = tuple('.' + ext for ext in MarkdownReader.file_extensions)
+    for root, dirs, files in os.walk(settings['PATH'], followlinks=True):
+        for filename in files:
+            if not filename.endswith(extensions):
+                continue
+            with open(os.path.join(root, filename), 'rb') as f:
+                text = f.read().decode('utf-8', 'replace')
+            for match in NOTEBOOK_TAG.finditer(text):
+                yield match.group(1).strip()
+
+
+def prerender_notebooks(pelican):
+    global _pool
+    settings = pelican.settings
+    workers = settings.get('NOTEBOOK_WORKERS')
+    if not workers:
+        return
+
+    # only the cache settings are sent to the workers, the full settings
+    # are not necessarily picklable
+    cache_settings = dict((key, settings[key])
+                          for key in ('CACHE_PATH', 'LIQUID_TAGS_CACHE_PATH')
+                          if key in settings)
+    jobs = set()
+    for markup in find_notebook_tags(settings):
+        try:
+            args = parse_markup(markup, settings)
+        except ValueError:
+            continue  # reported by the tag handler
+        if os.path.exists(args[0]):
+            jobs.add(args)
+    if not jobs:
+        return
+
+    # the workers must be forked: Pelican loads the plugin from PLUGIN_PATHS,
+    # which a spawned worker cannot import it from
+    try:
+        context = multiprocessing.get_context('fork')
+    except AttributeError:                # Python 2 always forks
+        context = multiprocessing
+    except ValueError:                    # e.g. Windows
+        logger.warning('NOTEBOOK_WORKERS is ignored, processes cannot be '
+                       'forked on this platform; notebooks are converted '
+                       'one after another')
+        return
+    _pool = context.Pool(workers)
+    for args in jobs:
+        _prerendered[args] = _pool.apply_async(cached_render_notebook,
+                                               (cache_settings,) + args)
+    _pool.close()
+
+
+def join_pool(pelican):
+    global _pool
+    if _pool is not None:
+        _pool.join()
+        _pool = None
+    _prerendered.clear()
 
-    template_file = 'basic'
-    if LooseVersion(IPython.__version__) >= '2.0':
-        if os.path.exists('pelicanhtml_2.tpl'):
-            template_file = 'pelicanhtml_2'
-    else:
-        if os.path.exists('pelicanhtml_1.tpl'):
-            template_file = 'pelicanhtml_1'
 
-    if LooseVersion(IPython.__version__) >= '2.0':
-        subcell_kwarg = dict(preprocessors=[SubCell])
-    else:
-        subcell_kwarg = dict(transformers=[SubCell])
-    
-    exporter = HTMLExporter(config=c,
-                            template_file=template_file,
-                            filters={'highlight2html': language_applied_highlighter},
-                            **subcell_kwarg)
+@LiquidTags.register('notebook')
+def notebook(preprocessor, tag, markup):
+    settings = preprocessor.configs.config['settings']
+    nb_path, start, end, language = parse_markup(markup, settings)
 
-    # read and parse the notebook
-    with open(nb_path) as f:
-        nb_text = f.read()
-    nb_json = nbformat.reads_json(nb_text)
-    (body, resources) = exporter.from_notebook_node(nb_json)
+    if not os.path.exists(nb_path):
+        raise ValueError("File {0} could not be found".format(nb_path))
+
+    prerendered = _prerendered.get((nb_path, start, end, language))
+    if prerendered is not None:
+        body, css = prerendered.get()
+    else:
+        body, css = cached_render_notebook(settings, nb_path, start, end,
+                                           language)
 
     # if we haven't already saved the header, save it here.
     if not notebook.header_saved:
@@ -304,7 +448,7 @@ def notebook(preprocessor, tag, markup):
                "this should be included in the theme. **\n")
 
         header = '\n'.join(CSS_WRAPPER.format(css_line)
-                           for css_line in resources['inlining']['css'])
+                           for css_line in css)
         header += JS_INCLUDE
 
         with open('_nb_header.html', 'w') as f:
@@ -321,4 +465,10 @@ notebook.header_saved = False
 
 #----------------------------------------------------------------------
 # This import allows notebook to be a Pelican plugin
-from liquid_tags import register
+from liquid_tags import register as register_liquid_tags
+
+
+def register():
+    register_liquid_tags()
+    signals.initialized.connect(prerender_notebooks)
+    signals.finalized.connect(join_pool)
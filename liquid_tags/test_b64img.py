@@ -0,0 +1,153 @@
+import base64
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+from pelican.tests.support import unittest
+from six.moves import BaseHTTPServer
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from http_cache import http_cache
+
+from . import b64img
+
+IMAGE = b'\x89PNG remote image data'
+
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    requests = []
+
+    def do_GET(self):
+        Handler.requests.append(self.headers.get('If-None-Match'))
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(IMAGE)))
+        self.send_header('ETag', '"v1"')
+        self.end_headers()
+        self.wfile.write(IMAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeConfigs(object):
+    def __init__(self, settings):
+        self.config = {'settings': settings}
+
+
+class FakePreprocessor(object):
+    def __init__(self, settings):
+        self.configs = FakeConfigs(settings)
+
+
+class TestB64Img(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.image = os.path.join(self.tmp, 'ninja.png')
+        with open(self.image, 'wb') as fh:
+            fh.write(b'\x89PNG fake image data')
+        self.settings = {'LIQUID_TAGS_CACHE_PATH': self.tmp}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_inline_image(self):
+        preprocessor = FakePreprocessor(self.settings)
+        output = b64img.b64img(preprocessor, 'b64img', self.image + ' Ninja')
+        expected = base64.b64encode(b'\x89PNG fake image data')
+        self.assertIn('src="data:;base64,{0}"'.format(
+            expected.decode('ascii')), output)
+        self.assertIn('alt="Ninja"', output)
+
+    def test_payload_is_memoized(self):
+        first = b64img.base64image(self.image)
+        self.assertIs(first, b64img.base64image(self.image))
+
+    def test_size_cap_falls_back_to_url(self):
+        self.settings['B64IMG_MAX_SIZE'] = 4
+        preprocessor = FakePreprocessor(self.settings)
+        output = b64img.b64img(preprocessor, 'b64img', self.image)
+        self.assertEqual(output, '<img src="{0}">'.format(self.image))
+
+    def test_missing_file(self):
+        self.assertRaises(RuntimeError, b64img.base64image,
+                          os.path.join(self.tmp, 'missing.png'))
+
+
+class TestRemoteB64Img(unittest.TestCase):
+
+    def setUp(self):
+        self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.url = 'http://127.0.0.1:%d/ninja.png' % self.server.server_port
+        self.tmp = tempfile.mkdtemp()
+        self.settings = {'HTTP_CACHE_PATH': self.tmp, 'HTTP_CACHE_TTL': 0,
+                         'B64IMG_TIMEOUT': 5}
+        Handler.requests = []
+        b64img._fetched.clear()
+
+    def tearDown(self):
+        b64img._fetched.clear()
+        http_cache.close()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmp)
+
+    def build(self, max_size=None):
+        """base64image of the remote image, in a new build"""
+        b64img._fetched.clear()
+        return b64img.base64image(self.url, self.settings, max_size)
+
+    def test_fetched_once_per_build(self):
+        expected = base64.b64encode(IMAGE)
+        # http_cache is not loaded as a plugin
+        patcher = mock.patch.dict(sys.modules)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        sys.modules.pop('http_cache', None)
+
+        self.assertEqual(b64img.base64image(self.url, self.settings),
+                         expected)
+        self.assertEqual(b64img.base64image(self.url, self.settings),
+                         expected)
+        self.assertEqual(Handler.requests, [None])
+        # nothing is kept between builds
+        self.assertEqual(self.build(), expected)
+        self.assertEqual(Handler.requests, [None, None])
+        self.assertRaises(b64img.TooLarge, self.build, 4)
+
+    def test_fetched_through_http_cache(self):
+        expected = base64.b64encode(IMAGE)
+        with mock.patch.dict(sys.modules, {'http_cache': http_cache}):
+            with mock.patch.object(http_cache, 'fetch',
+                                   wraps=http_cache.fetch) as fetch:
+                self.assertEqual(self.build(), expected)
+            fetch.assert_called_once_with(self.url, self.settings,
+                                          max_size=None, timeout=5)
+            # revalidated with the ETag of the cached copy
+            self.assertEqual(self.build(), expected)
+            self.assertEqual(Handler.requests, [None, '"v1"'])
+
+            self.assertRaises(b64img.TooLarge, self.build, 4)
+            preprocessor = FakePreprocessor(dict(self.settings,
+                                                 B64IMG_MAX_SIZE=4))
+            b64img._fetched.clear()
+            self.assertEqual(b64img.b64img(preprocessor, 'b64img', self.url),
+                             '<img src="{0}">'.format(self.url))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import shutil
+import tempfile
+
+from pelican.tests.support import unittest
+
+from . import cache
+
+
+class TestTagCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.settings = {'LIQUID_TAGS_CACHE_PATH': self.tmp}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_store_and_load(self):
+        directory = cache.cache_dir(self.settings, 'notebook')
+        self.assertTrue(os.path.isdir(directory))
+        key = cache.digest(b'{}', 0, None, u'julia')
+        self.assertIsNone(cache.load(directory, key))
+        cache.store(directory, key, {'body': u'<p>☃</p>', 'css': []})
+        self.assertEqual(cache.load(directory, key),
+                         {'body': u'<p>☃</p>', 'css': []})
+
+    def test_digest_distinguishes_parts(self):
+        self.assertNotEqual(cache.digest('ab', 'c'), cache.digest('a', 'bc'))
+        self.assertNotEqual(cache.digest(None), cache.digest('None'))
+        self.assertEqual(cache.digest(u'x', 1), cache.digest(b'x', '1'))
+
+    def test_disabled(self):
+        self.assertIsNone(cache.cache_dir({'LIQUID_TAGS_CACHE_PATH': None},
+                                          'notebook'))
+        cache.store(None, 'key', 'value')
+        self.assertIsNone(cache.load(None, 'key'))
+
+    def test_file_digest(self):
+        path = os.path.join(self.tmp, 'template.tpl')
+        self.assertIsNone(cache.file_digest(path))
+        with open(path, 'wb') as fh:
+            fh.write(b'template')
+        self.assertEqual(cache.file_digest(path),
+                         hashlib.sha1(b'template').hexdigest())
+
+
+if __name__ == '__main__':
+    unittest.main()
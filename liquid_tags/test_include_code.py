@@ -0,0 +1,36 @@
+import os
+import shutil
+import tempfile
+
+from pelican.tests.support import unittest
+
+from . import include_code
+
+
+class TestReadCode(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'code.py')
+        with open(self.path, 'w') as fh:
+            fh.write(''.join('line %d\n' % i for i in range(1, 11)))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_whole_file(self):
+        self.assertEqual(include_code.read_code(self.path).count('\n'), 10)
+
+    def test_line_range(self):
+        self.assertEqual(include_code.read_code(self.path, 2, 4),
+                         'line 2\nline 3\nline 4')
+        self.assertEqual(include_code.read_code(self.path, 10, 20),
+                         'line 10')
+
+    def test_range_past_end(self):
+        self.assertRaises(ValueError, include_code.read_code, self.path,
+                          11, 12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import os
+import shutil
+import tempfile
+
+from pelican.tests.support import unittest
+
+from . import mdx_liquid_tags
+from .mdx_liquid_tags import LiquidTags, _LiquidTagsPreprocessor
+
+
+@LiquidTags.register('test_echo')
+def echo(preprocessor, tag, markup):
+    return '<{0}:{1}>'.format(tag, markup)
+
+
+@LiquidTags.register('test_lines')
+def lines(preprocessor, tag, markup):
+    return 'one\ntwo'
+
+
+calls = []
+
+
+def read_files(preprocessor, markup):
+    return [markup]
+
+
+@LiquidTags.register('test_cached', cacheable=True, files=read_files)
+def cached(preprocessor, tag, markup):
+    calls.append(markup)
+    with open(markup) as fh:
+        content = fh.read()
+    return '{0}|{1}|{2}'.format(
+        preprocessor.configs.htmlStash.store('<b>', safe=True),
+        content,
+        preprocessor.configs.htmlStash.store('</b>', safe=True))
+
+
+class FakeStash(object):
+    def __init__(self):
+        self.stored = []
+
+    def store(self, html, safe=False):
+        self.stored.append(html)
+        return '@%d@' % (len(self.stored) - 1)
+
+
+class FakeConfigs(object):
+    def __init__(self, settings):
+        self.config = {'settings': settings}
+        self.htmlStash = FakeStash()
+
+
+class TestLiquidTagsPreprocessor(unittest.TestCase):
+
+    def run_preprocessor(self, lines, **settings):
+        preprocessor = _LiquidTagsPreprocessor(FakeConfigs(settings))
+        return preprocessor.run(lines)
+
+    def test_tags_are_replaced(self):
+        lines = ['before {%  test_echo  a  b %} middle',
+                 '{% test_echo %}{%test_echo c%} after']
+        self.assertEqual(self.run_preprocessor(lines),
+                         ['before <test_echo:a  b> middle',
+                          '<test_echo:><test_echo:c> after'])
+
+    def test_unknown_tags_are_kept(self):
+        lines = ['{% unknown_tag x %} and {% %} and {% test_echo y %}']
+        self.assertEqual(self.run_preprocessor(lines),
+                         ['{% unknown_tag x %} and {% %} and <test_echo:y>'])
+
+    def test_tag_output_may_span_lines(self):
+        lines = ['a', 'b {% test_lines %} c']
+        self.assertEqual(self.run_preprocessor(lines),
+                         ['a', 'b one', 'two c'])
+
+    def test_profile(self):
+        mdx_liquid_tags.tag_profile()
+        self.run_preprocessor(['{% test_echo a %} {% test_echo b %}'])
+        self.assertEqual(mdx_liquid_tags.tag_profile(), [])
+
+        self.run_preprocessor(['{% test_echo a %} {% test_echo b %}'],
+                              LIQUID_TAGS_PROFILE=True)
+        profile = mdx_liquid_tags.tag_profile()
+        self.assertEqual([(tag, calls) for tag, calls, seconds in profile],
+                         [('test_echo', 2)])
+        self.assertEqual(mdx_liquid_tags.tag_profile(), [])
+
+
+class TestCachedTags(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'code.py')
+        with open(self.path, 'w') as fh:
+            fh.write('print(1)')
+        self.settings = {'LIQUID_TAGS_CACHE_PATH': self.tmp}
+        del calls[:]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def run_cached(self):
+        configs = FakeConfigs(self.settings)
+        preprocessor = _LiquidTagsPreprocessor(configs)
+        return preprocessor.run(['{% test_cached ' + self.path + ' %}',
+                                 '{% test_cached ' + self.path + ' %}']), \
+            configs.htmlStash.stored
+
+    def test_output_is_cached(self):
+        lines, stored = self.run_cached()
+        self.assertEqual(lines, ['@0@|print(1)|@1@', '@2@|print(1)|@3@'])
+        self.assertEqual(stored, ['<b>', '</b>', '<b>', '</b>'])
+        self.assertEqual(calls, [self.path])
+
+        # later builds reuse the cached output
+        self.run_cached()
+        self.assertEqual(calls, [self.path])
+
+    def test_file_change_invalidates(self):
+        self.run_cached()
+        with open(self.path, 'w') as fh:
+            fh.write('print(22)')
+        lines, stored = self.run_cached()
+        self.assertEqual(lines[0], '@0@|print(22)|@1@')
+        self.assertEqual(calls, [self.path, self.path])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -26,7 +26,7 @@ SYNTAX = "{% youtube id [width height] %}"
 
 YOUTUBE = re.compile(r'([\S]+)(\s+(\d+)\s(\d+))?')
 
-@LiquidTags.register('youtube')
+@LiquidTags.register('youtube', cacheable=True)
 def youtube(preprocessor, tag, markup):
     width = 640
     height = 390
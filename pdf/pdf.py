@@ -4,6 +4,11 @@ PDF Generator
 -------
 
 The pdf plugin generates PDF files from RST sources.
+
+A manifest in the output folder records the digests of the source and of
+the stylesheet each PDF was made from, so that only the PDFs whose inputs
+changed are generated again. With PDF_WORKERS > 1, they are generated by
+a pool of processes, each with its own RstToPdf.
 '''
 
 from __future__ import unicode_literals, print_function
@@ -13,10 +18,54 @@ from pelican.generators import Generator
 from rst2pdf.createpdf import RstToPdf
 
 import os
+import json
+import hashlib
 import logging
+import multiprocessing
 
 logger = logging.getLogger(__name__)
 
+MANIFEST = '.pdf-manifest.json'
+
+# the RstToPdf of a worker process
+_pdfcreator = None
+
+
+def file_digest(path):
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def style_digest(pdf_style, pdf_style_path):
+    """Digest of the stylesheet file, None for a stylesheet of rst2pdf"""
+    for name in (pdf_style, pdf_style + '.style', pdf_style + '.json',
+                 pdf_style + '.yaml'):
+        path = os.path.join(pdf_style_path, name)
+        if os.path.isfile(path):
+            return file_digest(path)
+    return None
+
+
+def _create_pdfcreator(pdf_style, pdf_style_path):
+    return RstToPdf(breakside=0,
+                    stylesheets=[pdf_style],
+                    style_path=[pdf_style_path])
+
+
+def _init_worker(pdf_style, pdf_style_path):
+    global _pdfcreator
+    _pdfcreator = _create_pdfcreator(pdf_style, pdf_style_path)
+
+
+def _create_pdf_in_worker(job):
+    source_path, output_pdf = job
+    with open(source_path) as f:
+        _pdfcreator.createPdf(text=f.read(), output=output_pdf)
+    return output_pdf
+
 
 class PdfGenerator(Generator):
     """Generate PDFs on the output dir, for all articles and pages coming from
@@ -24,11 +73,18 @@ class PdfGenerator(Generator):
     def __init__(self, *args, **kwargs):
         super(PdfGenerator, self).__init__(*args, **kwargs)
         
-        pdf_style_path = os.path.join(self.settings['PDF_STYLE_PATH'])
-        pdf_style = self.settings['PDF_STYLE']
-        self.pdfcreator = RstToPdf(breakside=0,
-                                   stylesheets=[pdf_style],
-                                   style_path=[pdf_style_path])
+        self.pdf_style_path = os.path.join(self.settings['PDF_STYLE_PATH'])
+        self.pdf_style = self.settings['PDF_STYLE']
+        self.workers = self.settings.get('PDF_WORKERS', 1) or 1
+        self._pdfcreator = None
+
+    @property
+    def pdfcreator(self):
+        # only created when a PDF is generated in this process
+        if self._pdfcreator is None:
+            self._pdfcreator = _create_pdfcreator(self.pdf_style,
+                                                  self.pdf_style_path)
+        return self._pdfcreator
 
     def _create_pdf(self, obj, output_path):
         if obj.source_path.endswith('.rst'):
@@ -39,6 +95,17 @@ class PdfGenerator(Generator):
                 self.pdfcreator.createPdf(text=f.read(), output=output_pdf)
             logger.info(' [ok] writing %s' % output_pdf)
 
+    def _load_manifest(self, output_path):
+        try:
+            with open(os.path.join(output_path, MANIFEST)) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _save_manifest(self, output_path, manifest):
+        with open(os.path.join(output_path, MANIFEST), 'w') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+
     def generate_context(self):
         pass
 
@@ -54,11 +121,49 @@ class PdfGenerator(Generator):
                 logger.error("Couldn't create the pdf output folder in " +
                              pdf_path)
 
-        for article in self.context['articles']:
-            self._create_pdf(article, pdf_path)
-
-        for page in self.context['pages']:
-            self._create_pdf(page, pdf_path)
+        old_manifest = self._load_manifest(pdf_path)
+        manifest = {}
+        style = {'style': style_digest(self.pdf_style, self.pdf_style_path),
+                 'pdf_style': self.pdf_style}
+        objects = {}
+        for obj in self.context['articles'] + self.context['pages']:
+            if not obj.source_path.endswith('.rst'):
+                continue
+            filename = obj.slug + ".pdf"
+            inputs = dict(style, source=file_digest(obj.source_path))
+            if (old_manifest.get(filename) == inputs and
+                    os.path.exists(os.path.join(pdf_path, filename))):
+                manifest[filename] = inputs
+                continue
+            objects[filename] = obj, inputs
+
+        try:
+            if self.workers > 1 and len(objects) > 1:
+                self._create_pdfs_in_pool(objects, pdf_path, manifest)
+            else:
+                for filename, (obj, inputs) in objects.items():
+                    self._create_pdf(obj, pdf_path)
+                    manifest[filename] = inputs
+        finally:
+            self._save_manifest(pdf_path, manifest)
+        logger.info(' %d PDF files written, %d up to date',
+                    len(objects), len(manifest) - len(objects))
+
+    def _create_pdfs_in_pool(self, objects, pdf_path, manifest):
+        jobs = [(obj.source_path, os.path.join(pdf_path, filename))
+                for filename, (obj, inputs) in objects.items()]
+        pool = multiprocessing.Pool(min(self.workers, len(jobs)),
+                                    _init_worker,
+                                    (self.pdf_style, self.pdf_style_path))
+        try:
+            for output_pdf in pool.imap_unordered(_create_pdf_in_worker,
+                                                  jobs):
+                manifest[os.path.basename(output_pdf)] = \
+                    objects[os.path.basename(output_pdf)][1]
+                logger.info(' [ok] writing %s' % output_pdf)
+        finally:
+            pool.close()
+            pool.join()
 
 
 def get_generators(generators):
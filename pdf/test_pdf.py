@@ -25,6 +25,9 @@ class TestPdfGeneration(unittest.TestCase):
             settings.update(override)
 
         self.settings = read_settings(override=settings)
+        self.run_pelican()
+
+    def run_pelican(self):
         pelican = Pelican(settings=self.settings)
 
         try:
@@ -39,3 +42,10 @@ class TestPdfGeneration(unittest.TestCase):
 
     def test_existence(self):
         assert os.path.exists(os.path.join(self.temp_path, 'pdf', 'this-is-a-super-article.pdf'))
+
+    def test_unchanged_pdfs_are_skipped(self):
+        output_pdf = os.path.join(self.temp_path, 'pdf', 'this-is-a-super-article.pdf')
+        assert os.path.exists(os.path.join(self.temp_path, 'pdf', pdf.pdf.MANIFEST))
+        os.utime(output_pdf, (0, 0))
+        self.run_pelican()
+        assert os.path.getmtime(output_pdf) == 0
@@ -6,7 +6,9 @@ Author: Bernhard Scheirle
 from __future__ import unicode_literals
 
 import logging
+import multiprocessing
 import os
+import struct
 
 import hashlib
 
@@ -27,7 +29,8 @@ _identicon_data = None
 _identicon_size = None
 _initialized = False
 _authors = None
-_missingAvatars = []
+_workers = 1
+_missingAvatars = set()
 
 
 def _ready():
@@ -39,13 +42,14 @@ def _ready():
 
 
 def init(pelican_output_path, identicon_output_path, identicon_data,
-         identicon_size, authors):
+         identicon_size, authors, workers=1):
     global _identicon_save_path
     global _identicon_output_path
     global _identicon_data
     global _identicon_size
     global _initialized
     global _authors
+    global _workers
     if _initialized:
         return
     _identicon_save_path = os.path.join(pelican_output_path,
@@ -54,6 +58,7 @@ def init(pelican_output_path, identicon_output_path, identicon_data,
     _identicon_data = identicon_data
     _identicon_size = identicon_size
     _authors = authors
+    _workers = workers or 1
     _initialized = True
 
 
@@ -87,16 +92,60 @@ def getAvatarPath(comment_id, metadata):
 
     code = md5.hexdigest()
 
-    if not code in _missingAvatars:
-        _missingAvatars.append(code)
+    _missingAvatars.add(code)
 
     return os.path.join(_identicon_output_path, '%s.png' % code)
 
 
+def _pngSize(path):
+    """Returns the (width, height) of the png file at path, or None"""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(24)
+    except (IOError, OSError):
+        return None
+    if len(header) < 24 or header[:8] != b'\x89PNG\r\n\x1a\n':
+        return None
+    return struct.unpack('>II', header[16:24])
+
+
+def _identiconSize():
+    """Returns the width and height of the rendered identicons.
+
+    Identicons are made of 3 x 3 patches of int(_identicon_size) pixels, so
+    they are slightly smaller than PELICAN_COMMENT_SYSTEM_IDENTICON_SIZE when
+    it is not a multiple of 3, e.g. 78 pixels for 80.
+    """
+    side = int(_identicon_size) * 3
+    return side, side
+
+
+def _renderAvatar(job):
+    code, size, avatar_save_path = job
+    avatar = identicon.render_identicon(int(code, 16), size)
+    avatar.save(avatar_save_path, 'PNG')
+
+
 def generateAndSaveMissingAvatars():
     _createIdenticonOutputFolder()
-    for code in _missingAvatars:
+    jobs = []
+    for code in sorted(_missingAvatars):
         avatar_path = '%s.png' % code
-        avatar = identicon.render_identicon(int(code, 16), _identicon_size)
         avatar_save_path = os.path.join(_identicon_save_path, avatar_path)
-        avatar.save(avatar_save_path, 'PNG')
+        # identicons do not change as long as their size does not
+        if _pngSize(avatar_save_path) == _identiconSize():
+            continue
+        jobs.append((code, _identicon_size, avatar_save_path))
+
+    if _workers > 1 and len(jobs) > 1:
+        pool = multiprocessing.Pool(_workers)
+        try:
+            pool.map(_renderAvatar, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for job in jobs:
+            _renderAvatar(job)
+    logger.debug(_log + "%s identicons rendered, %s up to date" %
+                 (len(jobs), len(_missingAvatars) - len(jobs)))
@@ -0,0 +1,48 @@
+"""
+Benchmark of identicon rendering
+--------------------------------
+Renders identicons for random codes at the patch sizes of the common
+PELICAN_COMMENT_SYSTEM_IDENTICON_SIZE values (the image is three patches
+wide) with each renderer and reports the time per identicon.
+
+Run from the folder containing the ``pelican_comment_system`` plugin:
+
+    python -m pelican_comment_system.identicon.benchmark_identicon [COUNT]
+"""
+from __future__ import print_function
+
+import random
+import sys
+import timeit
+
+from . import identicon
+
+IMAGE_SIZES = (48, 72, 96, 144)
+RENDERERS = (identicon.DonRenderer, identicon.CachedDonRenderer)
+COUNT = 200
+REPEAT = 3
+
+
+def render_all(codes, size, renderer):
+    for code in codes:
+        identicon.render_identicon(code, size, renderer)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else COUNT
+    codes = [random.getrandbits(32) for _ in range(count)]
+    print('{0:>18} {1:>6} {2:>8} {3:>14} {4:>12}'.format(
+        'renderer', 'image', 'count', 'per identicon', 'per second'))
+    for renderer in RENDERERS:
+        for image_size in IMAGE_SIZES:
+            size = image_size // 3
+            seconds = min(timeit.repeat(
+                lambda: render_all(codes, size, renderer),
+                repeat=REPEAT, number=1))
+            print('{0:>18} {1:>6} {2:>8} {3:>12.3f}ms {4:>12.0f}'.format(
+                renderer.__name__, image_size, count,
+                1000 * seconds / count, count / seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -22,7 +22,8 @@ Return a PIL Image class instance which have generated identicon image.
 from PIL import Image, ImageDraw, ImagePath, ImageColor
 
 
-__all__ = ['render_identicon', 'IdenticonRendererBase']
+__all__ = ['render_identicon', 'IdenticonRendererBase',
+           'PatchCacheRendererBase', 'DonRenderer', 'CachedDonRenderer']
 
 
 class Matrix2D(list):
@@ -156,29 +157,94 @@ class IdenticonRendererBase(object):
         """
         @param size patch size
         """
-        path = self.PATH_SET[type]
-        if not path:
-            # blank patch
+        patch, blank = self.patchPath(pos, turn, type, size)
+        if blank:
             invert = not invert
-            path = [(0., 0.), (1., 0.), (1., 1.), (0., 1.), (0., 0.)]
-        patch = ImagePath.Path(path)
         if invert:
             foreColor, backColor = backColor, foreColor
 
+        draw.rectangle((pos[0] * size, pos[1] * size, (pos[0] + 1) * size,
+                        (pos[1] + 1) * size), fill=backColor)
+        draw.polygon(patch, fill=foreColor, outline=foreColor)
+
+    def patchPath(self, pos, turn, type, size):
+        """
+        @return the patch polygon at pos, and whether the patch is blank
+        """
+        path = self.PATH_SET[type]
+        blank = not path
+        if blank:
+            path = [(0., 0.), (1., 0.), (1., 1.), (0., 1.), (0., 0.)]
+        patch = ImagePath.Path(path)
+
         mat = Matrix2D.rotateSquare(turn, pivot=(0.5, 0.5)) *\
             Matrix2D.translate(*pos) *\
             Matrix2D.scale(size, size)
 
         patch.transform(mat.for_PIL())
-        draw.rectangle((pos[0] * size, pos[1] * size, (pos[0] + 1) * size,
-                        (pos[1] + 1) * size), fill=backColor)
-        draw.polygon(patch, fill=foreColor, outline=foreColor)
+        return patch, blank
 
     # virtual functions
     def decode(self, code):
         raise NotImplementedError
 
 
+class PatchCacheRendererBase(IdenticonRendererBase):
+
+    """
+    Renders identicons from patch masks computed once per patch size.
+
+    The masks of all patch shapes in all 4 turns are drawn the first time a
+    size is rendered. An identicon is then composited by pasting its colors
+    through the masks of its 9 patches, in the order of
+    IdenticonRendererBase.render, so that the images are the same.
+    """
+
+    # (renderer class, size, type, turn) -> (mask, blank)
+    _masks = {}
+
+    def render(self, size):
+        middle, corner, side, foreColor, backColor = self.decode(self.code)
+        size = int(size)
+        image = Image.new("RGB", (size * 3, size * 3))
+
+        patches = [((1, 1), middle[2], middle[1], middle[0])]
+        for i in range(4):
+            pos = [(1, 0), (2, 1), (1, 2), (0, 1)][i]
+            patches.append((pos, side[2] + 1 + i, side[1], side[0]))
+        for i in range(4):
+            pos = [(0, 0), (2, 0), (2, 2), (0, 2)][i]
+            patches.append((pos, corner[2] + 1 + i, corner[1], corner[0]))
+
+        for pos, turn, invert, type in patches:
+            mask, blank = self.patchMask(turn % 4, type, size)
+            fore, back = foreColor, backColor
+            if invert != blank:
+                fore, back = back, fore
+            # like draw.rectangle, a patch covers size + 1 pixels
+            box = (pos[0] * size, pos[1] * size,
+                   min((pos[0] + 1) * size + 1, image.size[0]),
+                   min((pos[1] + 1) * size + 1, image.size[1]))
+            if box[2] - box[0] != mask.size[0] or \
+                    box[3] - box[1] != mask.size[1]:
+                mask = mask.crop((0, 0, box[2] - box[0], box[3] - box[1]))
+            image.paste(back, box)
+            image.paste(fore, box, mask)
+        return image
+
+    def patchMask(self, turn, type, size):
+        """
+        @return the mask of a patch at (0, 0), and whether it is blank
+        """
+        key = (self.__class__, size, type, turn)
+        if key not in self._masks:
+            patch, blank = self.patchPath((0, 0), turn, type, size)
+            mask = Image.new("1", (size + 1, size + 1), 0)
+            ImageDraw.Draw(mask).polygon(patch, fill=1, outline=1)
+            self._masks[key] = (mask, blank)
+        return self._masks[key]
+
+
 class DonRenderer(IdenticonRendererBase):
 
     """
@@ -234,9 +300,16 @@ class DonRenderer(IdenticonRendererBase):
             foreColor, ImageColor.getrgb('white')
 
 
+class CachedDonRenderer(PatchCacheRendererBase, DonRenderer):
+
+    """
+    DonRenderer composited from cached patch masks
+    """
+
+
 def render_identicon(code, size, renderer=None):
     if not renderer:
-        renderer = DonRenderer
+        renderer = CachedDonRenderer
     return renderer(code).render(size)
 
 
@@ -8,16 +8,20 @@ A Pelican plugin, which allows you to add comments to your articles.
 Author: Bernhard Scheirle
 """
 from __future__ import unicode_literals
+import hashlib
+import json
 import logging
 import os
-import copy
+import sys
+import threading
 
 logger = logging.getLogger(__name__)
 
+from collections import defaultdict, OrderedDict
 from itertools import chain
+from multiprocessing.pool import ThreadPool
 from pelican import signals
 from pelican.readers import Readers
-from pelican.writers import Writer
 
 from . comment import Comment
 from . import avatars
@@ -32,9 +36,12 @@ def pelican_initialized(pelican):
     DEFAULT_CONFIG.setdefault('PELICAN_COMMENT_SYSTEM_IDENTICON_DATA', ())
     DEFAULT_CONFIG.setdefault('PELICAN_COMMENT_SYSTEM_IDENTICON_SIZE', 72)
     DEFAULT_CONFIG.setdefault('PELICAN_COMMENT_SYSTEM_AUTHORS', {})
+    DEFAULT_CONFIG.setdefault('PELICAN_COMMENT_SYSTEM_IDENTICON_WORKERS', 1)
     DEFAULT_CONFIG.setdefault(
         'PELICAN_COMMENT_SYSTEM_FEED', os.path.join('feeds', 'comment.%s.atom.xml'))
     DEFAULT_CONFIG.setdefault('COMMENT_URL', '#comment-{slug}')
+    DEFAULT_CONFIG.setdefault('PELICAN_COMMENT_SYSTEM_FEED_EMPTY', True)
+    DEFAULT_CONFIG.setdefault('PELICAN_COMMENT_SYSTEM_READ_THREADS', 1)
     DEFAULT_CONFIG['PAGE_EXCLUDES'].append(
         DEFAULT_CONFIG['PELICAN_COMMENT_SYSTEM_DIR'])
     DEFAULT_CONFIG['ARTICLE_EXCLUDES'].append(
@@ -49,9 +56,13 @@ def pelican_initialized(pelican):
         pelican.settings.setdefault(
             'PELICAN_COMMENT_SYSTEM_IDENTICON_SIZE', 72)
         pelican.settings.setdefault('PELICAN_COMMENT_SYSTEM_AUTHORS', {})
+        pelican.settings.setdefault(
+            'PELICAN_COMMENT_SYSTEM_IDENTICON_WORKERS', 1)
         pelican.settings.setdefault(
             'PELICAN_COMMENT_SYSTEM_FEED', os.path.join('feeds', 'comment.%s.atom.xml'))
         pelican.settings.setdefault('COMMENT_URL', '#comment-{slug}')
+        pelican.settings.setdefault('PELICAN_COMMENT_SYSTEM_FEED_EMPTY', True)
+        pelican.settings.setdefault('PELICAN_COMMENT_SYSTEM_READ_THREADS', 1)
 
         pelican.settings['PAGE_EXCLUDES'].append(
             pelican.settings['PELICAN_COMMENT_SYSTEM_DIR'])
@@ -68,17 +79,19 @@ def initialize(article_generator):
         article_generator.settings[
             'PELICAN_COMMENT_SYSTEM_IDENTICON_SIZE'] / 3,
         article_generator.settings['PELICAN_COMMENT_SYSTEM_AUTHORS'],
+        article_generator.settings.get(
+            'PELICAN_COMMENT_SYSTEM_IDENTICON_WORKERS', 1),
     )
 
 
-def warn_on_slug_collision(items):
-    slugs = {}
+def index_by_slug(items):
+    slugs = defaultdict(list)
     for comment in items:
-        if not comment.slug in slugs:
-            slugs[comment.slug] = [comment]
-        else:
-            slugs[comment.slug].append(comment)
+        slugs[comment.slug].append(comment)
+    return slugs
+
 
+def warn_on_slug_collision(slugs):
     for slug, itemList in slugs.items():
         len_ = len(itemList)
         if len_ > 1:
@@ -88,44 +101,137 @@ def warn_on_slug_collision(items):
                 logger.warning('    %s' % x.source_path)
 
 
+# Settings changing the content of the comment feeds
+FEED_SETTINGS = ('COMMENT_URL', 'FEED_DOMAIN', 'FEED_MAX_ITEMS',
+                 'RSS_FEED_SUMMARY_ONLY', 'TIMEZONE', 'DEFAULT_LANG')
+
+
 def write_feed(gen, items, context, slug):
+    """Queue the comment feed of an article, see write_feeds."""
     if gen.settings['PELICAN_COMMENT_SYSTEM_FEED'] is None:
         return
+    if not items and not gen.settings.get('PELICAN_COMMENT_SYSTEM_FEED_EMPTY',
+                                          True):
+        return
 
     path = gen.settings['PELICAN_COMMENT_SYSTEM_FEED'] % slug
 
-    writer = Writer(gen.output_path, settings=gen.settings)
-    writer.write_feed(items, context, path)
-
-
-def add_static_comments(gen, content):
-    if gen.settings['PELICAN_COMMENT_SYSTEM'] is not True:
+    feeds = getattr(gen, '_comment_feeds', None)
+    if feeds is None:
+        feeds = gen._comment_feeds = OrderedDict()
+    # translations share the comments, the last one written wins
+    feeds[path] = (items, context)
+
+
+def feed_digest(gen, path, items, context):
+    sha = hashlib.sha1()
+    parts = [path, context['SITEURL'], context['SITENAME'],
+             context['SITESUBTITLE'],
+             repr([gen.settings.get(name) for name in FEED_SETTINGS])]
+    for item in items:
+        parts.extend([item.source_path, item._content,
+                      repr(sorted((key, '{}'.format(value))
+                                  for key, value in item.metadata.items()))])
+    for part in parts:
+        sha.update('{}'.format(part).encode('utf-8'))
+        sha.update(b'\0')
+    return sha.hexdigest()
+
+
+def write_feeds(gen, writer):
+    """Write the queued comment feeds with the writer of the generator.
+
+    Feeds whose items and context did not change since the previous build
+    are not written again, as long as they still exist. The digests are kept
+    in CACHE_PATH, in a file of each output path, as the i18n subsites write
+    their own feeds.
+    """
+    feeds = getattr(gen, '_comment_feeds', None)
+    if not feeds:
         return
-
-    content.comments_count = 0
-    content.comments = []
-
-    # Modify the local context, so we get proper values for the feed
-    context = copy.copy(gen.context)
-    context['SITEURL'] += "/" + content.url
-    context['SITENAME'] += " - Comments: " + content.title
+    gen._comment_feeds = None
+
+    output_path = os.path.abspath(gen.output_path).encode('utf-8')
+    digests_path = os.path.join(
+        gen.settings.get('CACHE_PATH', 'cache'), 'pelican_comment_system',
+        'feeds.%s.json' % hashlib.sha1(output_path).hexdigest())
+    try:
+        with open(digests_path) as fd:
+            previous = json.load(fd)
+    except (IOError, OSError, ValueError):
+        previous = {}
+
+    digests = {}
+    skipped = 0
+    for path, (items, context) in feeds.items():
+        digests[path] = feed_digest(gen, path, items, context)
+        if (previous.get(path) == digests[path] and
+                os.path.isfile(os.path.join(gen.output_path, path))):
+            skipped += 1
+            continue
+        writer.write_feed(items, context, path)
+    logger.debug('%s unchanged comment feeds not written' % skipped)
+
+    try:
+        if not os.path.isdir(os.path.dirname(digests_path)):
+            os.makedirs(os.path.dirname(digests_path))
+        data = json.dumps(digests).encode('utf-8')
+        http_cache = sys.modules.get('http_cache')  # None unless loaded as a plugin
+        if http_cache is not None:
+            http_cache.write_file(digests_path, data)
+        else:
+            # a partially written file fails to load, all feeds are written
+            with open(digests_path, 'wb') as fd:
+                fd.write(data)
+    except (IOError, OSError) as e:
+        logger.warning('Could not save the comment feed digests: %s' % e)
+
+
+def get_readers(gen):
+    """Return the Readers of the current thread for the comments of gen.
+
+    Readers are reused for all articles, but not shared between threads: the
+    Markdown reader keeps the parser of the file it reads on its instance.
+    """
+    local = getattr(gen, '_comment_readers', None)
+    if local is None:
+        local = gen._comment_readers = threading.local()
+    if not hasattr(local, 'readers'):
+        local.readers = Readers(gen.settings)
+    return local.readers
+
+
+def comment_context(gen, content, context=None):
+    """Return the context of the comments of content, or update context.
+
+    The context is modified, so we get proper values for the feed.
+    """
+    if context is None:
+        context = {}
+    context.update(gen.context)
+    context['SITEURL'] = gen.context['SITEURL'] + "/" + content.url
+    context['SITENAME'] = (gen.context['SITENAME'] + " - Comments: " +
+                           content.title)
     context['SITESUBTITLE'] = ""
+    return context
 
-    folder = os.path.join(
+
+def comment_folder(gen, content):
+    return os.path.join(
         gen.settings['PATH'],
         gen.settings['PELICAN_COMMENT_SYSTEM_DIR'],
         content.slug
     )
 
-    if not os.path.isdir(folder):
-        logger.debug("No comments found for: " + content.slug)
-        write_feed(gen, [], context, content.slug)
-        return
 
-    reader = Readers(gen.settings)
+def read_comments(gen, folder, context):
+    """Read the comment files in folder, returns (comments, replies)"""
     comments = []
     replies = []
+    if not os.path.isdir(folder):
+        return comments, replies
 
+    reader = get_readers(gen)
     for file in os.listdir(folder):
         name, extension = os.path.splitext(file)
         if extension[1:].lower() in reader.extensions:
@@ -137,16 +243,65 @@ def add_static_comments(gen, content):
                 replies.append(com)
             else:
                 comments.append(com)
+    return comments, replies
+
+
+def read_all_comments(gen):
+    """Read the comments of all articles on a pool of threads.
+
+    Only with PELICAN_COMMENT_SYSTEM_READ_THREADS > 1, otherwise the comments
+    are read by add_static_comments as each article is written.
+    """
+    if gen.settings['PELICAN_COMMENT_SYSTEM'] is not True:
+        return
+    threads = gen.settings.get('PELICAN_COMMENT_SYSTEM_READ_THREADS', 1)
+    if not threads or threads <= 1:
+        return
+
+    get_readers(gen)  # create the thread local storage up front
+    pool = ThreadPool(threads)
+    gen._comment_jobs = {}
+    for content in chain(*[getattr(gen, name, []) for name in (
+            'translations', 'articles',
+            'hidden_translations', 'hidden_articles')]):
+        context = comment_context(gen, content)
+        job = pool.apply_async(read_comments,
+                               (gen, comment_folder(gen, content), context))
+        gen._comment_jobs[id(content)] = (job, context)
+    pool.close()
+
+
+def add_static_comments(gen, content):
+    if gen.settings['PELICAN_COMMENT_SYSTEM'] is not True:
+        return
+
+    content.comments_count = 0
+    content.comments = []
+
+    job = getattr(gen, '_comment_jobs', {}).pop(id(content), None)
+    if job is not None:
+        result, context = job
+        comments, replies = result.get()
+        # the context may have changed since the comments were read
+        comment_context(gen, content, context)
+    else:
+        context = comment_context(gen, content)
+        comments, replies = read_comments(
+            gen, comment_folder(gen, content), context)
+
+    if not comments and not replies:
+        logger.debug("No comments found for: " + content.slug)
+        write_feed(gen, [], context, content.slug)
+        return
 
-    warn_on_slug_collision(comments + replies)
+    slugs = index_by_slug(chain(comments, replies))
+    warn_on_slug_collision(slugs)
 
     write_feed(gen, comments + replies, context, content.slug)
 
-    # TODO: Fix this O(n²) loop
     for reply in replies:
-        for comment in chain(comments, replies):
-            if comment.slug == reply.replyto:
-                comment.addReply(reply)
+        for comment in slugs.get(reply.replyto, ()):
+            comment.addReply(reply)
 
     count = 0
     for comment in comments:
@@ -166,5 +321,7 @@ def writeIdenticonsToDisk(gen, writer):
 def register():
     signals.initialized.connect(pelican_initialized)
     signals.article_generator_init.connect(initialize)
+    signals.article_generator_finalized.connect(read_all_comments)
     signals.article_generator_write_article.connect(add_static_comments)
+    signals.article_writer_finalized.connect(write_feeds)
     signals.article_writer_finalized.connect(writeIdenticonsToDisk)
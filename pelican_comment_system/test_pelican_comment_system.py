@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from pelican.settings import DEFAULT_CONFIG
+from pelican.utils import slugify
+
+from pelican_comment_system import avatars
+from pelican_comment_system.identicon import identicon
+from pelican_comment_system import pelican_comment_system as pcs
+
+
+def comment_slug(name):
+    return slugify(name, DEFAULT_CONFIG.get('SLUG_SUBSTITUTIONS', ()))
+
+
+class Generator(object):
+    def __init__(self, path):
+        self.settings = DEFAULT_CONFIG.copy()
+        self.settings.update({
+            'PATH': os.path.join(path, 'content'),
+            'CACHE_PATH': os.path.join(path, 'cache'),
+            'PELICAN_COMMENT_SYSTEM': True,
+            'PELICAN_COMMENT_SYSTEM_DIR': 'comments',
+            'PELICAN_COMMENT_SYSTEM_FEED': 'comment.%s.atom.xml',
+            'COMMENT_URL': '#comment-{slug}',
+        })
+        self.output_path = os.path.join(path, 'output')
+        self.context = {'SITEURL': 'http://example.com', 'SITENAME': 'Site',
+                        'SITESUBTITLE': ''}
+
+
+class Article(object):
+    def __init__(self, slug):
+        self.slug = slug
+        self.url = slug + '.html'
+        self.title = slug.title()
+
+
+class Writer(object):
+    """Records the feeds, and writes an empty file in their place"""
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.written = []
+
+    def write_feed(self, items, context, path):
+        self.written.append(path)
+        path = os.path.join(self.output_path, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        open(path, 'w').close()
+
+
+class TestComments(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.gen = Generator(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def write_comment(self, article, name, author, date, text, replyto=None):
+        folder = os.path.join(self.gen.settings['PATH'], 'comments', article)
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        with open(os.path.join(folder, name), 'w') as fd:
+            fd.write('author: {}\ndate: {}\n'.format(author, date))
+            if replyto:
+                fd.write('replyto: {}\n'.format(replyto))
+            fd.write('\n{}\n'.format(text))
+
+    def add_comments(self, slug):
+        article = Article(slug)
+        pcs.add_static_comments(self.gen, article)
+        return article
+
+    def test_replies(self):
+        self.write_comment('first', 'question.md', 'Ann', '2015-01-01', 'Q1')
+        self.write_comment('first', 'answer.md', 'Bob', '2015-01-02',
+                           'A1', replyto=comment_slug('question.md'))
+        self.write_comment('first', 'thanks.md', 'Ann', '2015-01-03',
+                           'T1', replyto=comment_slug('answer.md'))
+        # same file names as the comments of the other article
+        self.write_comment('second', 'question.md', 'Carl', '2015-02-01', 'Q2')
+        self.write_comment('second', 'answer.md', 'Dan', '2015-02-02',
+                           'A2', replyto=comment_slug('question.md'))
+
+        first = self.add_comments('first')
+        self.assertEqual(first.comments_count, 3)
+        self.assertEqual(len(first.comments), 1)
+        question = first.comments[0]
+        self.assertEqual(question.metadata['author'], 'Ann')
+        self.assertEqual([reply.metadata['author']
+                          for reply in question.replies], ['Bob'])
+        self.assertEqual([reply.metadata['author']
+                          for reply in question.replies[0].replies], ['Ann'])
+
+        second = self.add_comments('second')
+        self.assertEqual(second.comments_count, 2)
+        question = second.comments[0]
+        self.assertEqual(question.metadata['author'], 'Carl')
+        self.assertEqual([reply.metadata['author']
+                          for reply in question.replies], ['Dan'])
+
+        third = self.add_comments('third')
+        self.assertEqual((third.comments_count, third.comments), (0, []))
+
+    def test_feeds_written_when_changed(self):
+        self.write_comment('first', 'question.md', 'Ann', '2015-01-01', 'Q1')
+        writer = Writer(self.gen.output_path)
+
+        def build():
+            writer.written = []
+            self.add_comments('first')
+            self.add_comments('second')
+            pcs.write_feeds(self.gen, writer)
+            return writer.written
+
+        self.assertEqual(build(), ['comment.first.atom.xml',
+                                   'comment.second.atom.xml'])
+        self.assertEqual(build(), [])
+
+        self.write_comment('first', 'question.md', 'Ann', '2015-01-01',
+                           'Changed')
+        self.assertEqual(build(), ['comment.first.atom.xml'])
+
+        self.write_comment('second', 'other.md', 'Bob', '2015-01-01', 'New')
+        self.assertEqual(build(), ['comment.second.atom.xml'])
+
+        self.gen.context['SITENAME'] = 'Renamed'
+        self.assertEqual(len(build()), 2)
+
+        os.remove(os.path.join(self.gen.output_path, 'comment.first.atom.xml'))
+        self.assertEqual(build(), ['comment.first.atom.xml'])
+
+    def test_feed_digests_of_each_output_path(self):
+        self.write_comment('first', 'question.md', 'Ann', '2015-01-01', 'Q1')
+        main, subsite = self.gen, Generator(self.path)
+        subsite.output_path = os.path.join(self.path, 'output', 'fr')
+        subsite.context['SITEURL'] = 'http://example.com/fr'
+
+        def build(gen):
+            writer = Writer(gen.output_path)
+            pcs.add_static_comments(gen, Article('first'))
+            pcs.write_feeds(gen, writer)
+            return writer.written
+
+        # the sites of an i18n build do not overwrite each other's digests
+        self.assertEqual(build(main), ['comment.first.atom.xml'])
+        self.assertEqual(build(subsite), ['comment.first.atom.xml'])
+        self.assertEqual(build(main), [])
+        self.assertEqual(build(subsite), [])
+        self.assertEqual(
+            len(os.listdir(os.path.join(self.path, 'cache',
+                                        'pelican_comment_system'))), 2)
+
+
+class TestAvatars(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.output = os.path.join(self.path, 'images', 'identicon')
+        avatars._missingAvatars.clear()
+
+    def tearDown(self):
+        avatars._initialized = False
+        avatars._missingAvatars.clear()
+        shutil.rmtree(self.path)
+
+    def generate(self, size):
+        avatars._initialized = False
+        avatars.init(self.path, os.path.join('images', 'identicon'),
+                     ('author',), size / 3, {})
+        for author in ('Ann', 'Bob'):
+            avatars.getAvatarPath(author, {'author': author})
+        with mock.patch.object(avatars, '_renderAvatar',
+                               wraps=avatars._renderAvatar) as render:
+            avatars.generateAndSaveMissingAvatars()
+        return render.call_count
+
+    def sizes(self):
+        return set(avatars._pngSize(os.path.join(self.output, name))
+                   for name in os.listdir(self.output))
+
+    def test_only_missing_avatars_are_rendered(self):
+        self.assertEqual(self.generate(72), 2)
+        self.assertEqual(self.sizes(), set([(72, 72)]))
+        self.assertEqual(self.generate(72), 0)
+
+        os.remove(os.path.join(self.output, os.listdir(self.output)[0]))
+        self.assertEqual(self.generate(72), 1)
+
+        self.assertEqual(self.generate(60), 2)
+        self.assertEqual(self.sizes(), set([(60, 60)]))
+
+    def test_size_not_a_multiple_of_3(self):
+        self.assertEqual(self.generate(80), 2)
+        self.assertEqual(self.sizes(), set([(78, 78)]))
+        self.assertEqual(self.generate(80), 0)
+
+
+class TestIdenticon(unittest.TestCase):
+
+    def test_cached_renderer_renders_the_same_images(self):
+        rand = random.Random(0)
+        codes = [0, 1, 0xffffffff] + [rand.getrandbits(32) for _ in range(100)]
+        # patch sizes, as avatars passes PELICAN_COMMENT_SYSTEM_IDENTICON_SIZE / 3
+        for size in (8, 24, 50 / 3., 80 / 3., 100 / 3.):
+            for code in codes:
+                expected = identicon.render_identicon(code, size,
+                                                      identicon.DonRenderer)
+                # with the default renderer
+                image = identicon.render_identicon(code, size)
+                self.assertEqual((image.mode, image.size),
+                                 (expected.mode, expected.size))
+                self.assertEqual(image.tobytes(), expected.tobytes(),
+                                 'code %d, size %s' % (code, size))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,28 +2,157 @@
 """Custom reST_ directive for plantuml_ integration.
    Adapted from ditaa_rst plugin.
 
+Images are named after a hash of the diagram and its format, so a diagram
+which is already in the output is not rendered again. The diagrams of a
+document which are not, are rendered together by a single ``plantuml``
+run once the document is read, or split between PLANTUML_WORKERS
+concurrent runs.
+
 .. _reST: http://docutils.sourceforge.net/rst.html
 .. _plantuml: http://plantuml.sourceforge.net/
 """
 
 import os
+import shutil
 import tempfile
-from zlib import adler32
+from hashlib import sha1
+from multiprocessing.pool import ThreadPool
 from subprocess import Popen, PIPE
 
-from docutils.nodes import image, literal_block
+from docutils.nodes import image, literal_block, pending
 from docutils.parsers.rst import Directive, directives
-from docutils import utils, nodes
+from docutils.transforms import Transform
+from docutils import utils
 
 from pelican import logger, signals
 
 global_siteurl = ""
+global_workers = 1
+_pool = None
+
+FORMATS = {
+    'png': '-tpng',
+    'svg': '-tsvg',
+}
+
+
+class Diagram(object):
+    """A diagram, rendered to path unless it is already there"""
+
+    def __init__(self, body, imgformat, path):
+        self.body = body
+        self.format = imgformat
+        self.name = sha1((imgformat + '\n' + body).encode('utf8')).hexdigest()
+        self.path = os.path.join(path, self.name + '.' + imgformat)
+        self.error = None
+        self.rendered = os.path.exists(self.path)
+
+
+def render_diagrams(diagrams):
+    """Render diagrams of the same format and output directory with a single
+    plantuml run; sets the error of the diagrams which failed"""
+    output_dir = os.path.dirname(diagrams[0].path)
+    source_dir = tempfile.mkdtemp()
+    try:
+        sources = []
+        for diagram in diagrams:
+            source = os.path.join(source_dir, diagram.name + '.uml')
+            with open(source, 'wb') as tf:
+                tf.write(b'@startuml\n')
+                tf.write(diagram.body.encode('utf8'))
+                tf.write(b'\n@enduml')
+            sources.append(source)
+        cmdline = ['plantuml', '-o', output_dir, FORMATS[diagrams[0].format]]
+
+        try:
+            p = Popen(cmdline + sources, stdout=PIPE, stderr=PIPE)
+            out, err = p.communicate()
+        except Exception as exc:
+            for diagram in diagrams:
+                diagram.error = 'Failed to run plantuml: %s' % (exc, )
+            return
+    finally:
+        shutil.rmtree(source_dir)
+
+    err = err.decode('utf8', 'replace')
+    failed = []
+    if p.returncode != 0:
+        # plantuml names the sources of the diagrams it could not render,
+        # if it does not, the whole run failed
+        failed = [diagram for diagram in diagrams if diagram.name in err]
+        failed = failed or diagrams
+    for diagram in diagrams:
+        diagram.rendered = True
+        if diagram in failed:
+            diagram.error = 'Error in "uml" directive: %s' % err
+            # plantuml renders syntax errors as an image, which must not be
+            # taken for the diagram the next time
+            if os.path.exists(diagram.path):
+                os.remove(diagram.path)
+        elif not os.path.exists(diagram.path):
+            diagram.error = 'Error in "uml" directive: no image generated'
+
+
+def render_document_diagrams(document):
+    """Render all the diagrams of document which are not rendered yet
+
+    With more than one worker, the diagrams are split between up to
+    global_workers plantuml runs going on at the same time.
+    """
+    global _pool
+    queued = getattr(document, 'plantuml_diagrams', {})
+    document.plantuml_diagrams = {}
+    by_format = {}
+    for diagram in queued.values():
+        if not diagram.rendered:
+            by_format.setdefault(diagram.format, []).append(diagram)
+
+    batches = []
+    for diagrams in by_format.values():
+        count = max(1, min(global_workers, len(diagrams)))
+        batches.extend(diagrams[i::count] for i in range(count))
+    if len(batches) < 2:
+        for diagrams in batches:
+            render_diagrams(diagrams)
+        return
+    if _pool is None:
+        _pool = ThreadPool(global_workers)
+    # each batch sets the results on its own diagrams
+    _pool.map(render_diagrams, batches, chunksize=1)
+
+
+class PlantUMLTransform(Transform):
+    """Replace the pending node of a diagram by its image, or by the error
+    rendering it, once the document is read"""
+
+    default_priority = 200
+
+    def apply(self):
+        details = self.startnode.details
+        diagram = details['diagram']
+        if not diagram.rendered:
+            render_document_diagrams(self.document)
+
+        if diagram.error:
+            node = self.document.reporter.error(
+                diagram.error,
+                literal_block(details['block_text'], details['block_text']),
+                line=details['lineno'])
+        else:
+            node = image_node(diagram, details['classes'], details['alt'])
+        self.startnode.replace_self(node)
+
+
+def image_node(diagram, classes, alt):
+    url = global_siteurl + '/images/' + os.path.basename(diagram.path)
+    return image(uri=url, classes=classes, alt=alt)
+
 
 class PlantUML(Directive):
     required_arguments = 0
     optional_arguments = 0
     has_content = True
-    
+
     global global_siteurl
 
     option_spec = {
@@ -33,80 +162,58 @@ class PlantUML(Directive):
     }
 
     def run(self):
-	source = self.state_machine.input_lines.source(self.lineno - self.state_machine.input_offset - 1)
-	source_dir = os.path.dirname(os.path.abspath(source))
-	source_dir = utils.relative_path(None, source_dir)
+        source = self.state_machine.input_lines.source(self.lineno - self.state_machine.input_offset - 1)
+        source_dir = os.path.dirname(os.path.abspath(source))
+        source_dir = utils.relative_path(None, source_dir)
 
         path = os.path.abspath(os.path.join('output', 'images'))
         if not os.path.exists(path):
             os.makedirs(path)
 
-        nodes = []
-
-        body = '\n'.join(self.content)
-        tf = tempfile.NamedTemporaryFile(delete=True)
-        tf.write('@startuml\n')
-        tf.write(body.encode('utf8'))
-        tf.write('\n@enduml')
-        tf.flush()
-        
         imgformat = self.options.get('format', 'png')
-        
-        if imgformat == 'png':
-            imgext = ".png"
-            outopt = "-tpng"
-        elif imgformat == 'svg':
-            imgext = ".svg"
-            outopt = "-tsvg"
-        else:
-	    logger.error("Bad uml image format: "+imgformat)
-
-        # make a name
-        name =  tf.name+imgext
-
-        alt = self.options.get('alt', 'uml diagram')
-        classes = self.options.pop('class', ['uml'])
-        cmdline = ['plantuml', '-o', path, outopt, tf.name ]
-
-        try:
-            p = Popen(cmdline, stdout=PIPE, stderr=PIPE)
-            out, err = p.communicate()
-        except Exception, exc:
+        if imgformat not in FORMATS:
+            logger.error("Bad uml image format: "+imgformat)
             error = self.state_machine.reporter.error(
-                'Failed to run plantuml: %s' % (exc, ),
+                'Bad uml image format: %s' % (imgformat, ),
                 literal_block(self.block_text, self.block_text),
                 line=self.lineno)
-            nodes.append(error)
-        else:
-            if p.returncode == 0:
-	        # renaming output image using an hash code, just to not pullate 
-	        # output directory with a growing number of images
-                name = os.path.join(path, os.path.basename(name))
-	        newname = os.path.join(path, "%08x" % (adler32(body) & 0xffffffff))+imgext
-	        
-	        try: # for Windows
-		    os.remove(newname)  
-		except Exception, exc:
-		    logger.debug('File '+newname+' does not exist, not deleted')
-		
-	        os.rename(name, newname)
-                url = global_siteurl + '/images/' + os.path.basename(newname)
-                imgnode = image(uri=url, classes=classes, alt=alt)
-                nodes.append(imgnode)
-            else:
-                error = self.state_machine.reporter.error(
-                    'Error in "%s" directive: %s' % (self.name, err),
-                    literal_block(self.block_text, self.block_text),
-                    line=self.lineno)
-                nodes.append(error)
-
-        return nodes
+            return [error]
+
+        alt = self.options.get('alt', 'uml diagram')
+        classes = self.options.pop('class', ['uml'])
+        diagram = Diagram('\n'.join(self.content), imgformat, path)
+        if diagram.rendered:
+            return [image_node(diagram, classes, alt)]
+
+        # rendered with the other new diagrams of the document once it is read
+        document = self.state_machine.document
+        if not hasattr(document, 'plantuml_diagrams'):
+            document.plantuml_diagrams = {}
+        diagram = document.plantuml_diagrams.setdefault(diagram.name, diagram)
+        node = pending(PlantUMLTransform, {
+            'diagram': diagram, 'classes': classes, 'alt': alt,
+            'block_text': self.block_text, 'lineno': self.lineno})
+        document.note_pending(node)
+        return [node]
 
 def custom_url(generator, metadata):
     global global_siteurl
     global_siteurl = generator.settings['SITEURL']
-    
+
+def configure_workers(pelican):
+    global global_workers
+    global_workers = max(1, pelican.settings.get('PLANTUML_WORKERS', 1))
+
+def close_pool(pelican):
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        _pool.join()
+        _pool = None
+
 def register():
     """Plugin registration."""
+    signals.initialized.connect(configure_workers)
     signals.article_generator_context.connect(custom_url)
+    signals.finalized.connect(close_pool)
     directives.register_directive('uml', PlantUML)
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from docutils.core import publish_parts
+from docutils.parsers.rst import directives
+
+from plantuml import plantuml_rst
+
+# Writes an image for each source to the -o directory, and logs its arguments
+STUB = '''#!{python}
+import os, sys
+with open(os.environ['PLANTUML_CALLS'], 'a') as log:
+    log.write(' '.join(os.path.basename(arg) for arg in sys.argv[1:]) + '\\n')
+output_dir, imgformat = sys.argv[2], sys.argv[3][2:]
+for source in sys.argv[4:]:
+    name = os.path.splitext(os.path.basename(source))[0]
+    with open(os.path.join(output_dir, name + '.' + imgformat), 'w') as f:
+        f.write(open(source).read())
+'''
+
+DOCUMENT = '''
+.. uml::
+
+   A -> B: one
+
+.. uml::
+
+   A -> B: two
+
+.. uml::
+   :format: svg
+
+   A -> B: three
+'''
+
+
+class TestPlantUML(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        bin_dir = os.path.join(self.tmp, 'bin')
+        os.mkdir(bin_dir)
+        stub = os.path.join(bin_dir, 'plantuml')
+        with open(stub, 'w') as f:
+            f.write(STUB.format(python=sys.executable))
+        os.chmod(stub, os.stat(stub).st_mode | stat.S_IEXEC)
+        self.calls = os.path.join(self.tmp, 'calls')
+
+        patcher = mock.patch.dict(os.environ, {
+            'PATH': bin_dir + os.pathsep + os.environ.get('PATH', ''),
+            'PLANTUML_CALLS': self.calls})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # images are written to output/images in the current directory
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp)
+        directives.register_directive('uml', plantuml_rst.PlantUML)
+        plantuml_rst.global_workers = 1
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        plantuml_rst.global_workers = 1
+        plantuml_rst.close_pool(None)
+        shutil.rmtree(self.tmp)
+
+    def render(self, text):
+        return publish_parts(text, writer_name='html',
+                             settings_overrides={'report_level': 5})['body']
+
+    def invocations(self):
+        if not os.path.exists(self.calls):
+            return []
+        with open(self.calls) as f:
+            return f.read().splitlines()
+
+    def images(self):
+        return sorted(os.listdir(os.path.join('output', 'images')))
+
+    def test_one_run_per_document(self):
+        html = self.render(DOCUMENT)
+        calls = self.invocations()
+        # one run per image format
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(sorted(call.split()[2] for call in calls),
+                         ['-tpng', '-tsvg'])
+        self.assertEqual(sorted(len(call.split()) for call in calls), [4, 5])
+        images = self.images()
+        self.assertEqual([image.split('.')[1] for image in images],
+                         ['png', 'png', 'svg'])
+        for image in images:
+            self.assertIn('="/images/%s"' % image, html)
+
+    def test_unchanged_diagrams_are_not_rendered_again(self):
+        html = self.render(DOCUMENT)
+        images = self.images()
+        os.remove(self.calls)
+
+        self.assertEqual(self.render(DOCUMENT), html)
+        self.assertEqual(self.invocations(), [])
+        self.assertEqual(self.images(), images)
+
+        # only the changed diagram is rendered
+        self.render(DOCUMENT.replace('two', 'changed'))
+        calls = self.invocations()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(calls[0].split()), 4)
+        self.assertEqual(len(self.images()), 4)
+
+    def test_same_diagram_rendered_once(self):
+        self.render(DOCUMENT + DOCUMENT)
+        self.assertEqual(sorted(len(call.split())
+                                for call in self.invocations()), [4, 5])
+
+    def test_workers(self):
+        plantuml_rst.global_workers = 2
+        self.render(DOCUMENT)
+        # the two png diagrams are split between two runs
+        self.assertEqual(sorted(call.split()[2] + ' %d' % len(call.split())
+                                for call in self.invocations()),
+                         ['-tpng 4', '-tpng 4', '-tsvg 4'])
+        self.assertEqual(len(self.images()), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,62 +10,89 @@ read_mins: how many minutes to read this article, based on 250 wpm (http://en.wi
 word_counts: frquency count of all the words in the article; can be used for tag/word clouds/
 fi: Flesch-kincaid Index/ Reading Ease
 fk: Flesch-kincaid Grade Level
+sentences, syllables: the counts the readability scores are based on
+
+The same statistics summed over all published articles are available to
+templates as the site_stats context variable.
 
 """
 
 from pelican import signals
 from bs4 import BeautifulSoup
-import re
 from collections import Counter
 
 from .readability import *
 
+import sys
+
+
+# How fast do average people read?
+WPM = 250
+
+
+def read_minutes(wc):
+    # Calulate how long it'll take to read, rounding up
+    return max((wc + WPM - 1) // WPM, 1)
+
 
 def calculate_stats(instance):
+    soup_cache = sys.modules.get('soup_cache')  # None unless loaded as a plugin
 
     if instance._content is not None:
         stats = {}
         content = instance._content
 
-        # How fast do average people read?
-        WPM = 250
-
         # Use BeautifulSoup to get readable/visible text
-        raw_text = BeautifulSoup(content).getText()
+        if soup_cache:
+            raw_text = soup_cache.get_soup(instance).getText()
+        else:
+            raw_text = BeautifulSoup(content, 'html.parser').getText()
 
-        # Process the text to remove entities
-        entities = r'\&\#?.+?;'
-        raw_text = raw_text.replace('&nbsp;', ' ')
-        raw_text = re.sub(entities, '', raw_text)
-
-        # Flesch-kincaid readbility stats counts sentances,
-        # so save before removing punctuation
-        tmp = raw_text
-
-        # Process the text to remove punctuation
-        drop = u'.,?!@#$%^&*()_+-=\|/[]{}`~:;\'\"‘’—…“”'
-        raw_text = raw_text.translate(dict((ord(c), u'') for c in drop))
-
-        # Count the words in the text
-        words = raw_text.lower().split()
-        word_count = Counter(words)
+        # Count words, sentences and syllables in a single pass
+        word_count, readability_stats = analyse_text(raw_text)
+        stcs, words, sbls = readability_stats
 
         # Return the stats
         stats['word_counts'] = word_count
-        stats['wc'] = sum(word_count.values())
-
-        # Calulate how long it'll take to read, rounding up
-        stats['read_mins'] = (stats['wc'] + WPM - 1) // WPM
-        if stats['read_mins'] == 0:
-            stats['read_mins'] = 1
+        stats['wc'] = words
+        stats['sentences'] = stcs
+        stats['syllables'] = sbls
+        stats['read_mins'] = read_minutes(words)
 
         # Calculate Flesch-kincaid readbility stats
-        readability_stats = stcs, words, sbls = text_stats(tmp, stats['wc'])
         stats['fi'] = "{:.2f}".format(flesch_index(readability_stats))
         stats['fk'] = "{:.2f}".format(flesch_kincaid_level(readability_stats))
 
         instance.stats = stats
 
 
+def aggregate_stats(generator):
+    """Sum the per-article stats into a site-wide ``site_stats`` context
+    variable, reusing the counts computed on ``content_object_init``."""
+    word_count = Counter()
+    stcs = words = sbls = 0
+    for article in generator.articles:
+        stats = getattr(article, 'stats', None)
+        if not stats:
+            continue
+        word_count.update(stats['word_counts'])
+        stcs += stats['sentences']
+        words += stats['wc']
+        sbls += stats['syllables']
+
+    readability_stats = stcs, words, sbls
+    generator.context['site_stats'] = {
+        'articles': len(generator.articles),
+        'word_counts': word_count,
+        'wc': words,
+        'sentences': stcs,
+        'syllables': sbls,
+        'read_mins': read_minutes(words),
+        'fi': "{:.2f}".format(flesch_index(readability_stats)),
+        'fk': "{:.2f}".format(flesch_kincaid_level(readability_stats)),
+    }
+
+
 def register():
     signals.content_object_init.connect(calculate_stats)
+    signals.article_generator_finalized.connect(aggregate_stats)
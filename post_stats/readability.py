@@ -3,9 +3,29 @@
 # Adadpted from here: http://acdx.net/calculating-the-flesch-kincaid-level-in-python/
 # See here for details: http://en.wikipedia.org/wiki/Flesch%E2%80%93Kincaid_readability_test
 
-from __future__ import division
+from __future__ import division, unicode_literals
+from collections import Counter
 import re
 
+TERMINATORS = ".!?:;"
+
+_SILENT_ENDING = re.compile(r"(es|ed|(?<!l)e)$")
+_VOWEL_GROUP = re.compile(r"[aeiouy]+")
+_NON_ASCII_LETTER = re.compile(r"[^A-Za-z]+")
+_NOT_KEPT = re.compile(r"[^%s\sA-Za-z]+" % re.escape(TERMINATORS))
+_TERMINATOR_RUN = re.compile(r"\s*([%s]+\s*)+" % re.escape(TERMINATORS))
+_WHITESPACE = re.compile(r"\s+")
+
+# A word is a run of letters and digits, possibly joined by apostrophes or
+# hyphens (which are dropped, so "don't" counts as "dont"); a run of
+# terminators ends a sentence.
+_TOKEN = re.compile(r"([^\W_]+(?:['’\-][^\W_]+)*)|([%s]+)"
+                    % re.escape(TERMINATORS), re.UNICODE)
+_JOINERS = dict((ord(c), None) for c in "'’-")
+
+# word -> syllable count, shared by every document of the build
+_syllable_cache = {}
+
 
 def mean(seq):
     return sum(seq) / len(seq)
@@ -15,16 +35,27 @@ def syllables(word):
     if len(word) <= 3:
         return 1
 
-    word = re.sub(r"(es|ed|(?<!l)e)$", "", word)
-    return len(re.findall(r"[aeiouy]+", word))
+    word = _SILENT_ENDING.sub("", word)
+    return len(_VOWEL_GROUP.findall(word))
+
+
+def cached_syllables(word):
+    """Memoized ``syllables`` of a lowercased token.
+
+    Tokens without any ASCII letter (e.g. numbers) have no syllables.
+    """
+    try:
+        return _syllable_cache[word]
+    except KeyError:
+        letters = _NON_ASCII_LETTER.sub("", word)
+        count = _syllable_cache[word] = syllables(letters) if letters else 0
+        return count
 
 
 def normalize(text):
-    terminators = ".!?:;"
-    term = re.escape(terminators)
-    text = re.sub(r"[^%s\sA-Za-z]+" % term, "", text)
-    text = re.sub(r"\s*([%s]+\s*)+" % term, ". ", text)
-    return re.sub(r"\s+", " ", text)
+    text = _NOT_KEPT.sub("", text)
+    text = _TERMINATOR_RUN.sub(". ", text)
+    return _WHITESPACE.sub(" ", text)
 
 
 def text_stats(text, wc):
@@ -42,6 +73,37 @@ def text_stats(text, wc):
     return len(stcs), words, sbls
 
 
+def analyse_text(text):
+    """Tokenize ``text`` once and return ``(word_counts, stats)``.
+
+    ``word_counts`` is a ``Counter`` of lowercased words and ``stats`` the
+    ``(sentences, words, syllables)`` tuple expected by ``flesch_index`` and
+    ``flesch_kincaid_level``.  As in ``text_stats``, only sentences of at
+    least two words are counted, and only their syllables.
+    """
+    words = []
+    sentences = syllable_count = 0
+    sentence_words = sentence_syllables = 0
+    for word, terminator in _TOKEN.findall(text):
+        if word:
+            word = word.lower()
+            if not word.isalnum():
+                word = word.translate(_JOINERS)
+            words.append(word)
+            sentence_words += 1
+            sentence_syllables += cached_syllables(word)
+        else:
+            if sentence_words >= 2:
+                sentences += 1
+                syllable_count += sentence_syllables
+            sentence_words = sentence_syllables = 0
+    if sentence_words >= 2:
+        sentences += 1
+        syllable_count += sentence_syllables
+
+    return Counter(words), (sentences, len(words), syllable_count)
+
+
 def flesch_index(stats):
     stcs, words, sbls = stats
     if stcs == 0 or words == 0:
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import unittest
+
+from post_stats import post_stats
+from post_stats.readability import analyse_text
+
+SAMPLE = ("<p>The quick brown fox jumps over the lazy dog. It was a sunny "
+          "afternoon in the village, and nobody's garden was well-kept!</p>\n"
+          "<p>Children played happily near the river; their parents watched "
+          "carefully. Did anyone notice the beautiful rainbow?</p>\n"
+          "<p>Readability formulas estimate how difficult a text is: longer "
+          "sentences and words with many syllables lower the score.</p>")
+
+
+class Content(object):
+    def __init__(self, content):
+        self._content = content
+
+
+class Generator(object):
+    def __init__(self, articles):
+        self.articles = articles
+        self.context = {}
+
+
+class TestPostStats(unittest.TestCase):
+
+    def test_stats(self):
+        # the values of the implementation based on text_stats
+        article = Content(SAMPLE)
+        post_stats.calculate_stats(article)
+        stats = article.stats
+        self.assertEqual(stats['wc'], 56)
+        self.assertEqual(stats['sentences'], 7)
+        self.assertEqual(stats['syllables'], 94)
+        self.assertEqual(stats['fi'], '56.71')
+        self.assertEqual(stats['fk'], '7.34')
+        self.assertEqual(stats['read_mins'], 1)
+        self.assertEqual(stats['word_counts']['the'], 6)
+        self.assertEqual(stats['word_counts']['nobodys'], 1)
+        self.assertEqual(stats['word_counts']['wellkept'], 1)
+
+    def test_short_sentences_are_not_counted(self):
+        word_counts, stats = analyse_text('Hello. Good morning to you!')
+        self.assertEqual(stats, (1, 5, 5))
+        self.assertEqual(sum(word_counts.values()), 5)
+
+    def test_site_stats(self):
+        articles = [Content(SAMPLE), Content(SAMPLE)]
+        for article in articles:
+            post_stats.calculate_stats(article)
+        generator = Generator(articles)
+        post_stats.aggregate_stats(generator)
+        site_stats = generator.context['site_stats']
+        self.assertEqual(site_stats['articles'], 2)
+        self.assertEqual(site_stats['wc'], 112)
+        self.assertEqual(site_stats['sentences'], 14)
+        self.assertEqual(site_stats['syllables'], 188)
+        self.assertEqual(site_stats['fi'], '56.71')
+        self.assertEqual(site_stats['word_counts']['the'], 12)
+
+    def test_site_stats_without_articles(self):
+        generator = Generator([])
+        post_stats.aggregate_stats(generator)
+        site_stats = generator.context['site_stats']
+        self.assertEqual(site_stats['articles'], 0)
+        self.assertEqual(site_stats['wc'], 0)
+        self.assertEqual(site_stats['fi'], '0.00')
+        self.assertEqual(site_stats['fk'], '0.00')
+        self.assertEqual(site_stats['read_mins'], 1)
+        self.assertEqual(len(site_stats['word_counts']), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
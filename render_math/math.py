@@ -12,7 +12,10 @@ Math therefore gets treated like a "first class citizen" in Pelican
 For reStructuredText, the plugin instructs the rst engine
 to output Mathjax for for math.
 
-The mathjax script is automatically inserted into the HTML.
+Every content object gets a ``math_needed`` attribute telling whether it
+contains math left for MathJax. Templates can add the mathjax script, given
+to them as ``MATH_JAX_SCRIPT``, to the pages needing it; otherwise it is
+appended to the content needing it.
 
 Typogrify Compatibility
 -----------------------
@@ -28,10 +31,12 @@ See README for more details.
 """
 
 import os
+import re
 import sys
 
 from pelican import signals
 from . pelican_mathjax_markdown_extension import PelicanMathJaxExtension
+from . import prerender
 
 def process_settings(pelicanobj):
     """Sets user specified MathJax settings (see README for more details)"""
@@ -50,6 +55,8 @@ def process_settings(pelicanobj):
     mathjax_settings['process_escapes'] = 'true'  # controls whether escapes are processed
     mathjax_settings['latex_preview'] = 'TeX'  # controls what user sees while waiting for LaTex to render
     mathjax_settings['color'] = 'black'  # controls color math is rendered in
+    mathjax_settings['prerender'] = False  # controls whether math is converted to MathML at build time
+    mathjax_settings['auto_insert'] = True  # controls whether the script is appended to the content needing it
 
     # Source for MathJax: Works boths for http and https (see http://docs.mathjax.org/en/latest/start.html#secure-access-to-the-cdn)
     mathjax_settings['source'] = "'//cdn.mathjax.org/mathjax/latest/MathJax.js?config=TeX-AMS-MML_HTMLorMML'"
@@ -89,6 +96,12 @@ def process_settings(pelicanobj):
         if key == 'color' and isinstance(value, basestring):
             mathjax_settings[key] = value
 
+        if key == 'prerender' and isinstance(value, bool):
+            mathjax_settings[key] = value
+
+        if key == 'auto_insert' and isinstance(value, bool):
+            mathjax_settings[key] = value
+
     return mathjax_settings
 
 def configure_typogrify(pelicanobj, mathjax_settings):
@@ -129,11 +142,14 @@ def configure_typogrify(pelicanobj, mathjax_settings):
 def process_mathjax_script(mathjax_settings):
     """Load the mathjax script template from file, and render with the settings"""
 
-    # Read the mathjax javascript template from file
-    with open (os.path.dirname(os.path.realpath(__file__))+'/mathjax_script_template', 'r') as mathjax_script_template:
-        mathjax_template = mathjax_script_template.read()
+    # Read the mathjax javascript template from file, only once
+    if process_mathjax_script.template is None:
+        with open (os.path.dirname(os.path.realpath(__file__))+'/mathjax_script_template', 'r') as mathjax_script_template:
+            process_mathjax_script.template = mathjax_script_template.read()
+
+    return process_mathjax_script.template.format(**mathjax_settings)
 
-    return mathjax_template.format(**mathjax_settings)
+process_mathjax_script.template = None
 
 def mathjax_for_markdown(pelicanobj, mathjax_settings):
     """Instantiates a customized markdown extension for handling mathjax
@@ -141,7 +157,6 @@ def mathjax_for_markdown(pelicanobj, mathjax_settings):
 
     # Create the configuration for the markdown template
     config = {}
-    config['mathjax_script'] = process_mathjax_script(mathjax_settings)
     config['math_tag_class'] = 'math'
 
     # Instantiate markdown extension and append it to the current extensions
@@ -154,35 +169,82 @@ def mathjax_for_markdown(pelicanobj, mathjax_settings):
 
 def mathjax_for_rst(pelicanobj, mathjax_settings):
     pelicanobj.settings['DOCUTILS_SETTINGS'] = {'math_output': 'MathJax'}
-    rst_add_mathjax.mathjax_script = process_mathjax_script(mathjax_settings)
+
+def configure_prerender(pelicanobj, mathjax_settings):
+    """Sets up the MathML renderer used to convert math at build time"""
+
+    prerender_math.renderer = None
+    if not mathjax_settings['prerender']:
+        return
+
+    if prerender.latex2mathml is None:
+        mathjax_settings['prerender'] = False
+        print("\nlatex2mathml is not installed, so math is not prerendered.\nIf you want to use it, please install via: pip install latex2mathml\n")
+        return
+
+    cache_file = os.path.join(pelicanobj.settings.get('CACHE_PATH', 'cache'),
+                              'render_math', 'mathml.json')
+    prerender_math.renderer = prerender.MathMLRenderer(cache_file)
 
 def pelican_init(pelicanobj):
     """Loads the mathjax script according to the settings. Instantiate the Python
-    markdown extension, passing in the mathjax script as config parameter
+    markdown extension and configure the rst engine to output math for mathjax
     """
 
     # Process settings
     mathjax_settings = process_settings(pelicanobj)
 
+    # Render the mathjax script once. Templates include it in the pages
+    # needing it, or it is appended to the content needing it
+    mathjax_script = ("<script type='text/javascript'>%s</script>" %
+                      process_mathjax_script(mathjax_settings))
+    pelicanobj.settings['MATH_JAX_SCRIPT'] = mathjax_script
+    process_math.script = mathjax_script if mathjax_settings['auto_insert'] else None
+
     # Configure Typogrify
     configure_typogrify(pelicanobj, mathjax_settings)
 
+    # Configure MathML prerendering
+    configure_prerender(pelicanobj, mathjax_settings)
+
     # Configure Mathjax For Markdown
     mathjax_for_markdown(pelicanobj, mathjax_settings)
 
     # Configure Mathjax For RST
     mathjax_for_rst(pelicanobj, mathjax_settings)
 
-def rst_add_mathjax(instance):
-    _, ext = os.path.splitext(os.path.basename(instance.source_path))
-    if ext != '.rst':
+def prerender_math(instance):
+    """Converts math to MathML where possible, when prerendering is enabled"""
+    if prerender_math.renderer is None:
+        return
+
+    instance._content, _ = prerender_math.renderer.render(instance._content)
+
+prerender_math.renderer = None
+
+def save_prerender_cache(pelicanobj):
+    if prerender_math.renderer is not None:
+        prerender_math.renderer.save()
+
+# Math still to be typeset by MathJax, i.e. not converted to MathML
+MATHJAX_NEEDED = re.compile(r'class="math">(?!<math)')
+
+def process_math(instance):
+    """Prerenders the math of a content object and sets its math_needed
+    attribute, telling whether math is left for MathJax"""
+    instance.math_needed = False
+    if instance._content is None or 'class="math"' not in instance._content:
         return
 
-    # If math class is present in text, add the javascript
-    if 'class="math"' in instance._content:
-        instance._content += "<script type='text/javascript'>%s</script>" % rst_add_mathjax.mathjax_script
+    prerender_math(instance)
+    instance.math_needed = bool(MATHJAX_NEEDED.search(instance._content))
+    if instance.math_needed and process_math.script:
+        instance._content += process_math.script
+
+process_math.script = None
 
 def register():
     """Plugin registration"""
     signals.initialized.connect(pelican_init)
-    signals.content_object_init.connect(rst_add_mathjax)
+    signals.content_object_init.connect(process_math)
+    signals.finalized.connect(save_prerender_cache)
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Build-time MathML rendering
+===========================
+Converts the TeX of the ``span``/``div`` elements of class ``math`` produced
+by the Markdown extension and by docutils into MathML, so that browsers do
+not have to wait for MathJax to typeset them.
+
+Conversion is done by the pure-python latex2mathml package.  Expressions it
+cannot handle (numbered equations, labels and references, unknown commands)
+are left untouched for MathJax.  Results, including failures, are cached on
+disk keyed by the TeX string.
+"""
+
+import json
+import os
+import re
+
+try:
+    from html import unescape
+except ImportError:
+    from HTMLParser import HTMLParser
+    unescape = HTMLParser().unescape
+
+try:
+    import latex2mathml
+    from latex2mathml.converter import convert
+except ImportError:
+    latex2mathml = None
+
+MATH_ELEMENT = re.compile(r'<(span|div) class="math">(.*?)</\1>', re.DOTALL)
+DELIMITERS = ((r'\(', r'\)', 'inline'),
+              (r'\[', r'\]', 'block'),
+              ('$$', '$$', 'block'))
+UNNUMBERED_ENVIRONMENT = re.compile(
+    r'^\\begin\{(equation\*|displaymath)\}(.*)\\end\{\1\}$', re.DOTALL)
+# MathJax handles the numbering and cross references of equations
+MATHJAX_ONLY = re.compile(r'\\(label|ref|eqref|tag)\b')
+
+
+class MathMLRenderer(object):
+    """Converts TeX to MathML, with a cache persisted in ``cache_file``"""
+
+    def __init__(self, cache_file=None):
+        self.cache_file = cache_file
+        self.version = getattr(latex2mathml, '__version__', None)
+        self.cache = {}
+        self.dirty = False
+        if cache_file and os.path.exists(cache_file):
+            try:
+                with open(cache_file, 'rb') as fh:
+                    data = json.loads(fh.read().decode('utf-8'))
+            except (IOError, OSError, ValueError):
+                data = {}
+            if data.get('version') == self.version:
+                self.cache = data.get('mathml', {})
+
+    def save(self):
+        if not self.cache_file or not self.dirty:
+            return
+        directory = os.path.dirname(self.cache_file)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(self.cache_file, 'wb') as fh:
+            fh.write(json.dumps({'version': self.version,
+                                 'mathml': self.cache}).encode('utf-8'))
+        self.dirty = False
+
+    def to_mathml(self, tex):
+        """Return the MathML of the delimited TeX ``tex``, or None"""
+        if tex in self.cache:
+            return self.cache[tex]
+
+        mathml = None
+        source, display = split_delimiters(tex.strip())
+        if source is not None and not MATHJAX_ONLY.search(source):
+            try:
+                mathml = convert(source, display=display)
+            except Exception:
+                pass
+            else:
+                # unknown commands are rendered literally, e.g. <mi>\foo</mi>
+                if '>\\' in mathml:
+                    mathml = None
+
+        self.cache[tex] = mathml
+        self.dirty = True
+        return mathml
+
+    def render(self, html):
+        """Replace the math in ``html`` by MathML where possible.
+
+        Returns the new html and whether math is left for MathJax.
+        """
+        left = []
+
+        def replace(match):
+            mathml = self.to_mathml(unescape(match.group(2)))
+            if mathml is None:
+                left.append(match)
+                return match.group(0)
+            return '<{0} class="math">{1}</{0}>'.format(match.group(1),
+                                                       mathml)
+
+        html = MATH_ELEMENT.sub(replace, html)
+        return html, bool(left)
+
+
+def split_delimiters(tex):
+    """Return the TeX inside its math delimiters and the display mode, or
+    (None, None) for math that should be left to MathJax."""
+    for start, end, display in DELIMITERS:
+        if (tex.startswith(start) and tex.endswith(end) and
+                len(tex) >= len(start) + len(end)):
+            return tex[len(start):-len(end)], display
+    match = UNNUMBERED_ENVIRONMENT.match(tex)
+    if match:
+        return match.group(2), 'block'
+    return None, None
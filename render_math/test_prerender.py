@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from render_math import math, prerender
+
+
+@unittest.skipIf(prerender.latex2mathml is None, 'latex2mathml not installed')
+class TestMathMLRenderer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.tmp, 'render_math', 'mathml.json')
+        self.renderer = prerender.MathMLRenderer(self.cache_file)
+
+    def tearDown(self):
+        math.prerender_math.renderer = None
+        shutil.rmtree(self.tmp)
+
+    def test_inline(self):
+        html, left = self.renderer.render(
+            '<p>Area <span class="math">\\(x^2\\)</span>.</p>')
+        self.assertFalse(left)
+        self.assertTrue(html.startswith(
+            '<p>Area <span class="math"><math '))
+        self.assertIn('display="inline"', html)
+        self.assertIn('<mi>x</mi><mn>2</mn>', html)
+
+    def test_display(self):
+        for tex in ('\\[x^2\\]', '$$x^2$$',
+                    '\\begin{equation*}x^2\\end{equation*}'):
+            html, left = self.renderer.render(
+                '<div class="math">%s</div>' % tex)
+            self.assertFalse(left)
+            self.assertTrue(html.startswith('<div class="math"><math '))
+            self.assertIn('display="block"', html)
+
+    def test_escaped_tex(self):
+        html, left = self.renderer.render(
+            '<span class="math">\\(a &lt; b\\)</span>')
+        self.assertFalse(left)
+        self.assertIn('<mi>a</mi><mo>', html)
+        self.assertNotIn('&amp;', html)
+
+    def test_left_for_mathjax(self):
+        for tex in ('\\begin{equation}x^2\\end{equation}',
+                    '\\[x^2 \\label{eq}\\]', '\\(\\eqref{eq}\\)',
+                    '\\(\\unknowncommand{x}\\)', 'x^2'):
+            html = '<div class="math">%s</div>' % tex
+            self.assertEqual(self.renderer.render(html), (html, True))
+
+    def test_converter_error(self):
+        html = '<span class="math">\\(x^2\\)</span>'
+        with mock.patch.object(prerender, 'convert',
+                               side_effect=ValueError('oops')):
+            self.assertEqual(self.renderer.render(html), (html, True))
+
+    def test_cache(self):
+        self.renderer.render('<span class="math">\\(x^2\\)</span>')
+        self.renderer.save()
+        self.assertTrue(os.path.exists(self.cache_file))
+
+        renderer = prerender.MathMLRenderer(self.cache_file)
+        with mock.patch.object(prerender, 'convert') as convert:
+            html, left = renderer.render('<span class="math">\\(x^2\\)</span>')
+        self.assertFalse(convert.called)
+        self.assertIn('<math ', html)
+
+        # conversions made by another latex2mathml version are not used
+        with mock.patch.object(prerender.latex2mathml, '__version__', 'other',
+                               create=True):
+            self.assertEqual(prerender.MathMLRenderer(self.cache_file).cache,
+                             {})
+
+    def test_math_needed(self):
+        math.prerender_math.renderer = self.renderer
+
+        content = mock.Mock(_content='<p><span class="math">\\(x^2\\)</span>'
+                                     '</p>')
+        math.process_math(content)
+        self.assertFalse(content.math_needed)
+        self.assertIsNone(math.MATHJAX_NEEDED.search(content._content))
+
+        content = mock.Mock(_content='<p><span class="math">\\(x^2\\)</span> '
+                                     '<span class="math">\\(\\ref{a}\\)</span>'
+                                     '</p>')
+        math.process_math(content)
+        self.assertTrue(content.math_needed)
+
+
+class TestConfigurePrerender(unittest.TestCase):
+
+    def tearDown(self):
+        math.prerender_math.renderer = None
+
+    def test_without_latex2mathml(self):
+        pelican = mock.Mock(settings={'CACHE_PATH': 'cache'})
+        settings = {'prerender': True}
+        with mock.patch.object(prerender, 'latex2mathml', None):
+            math.configure_prerender(pelican, settings)
+        self.assertFalse(settings['prerender'])
+        self.assertIsNone(math.prerender_math.renderer)
+
+        # math is then left to MathJax
+        content = mock.Mock(_content='<span class="math">\\(x^2\\)</span>')
+        math.process_math(content)
+        self.assertTrue(content.math_needed)
+        self.assertEqual(content._content,
+                         '<span class="math">\\(x^2\\)</span>')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import unittest
+
+from render_math import math
+
+
+class Pelican(object):
+    def __init__(self, mathjax_settings):
+        self.settings = {'MD_EXTENSIONS': [], 'MATH_JAX': mathjax_settings}
+
+
+class Content(object):
+    def __init__(self, content):
+        self._content = content
+
+
+class TestMathNeeded(unittest.TestCase):
+
+    def setUp(self):
+        self.pelican = Pelican({})
+        math.pelican_init(self.pelican)
+        self.script = self.pelican.settings['MATH_JAX_SCRIPT']
+
+    def tearDown(self):
+        math.process_math.script = None
+
+    def test_script_setting(self):
+        self.assertTrue(self.script.startswith("<script type='text/javascript'>"))
+        self.assertIn('mathjaxscript_pelican_', self.script)
+
+    def test_content_with_math(self):
+        content = Content('<p><span class="math">\\(x^2\\)</span></p>')
+        math.process_math(content)
+        self.assertTrue(content.math_needed)
+        self.assertTrue(content._content.endswith(self.script))
+
+    def test_content_without_math(self):
+        content = Content('<p>No math here</p>')
+        math.process_math(content)
+        self.assertFalse(content.math_needed)
+        self.assertEqual(content._content, '<p>No math here</p>')
+
+        content = Content(None)
+        math.process_math(content)
+        self.assertFalse(content.math_needed)
+
+    def test_script_left_to_templates(self):
+        math.pelican_init(Pelican({'auto_insert': False}))
+        content = Content('<div class="math">$$x^2$$</div>')
+        math.process_math(content)
+        self.assertTrue(content.math_needed)
+        self.assertEqual(content._content, '<div class="math">$$x^2$$</div>')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,12 @@
 from pelican import signals
 from pelican.contents import Content, Article
 from bs4 import BeautifulSoup
+from six import text_type
+
+import sys
 
 def images_extraction(instance):
+    soup_cache = sys.modules.get('soup_cache')  # None unless loaded as a plugin
     representativeImage = None
     if type(instance) == Article:
         if 'image' in instance.metadata:
@@ -10,7 +14,10 @@ def images_extraction(instance):
 
         # Process Summary:
         # If summary contains images, extract one to be the representativeImage and remove images from summary
-        soup = BeautifulSoup(instance.summary, 'html.parser')
+        if soup_cache:
+            soup = soup_cache.get_soup(instance, 'summary')
+        else:
+            soup = BeautifulSoup(instance.summary, 'html.parser')
         images = soup.find_all('img')
         for i in images:
             if not representativeImage:
@@ -18,14 +25,27 @@ def images_extraction(instance):
             i.extract()
         if len(images) > 0:
             # set _summary field which is based on metadata. summary field is only based on article's content and not settable
-            instance._summary = unicode(soup)
+            if soup_cache:
+                soup_cache.soup_modified(instance, soup, 'summary')
+            else:
+                instance._summary = text_type(soup)
         
         # If there are no image in summary, look for it in the content body
         if not representativeImage:
-            soup = BeautifulSoup(instance.content, 'html.parser')
+            if soup_cache:
+                soup = soup_cache.get_soup(instance)
+            else:
+                soup = BeautifulSoup(instance.content, 'html.parser')
             imageTag = soup.find('img')
             if imageTag:
                 representativeImage = imageTag['src']
+                if soup_cache:
+                    # the shared soup holds _content, resolve {filename} links
+                    # the same way instance.content would
+                    representativeImage = BeautifulSoup(
+                        instance._update_content(text_type(imageTag),
+                                                 instance.get_siteurl()),
+                        'html.parser').img['src']
         
         # Set the attribute to content instance
         instance.featured_image = representativeImage
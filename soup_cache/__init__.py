@@ -0,0 +1 @@
+from .soup_cache import *
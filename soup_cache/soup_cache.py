@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Soup Cache
+==========
+
+Shares one parsed BeautifulSoup document per content object between the
+plugins that post-process ``_content`` and ``summary`` on
+``content_object_init``.  The document is parsed lazily on first use, mutated
+in place by every participating plugin and serialized back once.
+
+Plugins opt in through ``get_soup`` / ``soup_modified``.  When this plugin is
+not enabled, ``get_soup`` parses a fresh document on every call and
+``soup_modified`` writes it back immediately, which is exactly the behaviour
+of a plugin doing its own parsing.
+"""
+
+from __future__ import unicode_literals
+
+import logging
+
+from bs4 import BeautifulSoup
+from pelican import signals
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARSER = 'html.parser'
+
+# name -> (function returning the HTML to parse, attribute written back to)
+SOURCES = {
+    'content': (lambda instance: instance._content, '_content'),
+    'summary': (lambda instance: instance.summary, '_summary'),
+}
+
+_CACHE_ATTR = '_soup_cache'
+
+_enabled = False
+_parser = DEFAULT_PARSER
+_pending = []
+
+
+class SharedDocument(object):
+    """A parsed fragment of one content object.
+
+    ``written`` holds the value of the target attribute at the time the
+    document was parsed or last serialized, so that changes made behind the
+    cache's back by plugins which have not opted in can be detected.
+    """
+
+    def __init__(self, html, parser, written):
+        self.soup = BeautifulSoup(html, parser)
+        # lxml and html5lib wrap fragments into <html><body>, serialize only
+        # what was actually parsed
+        self.wrapped = (self.soup.body is not None and
+                        '<body' not in html.lower())
+        self.written = written
+        self.dirty = False
+
+    def serialize(self):
+        if self.wrapped:
+            return self.soup.body.decode_contents()
+        return self.soup.decode()
+
+
+def _documents(instance):
+    documents = getattr(instance, _CACHE_ATTR, None)
+    if documents is None:
+        documents = {}
+        setattr(instance, _CACHE_ATTR, documents)
+    return documents
+
+
+def get_soup(instance, name='content'):
+    """Return the shared soup of ``instance``'s ``name`` fragment.
+
+    ``name`` is one of the keys of ``SOURCES``.  Callers mutating the soup
+    must call ``soup_modified`` afterwards.
+    """
+    source, target = SOURCES[name]
+    if not _enabled:
+        return BeautifulSoup(source(instance), _parser)
+
+    documents = _documents(instance)
+    document = documents.get(name)
+    current = getattr(instance, target, None)
+    if document is not None and document.written is not current:
+        if document.dirty:
+            logger.warning('soup_cache: %s of %s was changed by a plugin not '
+                           'using soup_cache, discarding pending changes',
+                           name, getattr(instance, 'source_path', instance))
+        document = None
+    if document is None:
+        document = SharedDocument(source(instance), _parser, current)
+        documents[name] = document
+    return document.soup
+
+
+def soup_modified(instance, soup, name='content'):
+    """Record that ``soup`` (as returned by ``get_soup``) was mutated.
+
+    With the cache enabled, serialization is deferred until ``flush``;
+    otherwise the fragment is written back right away.
+    """
+    target = SOURCES[name][1]
+    if not _enabled:
+        setattr(instance, target, soup.decode())
+        return
+
+    document = _documents(instance)[name]
+    if not document.dirty:
+        document.dirty = True
+        _pending.append(instance)
+
+
+def flush(instance):
+    """Serialize every modified document of ``instance`` and drop them."""
+    documents = getattr(instance, _CACHE_ATTR, None)
+    if not documents:
+        return
+    for name, document in documents.items():
+        if not document.dirty:
+            continue
+        target = SOURCES[name][1]
+        if getattr(instance, target, None) is not document.written:
+            logger.warning('soup_cache: %s of %s was changed by a plugin not '
+                           'using soup_cache, discarding pending changes',
+                           name, getattr(instance, 'source_path', instance))
+            continue
+        setattr(instance, target, document.serialize())
+    setattr(instance, _CACHE_ATTR, None)
+
+
+def flush_pending(*args):
+    while _pending:
+        flush(_pending.pop())
+
+
+def initialized(pelican):
+    global _enabled, _parser
+    _enabled = True
+    _parser = pelican.settings.get('SOUP_CACHE_PARSER', DEFAULT_PARSER)
+
+
+def content_object_init(instance):
+    flush(instance)
+
+
+def register():
+    signals.initialized.connect(initialized)
+    signals.content_object_init.connect(content_object_init)
+    signals.article_generator_finalized.connect(flush_pending)
+    signals.page_generator_finalized.connect(flush_pending)
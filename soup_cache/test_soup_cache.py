@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from pelican import Pelican, signals
+from pelican.contents import Article
+from pelican.settings import read_settings
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+try:
+    from soup_cache import soup_cache
+except ImportError:  # run from within the plugin folder
+    import soup_cache
+
+TEST_CONTENT = '<p>Hello <a href="foo">world</a></p><div class="toc">toc</div>'
+TEST_SUMMARY = '<p>Hello <img src="/static/a.png"/></p>'
+
+
+class FakePelican(object):
+    def __init__(self, **settings):
+        self.settings = settings
+
+
+class TestSoupCache(unittest.TestCase):
+
+    def setUp(self):
+        super(TestSoupCache, self).setUp()
+        self.article = Article(TEST_CONTENT,
+                               metadata={'title': 'foo',
+                                         'summary': TEST_SUMMARY})
+
+    def tearDown(self):
+        soup_cache._enabled = False
+        soup_cache._parser = soup_cache.DEFAULT_PARSER
+        del soup_cache._pending[:]
+        super(TestSoupCache, self).tearDown()
+
+    def test_disabled_writes_back_immediately(self):
+        soup = soup_cache.get_soup(self.article)
+        self.assertIsNot(soup, soup_cache.get_soup(self.article))
+        soup.find('div', class_='toc').extract()
+        soup_cache.soup_modified(self.article, soup)
+        self.assertEqual(self.article._content,
+                         '<p>Hello <a href="foo">world</a></p>')
+
+    def test_enabled_shares_one_document(self):
+        soup_cache.initialized(FakePelican())
+        soup = soup_cache.get_soup(self.article)
+        self.assertIs(soup, soup_cache.get_soup(self.article))
+
+        soup.find('div', class_='toc').extract()
+        soup_cache.soup_modified(self.article, soup)
+        soup.a['href'] = 'bar'
+        soup_cache.soup_modified(self.article, soup)
+
+        # serialization is deferred until the flush
+        self.assertEqual(self.article._content, TEST_CONTENT)
+        self.assertEqual(soup_cache._pending, [self.article])
+        soup_cache.flush_pending()
+        self.assertEqual(self.article._content,
+                         '<p>Hello <a href="bar">world</a></p>')
+        self.assertEqual(soup_cache._pending, [])
+
+    def test_summary_document(self):
+        soup_cache.initialized(FakePelican())
+        soup = soup_cache.get_soup(self.article, 'summary')
+        soup.img.extract()
+        soup_cache.soup_modified(self.article, soup, 'summary')
+        soup_cache.content_object_init(self.article)
+        self.assertEqual(self.article._summary, '<p>Hello </p>')
+        self.assertEqual(self.article._content, TEST_CONTENT)
+
+    def test_external_change_is_detected(self):
+        soup_cache.initialized(FakePelican())
+        soup = soup_cache.get_soup(self.article)
+        self.article._content = '<p>changed</p>'
+        new_soup = soup_cache.get_soup(self.article)
+        self.assertIsNot(soup, new_soup)
+        self.assertEqual(new_soup.p.string, 'changed')
+
+    def test_flush_keeps_external_change(self):
+        soup_cache.initialized(FakePelican())
+        soup = soup_cache.get_soup(self.article)
+        soup.find('div', class_='toc').extract()
+        soup_cache.soup_modified(self.article, soup)
+        # a plugin not using soup_cache rewrites _content before the flush
+        self.article._content = '<p>!youtube(abc)</p>'
+        soup_cache.flush_pending()
+        self.assertEqual(self.article._content, '<p>!youtube(abc)</p>')
+
+    def test_wrapping_parser(self):
+        try:
+            import lxml
+        except ImportError:
+            self.skipTest('lxml is not installed')
+        soup_cache.initialized(FakePelican(SOUP_CACHE_PARSER='lxml'))
+        soup = soup_cache.get_soup(self.article)
+        soup.a['href'] = 'bar'
+        soup_cache.soup_modified(self.article, soup)
+        soup_cache.flush(self.article)
+        self.assertEqual(self.article._content,
+                         '<p>Hello <a href="bar">world</a></p>'
+                         '<div class="toc">toc</div>')
+
+
+class TestPluginLoading(unittest.TestCase):
+    """Plugins loaded by Pelican from PLUGIN_PATHS, soup_cache listed last"""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        # Pelican adds the current directory to sys.path, build from the site
+        os.chdir(self.path)
+        self.receivers = dict((signal, signal.receivers.copy())
+                              for signal in vars(signals).values()
+                              if hasattr(signal, 'receivers'))
+
+    def tearDown(self):
+        for signal, receivers in self.receivers.items():
+            signal.receivers = receivers
+        os.chdir(self.cwd)
+        soup_cache._enabled = False
+        del soup_cache._pending[:]
+        shutil.rmtree(self.path)
+
+    def test_plugins_use_the_cache(self):
+        plugin_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        settings = read_settings(override={
+            'PATH': self.path, 'OUTPUT_PATH': self.path,
+            'PLUGIN_PATHS': [plugin_path],
+            'PLUGINS': ['extract_toc', 'soup_cache']})
+        # like a site's build: the plugins are not importable from sys.path
+        path = [entry for entry in sys.path
+                if os.path.abspath(entry or '.') != plugin_path]
+        modules = dict((name, module) for name, module in sys.modules.items()
+                       if name.split('.')[0] not in ('soup_cache', 'extract_toc'))
+        with mock.patch.object(sys, 'path', path), \
+                mock.patch.dict(sys.modules, modules, clear=True):
+            Pelican(settings)
+            loaded = sys.modules['soup_cache']
+            with mock.patch.object(loaded, 'get_soup',
+                                   wraps=loaded.get_soup) as get_soup:
+                article = Article(TEST_CONTENT, settings=settings,
+                                  metadata={'title': 'foo'})
+        self.assertTrue(get_soup.called)
+        self.assertEqual(article.toc, '<div class="toc">toc</div>')
+        self.assertEqual(article._content,
+                         '<p>Hello <a href="foo">world</a></p>')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from video_privacy_enhancer import video_privacy_enhancer as vpe
+
+
+class Content(object):
+    def __init__(self, content, settings):
+        self._content = content
+        self.settings = settings
+
+
+class Pelican(object):
+    def __init__(self, settings):
+        self.settings = settings
+
+
+class TestVideoPrivacyEnhancer(unittest.TestCase):
+
+    def setUp(self):
+        self.output_path = tempfile.mkdtemp()
+        self.settings = {'SITEURL': 'https://example.com',
+                         'OUTPUT_PATH': self.output_path}
+        self.subsite_settings = {'SITEURL': 'https://example.com/fr',
+                                 'OUTPUT_PATH': os.path.join(self.output_path,
+                                                             'fr', '')}
+        vpe.videos_found.clear()
+
+    def tearDown(self):
+        vpe.videos_found.clear()
+        shutil.rmtree(self.output_path)
+
+    def thumbnail(self, output_path, video_id):
+        return os.path.join(output_path, vpe.output_directory_for_thumbnails,
+                            video_id + '.jpg')
+
+    def test_shortcodes(self):
+        content = Content('<p>!youtube(abc)</p><p>!youtube(def) and '
+                          '!youtube(abc)</p>', self.settings)
+        vpe.process_youtube_shortcodes(content)
+        self.assertNotIn('!youtube', content._content)
+        self.assertEqual(content._content.count('<img '), 3)
+        self.assertIn('id="def" src="https://example.com/'
+                      + vpe.output_directory_for_thumbnails + '/def.jpg"',
+                      content._content)
+        self.assertEqual(vpe.videos_found,
+                         {self.output_path: set(['abc', 'def'])})
+
+        content = Content('<p>No video</p>', self.settings)
+        vpe.process_youtube_shortcodes(content)
+        self.assertEqual(content._content, '<p>No video</p>')
+
+    def test_thumbnails_of_each_site(self):
+        vpe.process_youtube_shortcodes(
+            Content('!youtube(abc) !youtube(def)', self.settings))
+        vpe.process_youtube_shortcodes(
+            Content('!youtube(abc) !youtube(fr)', self.subsite_settings))
+        # already downloaded by a previous build
+        vpe.check_for_thumbnail_directory(self.output_path)
+        with open(self.thumbnail(self.output_path, 'def'), 'wb') as f:
+            f.write(b'old')
+
+        def download(video_ids, settings):
+            return [video_id.encode('ascii') for video_id in video_ids]
+
+        with mock.patch.object(vpe, 'download_thumbnails',
+                               side_effect=download) as download_thumbnails:
+            # the subsites are generated, and finalized, first
+            vpe.save_missing_thumbnails(Pelican(self.subsite_settings))
+            self.assertEqual(download_thumbnails.call_args[0][0],
+                             ['abc', 'fr'])
+            vpe.save_missing_thumbnails(Pelican(self.settings))
+            self.assertEqual(download_thumbnails.call_args[0][0], ['abc'])
+
+        self.assertEqual(vpe.videos_found, {})
+        for output_path, video_id, data in (
+                (self.subsite_settings['OUTPUT_PATH'], 'fr', b'fr'),
+                (self.subsite_settings['OUTPUT_PATH'], 'abc', b'abc'),
+                (self.output_path, 'abc', b'abc'),
+                (self.output_path, 'def', b'old')):
+            with open(self.thumbnail(output_path, video_id), 'rb') as f:
+                self.assertEqual(f.read(), data)
+        self.assertFalse(os.path.exists(
+            self.thumbnail(self.output_path, 'fr')))
+
+
+if __name__ == '__main__':
+    unittest.main()
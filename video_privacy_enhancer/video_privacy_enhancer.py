@@ -16,6 +16,9 @@ SETTINGS
 # Do not use a leading or trailing slash below (e.g., use "images/video-thumbnails"):
 output_directory_for_thumbnails = "images/video-thumbnails"
 
+# How many thumbnails are downloaded at the same time (when the http_cache plugin is loaded, its HTTP_CACHE_MAX_CONNECTIONS setting is used instead):
+maximum_concurrent_downloads = 4
+
 """ 
 In order for this plugin to work optimally, you need to do just a few things:
 
@@ -71,12 +74,27 @@ from pelican import signals # For making this plugin work with Pelican.
 import os.path # For checking whether files are present in the filesystem.
 
 import re # For using regular expressions.
-import urllib # For downloading the video thumbnails.
+import sys # For finding the http_cache plugin, if it is loaded.
+from io import BytesIO # For converting the thumbnails in memory.
+from multiprocessing.pool import ThreadPool # For downloading several thumbnails at the same time.
+from six.moves.urllib.request import urlopen # For downloading the video thumbnails when the http_cache plugin is not loaded.
+
+try:
+    from PIL import Image # For (optionally) resizing the thumbnails and converting them to WebP.
+except ImportError:
+    Image = None
 
 import logging
 logger = logging.getLogger(__name__) # For using logger.debug() to log errors or other notes.
 
 
+# A regular expression matching '!youtube(...)', with what's inside of the parentheses (the video ID) as its group:
+youtube_shortcode = re.compile(r'\!youtube\((.*?)\)')
+
+# The IDs of the videos found in the content, whose thumbnails are downloaded together once the site is generated. They are kept by OUTPUT_PATH, as each site (e.g. each i18n subsite) saves the thumbnails of its own content in its own output folder:
+videos_found = {}
+
+
 # A function to check whtether output_directory_for_thumbnails (a variable set above in the SETTINGS section) exists. If it doesn't exist, we'll create it.
 def check_for_thumbnail_directory(pelican_output_path):
     # Per http://stackoverflow.com/a/84173, check if a file exists. isfile() works on files, and exists() works on files and directories.
@@ -85,18 +103,96 @@ def check_for_thumbnail_directory(pelican_output_path):
             os.makedirs(pelican_output_path + "/" + output_directory_for_thumbnails) # Create the directory to hold the video thumbnails.
             return True
     except:
-        print logger.debug("Error in checking if thumbnail folder exists and making the directory if it doesn't.") # In case something goes wrong.
+        logger.debug("Error in checking if thumbnail folder exists and making the directory if it doesn't.") # In case something goes wrong.
         return False
 
 
-# A function to download the video thumbnail from YouTube (currently the only supported video platform):
-def download_thumbnail(video_id_from_shortcode, pelican_output_path):
+# A function returning the file extension of the thumbnails: "webp" if VIDEO_PRIVACY_ENHANCER_THUMBNAIL_FORMAT = "webp" is set in pelicanconf.py (and Pillow is installed to convert them), "jpg" otherwise.
+def thumbnail_extension(settings):
+    if str(settings.get('VIDEO_PRIVACY_ENHANCER_THUMBNAIL_FORMAT', 'jpg')).lower() == 'webp' and Image is not None:
+        return 'webp'
+    return 'jpg'
+
+
+# A function to resize a downloaded thumbnail to VIDEO_PRIVACY_ENHANCER_THUMBNAIL_WIDTH pixels wide and/or to convert it to WebP, if these settings ask for it:
+def convert_thumbnail(thumbnail, settings):
+    width = settings.get('VIDEO_PRIVACY_ENHANCER_THUMBNAIL_WIDTH')
+    image_format = thumbnail_extension(settings)
+    if Image is None or (not width and image_format == 'jpg'): # Nothing to do: keep the image as YouTube serves it.
+        return thumbnail
+
+    image = Image.open(BytesIO(thumbnail))
+    if width and image.size[0] > width: # Only ever make the image smaller, keeping its aspect ratio:
+        image = image.resize((width, max(1, image.size[1] * width // image.size[0])), Image.LANCZOS)
+    converted = BytesIO()
+    if image_format == 'webp':
+        image.save(converted, 'WEBP')
+    else:
+        image.convert('RGB').save(converted, 'JPEG', quality=90)
+    return converted.getvalue()
+
+
+# A function to download the video thumbnails from YouTube (currently the only supported video platform), several at a time. It returns the image (or None, if it couldn't be downloaded) of each video:
+def download_thumbnails(video_ids, settings):
+    # This follows the instructions at http://www.reelseo.com/youtube-thumbnail-image/ for downloading YouTube thumbnail images:
+    thumbnail_urls = ["https://img.youtube.com/vi/" + video_id + "/0.jpg" for video_id in video_ids]
+
+    http_cache = sys.modules.get('http_cache') # For downloading the video thumbnails through the shared HTTP cache, None unless the http_cache plugin is loaded.
+    if http_cache is not None:
+        # Fetch the thumbnails through the shared cache, which reuses connections, times out, bounds the number of concurrent downloads and keeps a copy for the next (clean) build:
+        responses = http_cache.fetch_many(thumbnail_urls, settings)
+        thumbnails = []
+        for video_id, response in zip(video_ids, responses):
+            if isinstance(response, http_cache.FetchError):
+                logger.warning("Cannot download the thumbnail of video %s: %s", video_id, response)
+                thumbnails.append(None)
+            else:
+                thumbnails.append(response.content)
+        return thumbnails
+
+    def download(thumbnail_url):
+        try:
+            return urlopen(thumbnail_url, timeout=10).read()
+        except Exception as e:
+            logger.warning("Cannot download %s: %s", thumbnail_url, e)
+            return None
+
+    pool = ThreadPool(max(1, min(len(thumbnail_urls), maximum_concurrent_downloads)))
+    try:
+        return pool.map(download, thumbnail_urls)
+    finally:
+        pool.close()
+        pool.join()
+
+
+# A function to save the thumbnails of all the videos found in the site's content which are not already in the output folder (if they've been previously downloaded). It runs once Pelican has generated the site, so a thumbnail is never removed by DELETE_OUTPUT_DIRECTORY:
+def save_missing_thumbnails(pelican_object):
+    settings = pelican_object.settings
+    pelican_output_path = settings['OUTPUT_PATH']
+    extension = thumbnail_extension(settings)
+    if extension != str(settings.get('VIDEO_PRIVACY_ENHANCER_THUMBNAIL_FORMAT', 'jpg')).lower():
+        logger.warning("Pillow is needed to convert the video thumbnails to %s, saving them as JPEG.", settings['VIDEO_PRIVACY_ENHANCER_THUMBNAIL_FORMAT'])
+
+    def thumbnail_path(video_id):
+        return pelican_output_path + "/" + output_directory_for_thumbnails + "/" + video_id + "." + extension
+
+    videos = videos_found.pop(pelican_output_path, set())
+    missing_videos = sorted(video_id for video_id in videos if not os.path.exists(thumbnail_path(video_id)))
+    if not missing_videos:
+        return
+
     # Check if the thumbnail directory exists already:
     check_for_thumbnail_directory(pelican_output_path)
-    
-    # Check if the thumbnail for this video exists already (if it's been previously downloaded). If it doesn't, download it:
-    if not os.path.exists(pelican_output_path + "/" + output_directory_for_thumbnails + "/" + video_id_from_shortcode + ".jpg"): # If the thumbnail doesn't already exist...
-        urllib.urlretrieve("https://img.youtube.com/vi/" + video_id_from_shortcode + "/0.jpg", pelican_output_path + "/" + output_directory_for_thumbnails + "/" + video_id_from_shortcode + ".jpg") # Download the thumbnail. This follows the instructions at http://www.reelseo.com/youtube-thumbnail-image/ for downloading YouTube thumbnail images.
+
+    for video_id, thumbnail in zip(missing_videos, download_thumbnails(missing_videos, settings)):
+        if thumbnail is None:
+            continue
+        try:
+            thumbnail = convert_thumbnail(thumbnail, settings)
+        except Exception as e: # Pillow couldn't read or convert the image: keep it as it was downloaded.
+            logger.warning("Cannot convert the thumbnail of video %s: %s", video_id, e)
+        with open(thumbnail_path(video_id), "wb") as thumbnail_file:
+            thumbnail_file.write(thumbnail)
 
 
 # A function to read through each page and post as it comes through from Pelican, find all instances of `!youtube(...)`, and change it into an HTML <img> element with the video thumbnail.
@@ -106,32 +202,25 @@ def process_youtube_shortcodes(data_passed_from_pelican):
     else:
         return # Exit the function, essentially passing over the (non-text) file.
 
-    all_instances_of_the_youtube_shortcode = re.findall('\!youtube.*?\)', full_content_of_page_or_post) # Use a regular expression to find every instance of '!youtube' followed by anything up to the first matching ')'.
-
-    if(len(all_instances_of_the_youtube_shortcode) > 0): # If the article/page HAS any shortcodes, go on. Otherwise, don't (to do so would inadvertantly wipe out the output content for that article/page).
-        replace_shortcode_in_text = "" # This just gives this an initial value before going into the loop below.
-
-        # Go through each shortcode instance that we found above, and parse it:
-        for youtube_shortcode_to_parse in all_instances_of_the_youtube_shortcode:
-
-            video_id_from_shortcode = re.findall('(?<=youtube\().*?(?=\))', youtube_shortcode_to_parse)[0] # Get what's inside of the parentheses in '!youtube(...).'
-            
-            # print "Video ID is " + video_id_from_shortcode # Good for debugging purposes.
-            
-            # Use the Pelican pelicanconf.py settings:
-            pelican_output_path = data_passed_from_pelican.settings['OUTPUT_PATH']
-            pelican_site_url = data_passed_from_pelican.settings['SITEURL']
+    if '!youtube(' not in full_content_of_page_or_post: # If the article/page doesn't have any shortcodes, there's nothing to do.
+        return
 
-            # Download the video thumbnail if it's not already on the filesystem:            
-            download_thumbnail(video_id_from_shortcode, pelican_output_path)
+    # Use the Pelican pelicanconf.py settings:
+    pelican_site_url = data_passed_from_pelican.settings['SITEURL']
+    extension = thumbnail_extension(data_passed_from_pelican.settings)
+    videos = videos_found.setdefault(data_passed_from_pelican.settings['OUTPUT_PATH'], set())
 
-            # Replace '!youtube(...)' with '<img>...</img>'. Note that the <img> is given a class that the jQuery file mentioned at the top of this file will watch over. Any time an image with that class is clicked, the jQuery function will trigger and turn it into the full video embed.
-            replace_shortcode_in_text = re.sub(r'\!youtube\(' + video_id_from_shortcode + '\)', r'<img class="youtube-embed-dummy-image" id="' + video_id_from_shortcode + '" src="' +  pelican_site_url + '/' + output_directory_for_thumbnails + '/' + video_id_from_shortcode + '.jpg" alt="Embedded Video - Click to view" title="Embedded Video - Click to view"></img>', full_content_of_page_or_post)
+    # Replace one '!youtube(...)' with '<img>...</img>'. Note that the <img> is given a class that the jQuery file mentioned at the top of this file will watch over. Any time an image with that class is clicked, the jQuery function will trigger and turn it into the full video embed.
+    def replace_shortcode(match):
+        video_id_from_shortcode = match.group(1) # What's inside of the parentheses in '!youtube(...).'
+        videos.add(video_id_from_shortcode) # Its thumbnail will be downloaded (if it's not already on the filesystem) once the site is generated.
+        return '<img class="youtube-embed-dummy-image" id="' + video_id_from_shortcode + '" src="' + pelican_site_url + '/' + output_directory_for_thumbnails + '/' + video_id_from_shortcode + '.' + extension + '" alt="Embedded Video - Click to view" title="Embedded Video - Click to view"></img>'
 
-        # Replace the content of the page or post with our now-updated content (having gone through all instances of the !youtube() shortcode and updated them all, exiting the loop above.
-        data_passed_from_pelican._content = replace_shortcode_in_text
+    # Replace every shortcode of the page or post in a single pass over its content:
+    data_passed_from_pelican._content = youtube_shortcode.sub(replace_shortcode, full_content_of_page_or_post)
 
 
 # Make Pelican work (see http://docs.getpelican.com/en/3.3.0/plugins.html#how-to-create-plugins):
 def register():
     signals.content_object_init.connect(process_youtube_shortcodes)
+    signals.finalized.connect(save_missing_thumbnails)